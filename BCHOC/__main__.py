@@ -1,7 +1,23 @@
-from bchoc.cli import dispatch
+import os
 import sys
 
+def _forward() -> None:
+    # With BCHOC_SOCKET set, hand the command to a running `bchoc serve`;
+    # if none answers, fall through and run it in this process.
+    if not os.environ.get("BCHOC_SOCKET") or sys.argv[1:2] == ["serve"]:
+        return
+    from bchoc.server import forward
+    reply = forward(sys.argv[1:])
+    if reply is None:
+        return
+    rc, out, err = reply
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    sys.exit(rc)
+
 def main():
+    _forward()
+    from bchoc.cli import dispatch
     try:
         rc = dispatch()
     except SystemExit as e:
@@ -0,0 +1,229 @@
+# bchoc/aio.py
+"""
+asyncio interface to one chain file.
+
+- AsyncChain.append() / append_many(): queued to a single writer task
+- AsyncChain.latest_state(): latest ItemRecord for an encrypted item ID
+- AsyncChain.history(): matching (offset, Header) entries, as a list
+- AsyncChain.verify(): verify_chain() over the current snapshot
+
+Reads never wait for the writer. Each read works on the Snapshot that was
+current when it started: the chain up to a fixed byte offset plus the item
+map at that point. A snapshot is never modified, so any number of reads
+can run at once in the executor. The writer task merges whatever appends
+are queued into one append_blocks() call and then publishes a new
+snapshot. Appends from other processes show up in the next snapshot
+taken, i.e. after this chain's next write or refresh().
+
+Only the first snapshot loads the whole item map. Later ones are copy-on-
+write: the blocks past the previous snapshot are read and their items
+layered over its map (a ChainMap), so a commit costs its own blocks, not
+the whole chain. Layers are merged once there are MAX_LAYERS of them, and
+folded into a new base map once they hold 1/FOLD_RATIO of its items.
+
+    async with AsyncChain("/tmp/test.dat") as chain:
+        await chain.append(case_id=c, item_id=i, state="CHECKEDIN",
+                           creator=b"alice", owner=b"")
+        record = await chain.latest_state(i)
+"""
+
+import asyncio
+import os
+from collections import ChainMap
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+from typing import List, Mapping, Optional, Sequence
+
+from .history import HistoryEntry, iter_history
+from .index import ItemRecord, load_item_index
+from .storage import (
+    NewBlock,
+    append_blocks,
+    check_new_blocks,
+    get_tip,
+    resolve_path,
+    scan_blocks,
+    writer_lock,
+)
+from .verify import ChainVerifier, verify_chain
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    end: int                         # chain bytes covered (a block boundary)
+    count: int                       # blocks in that prefix
+    tip_hash: bytes                  # hash of its last block
+    items: Mapping[bytes, ItemRecord]   # latest record per item; never mutated
+
+# Copy-on-write item maps: most layers stacked over the base map, and base
+# items per layered item at which the layers are folded into a new base
+MAX_LAYERS = 16
+FOLD_RATIO = 8
+
+def take_snapshot(path: Optional[str] = None) -> Snapshot:
+    """Snapshot of the chain as it is now (blocking)."""
+    p = resolve_path(path)
+    # Hold the writer lock so the tip and item map describe the same prefix
+    with writer_lock(p):
+        if not os.path.exists(p):
+            return Snapshot(0, 0, b"\x00" * 32, {})
+        tip = get_tip(p)
+        # load_item_index() hands out a map that later appends update in place
+        return Snapshot(tip.size, tip.count, tip.hash, dict(load_item_index(p)))
+
+def _advance(snap: Snapshot, p: str) -> Snapshot:
+    """`snap` extended to the current end of the chain; the writer lock must be held."""
+    if not os.path.exists(p):
+        return snap
+    tip = get_tip(p)
+    batch = {}
+    for view in scan_blocks(p, headers_only=True, start=snap.end, end=tip.size):
+        hdr = view.header
+        if not hdr.is_genesis():
+            batch[hdr.item_id] = ItemRecord(hdr.case_id, hdr.state, hdr.creator, hdr.owner, view.offset)
+
+    if isinstance(snap.items, ChainMap):
+        layers, base = snap.items.maps[:-1], snap.items.maps[-1]
+    else:
+        layers, base = [], snap.items
+    layers = [batch, *layers] if batch else layers
+    if len(layers) > MAX_LAYERS:
+        merged = {}
+        for layer in reversed(layers):
+            merged.update(layer)
+        layers = [merged]
+    if sum(map(len, layers)) * FOLD_RATIO > len(base):
+        base = dict(base)
+        for layer in reversed(layers):
+            base.update(layer)
+        layers = []
+    return Snapshot(tip.size, tip.count, tip.hash, ChainMap(*layers, base) if layers else base)
+
+
+class AsyncChain:
+    def __init__(self, path: Optional[str] = None, *, executor=None):
+        self.path = resolve_path(path)
+        self.snapshot: Optional[Snapshot] = None
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def open(self) -> "AsyncChain":
+        """Take the first snapshot and start the writer task."""
+        self.snapshot = await self._run(take_snapshot, self.path)
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        return self
+
+    async def close(self) -> None:
+        """Finish the appends already queued, then stop the writer."""
+        if self._writer is None:
+            return
+        await self._queue.put(None)
+        await self._writer
+        self._writer = None
+
+    async def __aenter__(self) -> "AsyncChain":
+        return await self.open()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def refresh(self) -> Snapshot:
+        """Take a new snapshot, picking up appends made by other processes."""
+        self.snapshot = await self._run(self._refresh)
+        return self.snapshot
+
+    def _refresh(self) -> Snapshot:
+        with writer_lock(self.path):
+            return _advance(self.snapshot, self.path)
+
+    # ---------------- Writes ----------------
+    async def append(
+        self,
+        *,
+        case_id: bytes,
+        item_id: bytes,
+        state: str,
+        creator: bytes,
+        owner: bytes,
+        data: bytes = b"",
+    ) -> None:
+        """Same fields as storage.append_block(); returns once the block is durable."""
+        await self.append_many([NewBlock(case_id=case_id, item_id=item_id, state=state,
+                                         creator=creator, owner=owner, data=data)])
+
+    async def append_many(self, blocks: Sequence[NewBlock]) -> None:
+        """Append `blocks` contiguously and in order; returns once they are durable."""
+        if not blocks:
+            return
+        if self._writer is None:
+            raise RuntimeError("AsyncChain is not open")
+        # Validate up front so one bad request cannot fail a merged batch
+        check_new_blocks(blocks)
+
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(blocks), done))
+        await done
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            requests = [r for r in batch if r is not None]
+            if requests:
+                blocks = [b for blocks, _done in requests for b in blocks]
+                try:
+                    self.snapshot = await self._run(self._commit, blocks)
+                except Exception as e:
+                    for _blocks, done in requests:
+                        if not done.done():
+                            done.set_exception(e)
+                else:
+                    for _blocks, done in requests:
+                        if not done.done():
+                            done.set_result(None)
+
+            if len(requests) != len(batch):  # close() was called
+                return
+
+    def _commit(self, blocks: List[NewBlock]) -> Snapshot:
+        with writer_lock(self.path):
+            append_blocks(blocks, self.path)
+            return _advance(self.snapshot, self.path)
+
+    # ---------------- Reads ----------------
+    async def latest_state(self, item_id: bytes) -> Optional[ItemRecord]:
+        """Latest record (case, state, creator, owner, offset) for an encrypted item ID."""
+        return self.snapshot.items.get(item_id)
+
+    async def history(
+        self,
+        case_id: Optional[bytes] = None,
+        item_id: Optional[bytes] = None,
+        *,
+        reverse: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[HistoryEntry]:
+        """Matching non-genesis blocks in the snapshot (see history.iter_history)."""
+        snap = self.snapshot
+        if snap.end == 0:
+            return []
+
+        def read() -> List[HistoryEntry]:
+            entries = iter_history(case_id, item_id, reverse=reverse, end=snap.end, path=self.path)
+            return list(islice(entries, limit))
+
+        return await self._run(read)
+
+    async def verify(self, *, full: bool = False) -> ChainVerifier:
+        """Verify the snapshot's blocks; inspect .result() and .count."""
+        if self.snapshot.end == 0:
+            return ChainVerifier()
+        return await self._run(partial(verify_chain, self.path, full=full, end=self.snapshot.end))
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
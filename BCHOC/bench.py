@@ -0,0 +1,305 @@
+# bchoc/bench.py
+"""
+Benchmarks and performance budgets.
+
+- generate_chain(): deterministic synthetic chain of N blocks
+- run_benchmarks(): time every command path against a generated chain
+- startup_ms(): median wall time of `python -m bchoc <argv>` in a fresh
+  interpreter, minus that of an empty interpreter
+- heavy_imports(): heavy modules loaded just by building the CLI parser
+- check_startup(): both of the above against STARTUP_BUDGET_MS /
+  HEAVY_MODULES
+
+`bchoc bench` generates a chain and writes the timings as JSON (see
+bench_cmd.py). `python -m bchoc.bench` checks the startup budget and
+exits 1 when it is exceeded.
+
+The generator draws cases, items and actions from random.Random(seed), so
+the same seed and size always give the same cases, items and state
+sequence (block timestamps are the real write times). Roughly: a third
+of the blocks add an item, usually to one of the most recently opened
+cases; most of the rest check an item out or back in; about 2% remove an
+item for good. Every item follows the state machine and keeps its
+creator on every later block, so the chain verifies CLEAN.
+"""
+
+import io
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Sequence
+
+# Extra time `bchoc --help` may take over a bare `python -c pass`
+STARTUP_BUDGET_MS = 75.0
+
+# Modules only some commands need; importing the CLI must not load them
+HEAVY_MODULES = (
+    "Crypto",
+    "uuid",
+    "datetime",
+    "concurrent.futures",
+    "multiprocessing",
+    "bchoc.commands",
+    "numpy",
+)
+
+# Blocks handed to each append_blocks() call while generating
+GENERATE_CHUNK = 10_000
+
+# Passwords set for the duration of run_benchmarks()
+BENCH_PASSWORDS = {
+    "BCHOC_PASSWORD_POLICE": "bench-police",
+    "BCHOC_PASSWORD_LAWYER": "bench-lawyer",
+    "BCHOC_PASSWORD_ANALYST": "bench-analyst",
+    "BCHOC_PASSWORD_EXECUTIVE": "bench-exec",
+    "BCHOC_PASSWORD_CREATOR": "bench-creator",
+}
+
+_CREATORS = [b"intake", b"officer1", b"officer2", b"lab"]
+_OWNERS = [b"police", b"lawyer", b"analyst", b"executive"]
+
+# ---------------- Synthetic chains ----------------
+@dataclass
+class SyntheticChain:
+    path: str
+    seed: int
+    blocks: int        # including the INITIAL block
+    cases: int
+    items: int
+    case_id: str       # the case with the most blocks
+    checked_in: int    # an item that is CHECKEDIN at the end
+    next_item: int     # lowest unused item ID
+
+def generate_chain(path: str, blocks: int, *, seed: int = 0) -> SyntheticChain:
+    """Write a new chain of `blocks` blocks (INITIAL included) to `path`."""
+    from .ids import case_uuid_to_enc32, item_id_to_enc32
+    from .models import State
+    from .storage import NewBlock, append_blocks, init_file
+
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    init_file(path)
+
+    rng = random.Random(seed)
+    cases: List[str] = []
+    case_blocks: List[int] = []
+    item_case: Dict[int, int] = {}      # item -> index into cases
+    item_enc: Dict[int, bytes] = {}
+    item_creator: Dict[int, bytes] = {}
+    state: Dict[int, State] = {}
+    live: List[int] = []                # items not yet removed
+    next_item = 1
+    pending: List[NewBlock] = []
+
+    for _ in range(blocks - 1):
+        r = rng.random()
+        if not live or r < 0.33:
+            # Add: mostly to one of the ten newest cases, sometimes a new case
+            if not cases or rng.random() < 0.03:
+                cases.append(str(uuid.UUID(int=rng.getrandbits(128), version=4)))
+                case_blocks.append(0)
+            case = len(cases) - 1 - rng.randrange(min(len(cases), 10))
+            item, next_item = next_item, next_item + 1
+            item_case[item] = case
+            item_enc[item] = item_id_to_enc32(item)
+            live.append(item)
+            new_state = State.CHECKEDIN
+            owner = item_creator[item] = rng.choice(_CREATORS)
+        else:
+            slot = rng.randrange(len(live))
+            item = live[slot]
+            if state[item] is State.CHECKEDOUT:
+                new_state, owner = State.CHECKEDIN, b""
+            elif r < 0.98:
+                new_state, owner = State.CHECKEDOUT, rng.choice(_OWNERS)
+            else:
+                new_state = rng.choice([State.DISPOSED, State.DESTROYED, State.RELEASED])
+                owner = b"court" if new_state is State.RELEASED else b""
+                live[slot] = live[-1]
+                live.pop()
+
+        state[item] = new_state
+        case = item_case[item]
+        case_blocks[case] += 1
+        pending.append(NewBlock(
+            case_id=case_uuid_to_enc32(cases[case]),
+            item_id=item_enc[item],
+            state=new_state.name,
+            # Later blocks carry the item's creator, as checkout/checkin/remove do
+            creator=item_creator[item],
+            owner=owner,
+        ))
+        if len(pending) >= GENERATE_CHUNK:
+            append_blocks(pending, path)
+            pending = []
+    append_blocks(pending, path)
+
+    checked_in = next((i for i in live if state[i] is State.CHECKEDIN), 0)
+    busiest = max(range(len(cases)), key=case_blocks.__getitem__) if cases else None
+    return SyntheticChain(
+        path=path,
+        seed=seed,
+        blocks=blocks,
+        cases=len(cases),
+        items=next_item - 1,
+        case_id=cases[busiest] if busiest is not None else str(uuid.UUID(int=0)),
+        checked_in=checked_in,
+        next_item=next_item,
+    )
+
+# ---------------- Command timings ----------------
+@contextmanager
+def _bench_env(path: str) -> Iterator[None]:
+    saved = {k: os.environ.get(k) for k in [*BENCH_PASSWORDS, "BCHOC_FILE_PATH"]}
+    os.environ.update(BENCH_PASSWORDS, BCHOC_FILE_PATH=path)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+def _timed(argv: List[str]) -> float:
+    """Run one command in this process; its wall time in ms (output discarded)."""
+    from .cli import dispatch
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        rc = dispatch(argv)
+    elapsed = (time.perf_counter() - start) * 1000
+    if rc:
+        raise RuntimeError(f"bench: `bchoc {' '.join(argv)}` exited with {rc}")
+    return elapsed
+
+def _stats(times: List[float]) -> Dict[str, float]:
+    # The first run also pays for building any missing sidecar index
+    return {
+        "runs": len(times),
+        "first_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+    }
+
+def run_benchmarks(chain: SyntheticChain, *, repeat: int = 5, add_items: int = 100) -> Dict[str, Dict[str, float]]:
+    """
+    Time each command path against `chain`, `repeat` times each, in-process
+    (interpreter startup is measured separately by startup_ms()). Read-only
+    commands run first; checkout/checkin/add then append to the chain.
+    """
+    pw = BENCH_PASSWORDS["BCHOC_PASSWORD_CREATOR"]
+    owner_pw = BENCH_PASSWORDS["BCHOC_PASSWORD_POLICE"]
+    case = chain.case_id
+    item = str(chain.checked_in)
+
+    read_only = {
+        "summary": ["summary", "-c", case],
+        "show cases": ["show", "cases"],
+        "show cases -p": ["show", "cases", "-p", pw],
+        "show items": ["show", "items", "-c", case, "-p", pw],
+        "show history -c": ["show", "history", "-c", case, "-p", pw],
+        "show history -i": ["show", "history", "-i", item, "-p", pw],
+        "show history -r -n 10": ["show", "history", "-r", "-n", "10", "-p", pw],
+        "show history --limit 100": ["show", "history", "--limit", "100"],
+        "show history --since": ["show", "history", "--since", "2000-01-01", "--limit", "100"],
+        "verify --full": ["verify", "--full"],
+    }
+
+    results: Dict[str, Dict[str, float]] = {}
+    with _bench_env(chain.path):
+        for name, argv in read_only.items():
+            results[name] = _stats([_timed(argv) for _ in range(repeat)])
+
+        if chain.checked_in:
+            checkout, checkin = [], []
+            for _ in range(repeat):
+                checkout.append(_timed(["checkout", "-i", item, "-o", "bench", "-p", owner_pw]))
+                checkin.append(_timed(["checkin", "-i", item, "-p", owner_pw]))
+            results["checkout"] = _stats(checkout)
+            results["checkin"] = _stats(checkin)
+
+        add = []
+        next_item = chain.next_item
+        for _ in range(repeat):
+            ids = [str(i) for i in range(next_item, next_item + add_items)]
+            next_item += add_items
+            add.append(_timed(["add", "-c", case, "-i", *ids, "-g", "bench", "-p", pw]))
+        results[f"add {add_items} items"] = _stats(add)
+
+        # Only the blocks appended above are left to check
+        results["verify"] = _stats([_timed(["verify"]) for _ in range(repeat)])
+    return results
+
+def bench_report(chain: SyntheticChain, generate_s: float, results: Dict, startup: float) -> Dict:
+    """Machine-readable record of one benchmark run."""
+    return {
+        "bchoc_bench": 1,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "chain": {k: v for k, v in asdict(chain).items() if k != "path"},
+        "chain_bytes": os.path.getsize(chain.path),
+        "generate_s": round(generate_s, 3),
+        "startup_ms": round(startup, 3),
+        "results": results,
+    }
+
+# ---------------- Startup ----------------
+def _wall_ms(args: Sequence[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def startup_ms(argv: Sequence[str] = ("--help",), runs: int = 15) -> float:
+    """Startup cost of `bchoc <argv>` in ms, over bare interpreter startup."""
+    bare = _wall_ms(["-c", "pass"], runs)
+    return _wall_ms(["-m", "bchoc", *argv], runs) - bare
+
+def heavy_imports() -> List[str]:
+    """HEAVY_MODULES that get imported by loading bchoc.cli and building its parser."""
+    code = (
+        "import sys, bchoc.cli\n"
+        "bchoc.cli.build_parser()\n"
+        f"heavy = {HEAVY_MODULES!r}\n"
+        "print(' '.join(sorted({h for h in heavy for m in sys.modules"
+        " if m == h or m.startswith(h + '.')})))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return out.stdout.split()
+
+def check_startup(budget_ms: float = STARTUP_BUDGET_MS, runs: int = 15) -> bool:
+    ok = True
+
+    heavy = heavy_imports()
+    if heavy:
+        print(f"> Imported at startup: {', '.join(heavy)}")
+        ok = False
+
+    ms = startup_ms(runs=runs)
+    print(f"> Startup: {ms:.1f} ms (budget {budget_ms:.1f} ms)")
+    if ms > budget_ms:
+        ok = False
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_startup() else 1)
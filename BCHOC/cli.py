@@ -1,27 +1,39 @@
 import argparse
+import importlib
 
-from bchoc.commands.init_cmd import run_init
-from bchoc.commands.add_cmd import run_add
-from bchoc.commands.checkout_cmd import run_checkout
-from bchoc.commands.checkin_cmd import run_checkin
-from bchoc.commands.remove_cmd import run_remove
-from bchoc.commands.summary_cmd import run_summary
-from bchoc.commands.verify_cmd import run_verify
+from bchoc import stats
+from bchoc.env import profile_setting
 
-from bchoc.commands.show_cases_cmd import run_show_cases
-from bchoc.commands.show_items_cmd import run_show_items
-from bchoc.commands.show_history_cmd import run_show_history
+def _lazy(module: str, name: str):
+    """
+    Handler that imports its command module on first call, so startup only
+    pays for the one command that runs (and not e.g. the AES backend for init).
+    """
+    def run(args):
+        return getattr(stats.call("import", importlib.import_module, module), name)(args)
+    return run
 
 def build_parser():
     parser = argparse.ArgumentParser(
         prog="bchoc",
         description="Blockchain Chain of Custody",
     )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print block, hash and AES counters and timings to stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        required=False,
+        help="Also run the command under cProfile and dump the stats to FILE",
+    )
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     # bchoc init
     sp_init = sub.add_parser("init", help="Initialize blockchain file")
-    sp_init.set_defaults(func=lambda args: run_init())
+    sp_init.set_defaults(func=_lazy("bchoc.commands.init_cmd", "run_init"))
 
     # bchoc add
     sp_add = sub.add_parser("add", help="Add evidence items to a case")
@@ -29,27 +41,45 @@ def build_parser():
     sp_add.add_argument("-i", "--item_ids", required=True, nargs="+")
     sp_add.add_argument("-g", "--creator", required=True)
     sp_add.add_argument("-p", "--password", required=True)
-    sp_add.set_defaults(func=run_add)
+    sp_add.set_defaults(func=_lazy("bchoc.commands.add_cmd", "run_add"))
+
+    # bchoc import
+    sp_import = sub.add_parser("import", help="Add items in bulk from a CSV or NDJSON manifest")
+    sp_import.add_argument("file", help="Manifest with case_id, item_id and creator per row")
+    sp_import.add_argument("-p", "--password", required=True)
+    sp_import.add_argument(
+        "-g",
+        "--creator",
+        required=False,
+        help="Creator for rows that do not name one",
+    )
+    sp_import.add_argument(
+        "--format",
+        choices=["csv", "ndjson"],
+        required=False,
+        help="Manifest format (default: from the file extension)",
+    )
+    sp_import.set_defaults(func=_lazy("bchoc.commands.import_cmd", "run_import"))
 
     # bchoc checkout
-    sp_checkout = sub.add_parser("checkout", help="Check out an item to a new owner")
-    sp_checkout.add_argument("-i", "--item_id", required=True)
+    sp_checkout = sub.add_parser("checkout", help="Check out items to a new owner")
+    sp_checkout.add_argument("-i", "--item_id", "--item_ids", dest="item_ids", required=True, nargs="+")
     sp_checkout.add_argument("-o", "--owner", required=True, help="New owner name")
     sp_checkout.add_argument("-p", "--password", required=True)
-    sp_checkout.set_defaults(func=run_checkout)
+    sp_checkout.set_defaults(func=_lazy("bchoc.commands.checkout_cmd", "run_checkout"))
 
     # bchoc checkin
-    sp_checkin = sub.add_parser("checkin", help="Check in an item")
-    sp_checkin.add_argument("-i", "--item_id", required=True)
+    sp_checkin = sub.add_parser("checkin", help="Check in items")
+    sp_checkin.add_argument("-i", "--item_id", "--item_ids", dest="item_ids", required=True, nargs="+")
     sp_checkin.add_argument("-p", "--password", required=True)
-    sp_checkin.set_defaults(func=run_checkin)
+    sp_checkin.set_defaults(func=_lazy("bchoc.commands.checkin_cmd", "run_checkin"))
 
     # bchoc remove
     sp_remove = sub.add_parser(
         "remove",
-        help="Mark an item as DISPOSED/DESTROYED/RELEASED",
+        help="Mark items as DISPOSED/DESTROYED/RELEASED",
     )
-    sp_remove.add_argument("-i", "--item_id", required=True)
+    sp_remove.add_argument("-i", "--item_id", "--item_ids", dest="item_ids", required=True, nargs="+")
     sp_remove.add_argument(
         "-s",
         "--state",
@@ -63,7 +93,7 @@ def build_parser():
         help="Receiver name (required when state is RELEASED)",
     )
     sp_remove.add_argument("-p", "--password", required=True)
-    sp_remove.set_defaults(func=run_remove)
+    sp_remove.set_defaults(func=_lazy("bchoc.commands.remove_cmd", "run_remove"))
 
     # bchoc show cases/items/history
     sp_show = sub.add_parser("show", help="Show cases, items, or history")
@@ -76,7 +106,7 @@ def build_parser():
         required=False,
         help="Password (shows decrypted case IDs if valid)",
     )
-    sp_show_cases.set_defaults(func=run_show_cases)
+    sp_show_cases.set_defaults(func=_lazy("bchoc.commands.show_cases_cmd", "run_show_cases"))
 
     sp_show_items = show_sub.add_parser("items", help="List items in a case")
     sp_show_items.add_argument(
@@ -91,7 +121,7 @@ def build_parser():
         required=False,
         help="Password (shows decrypted IDs if valid)",
     )
-    sp_show_items.set_defaults(func=run_show_items)
+    sp_show_items.set_defaults(func=_lazy("bchoc.commands.show_items_cmd", "run_show_items"))
 
     sp_show_hist = show_sub.add_parser("history", help="Show history of blocks")
     sp_show_hist.add_argument(
@@ -119,13 +149,34 @@ def build_parser():
         action="store_true",
         help="Show newest entries first",
     )
+    sp_show_hist.add_argument(
+        "--after",
+        required=False,
+        help="Resume after this cursor (printed as '> Next: ...' by --limit)",
+    )
+    sp_show_hist.add_argument(
+        "--limit",
+        type=int,
+        required=False,
+        help="Page size; prints a cursor for the next page if there are more",
+    )
+    sp_show_hist.add_argument(
+        "--since",
+        required=False,
+        help="Only blocks at or after this ISO 8601 time (UTC unless an offset is given)",
+    )
+    sp_show_hist.add_argument(
+        "--until",
+        required=False,
+        help="Only blocks at or before this ISO 8601 time (UTC unless an offset is given)",
+    )
     sp_show_hist.add_argument(
         "-p",
         "--password",
         required=False,
         help="Password (shows decrypted IDs if valid)",
     )
-    sp_show_hist.set_defaults(func=run_show_history)
+    sp_show_hist.set_defaults(func=_lazy("bchoc.commands.show_history_cmd", "run_show_history"))
 
     # bchoc summary -c CASE_ID
     sp_summary = sub.add_parser("summary", help="Summarize item states for a case")
@@ -135,15 +186,123 @@ def build_parser():
         required=True,
         help="Case UUID",
     )
-    sp_summary.set_defaults(func=run_summary)
+    sp_summary.set_defaults(func=_lazy("bchoc.commands.summary_cmd", "run_summary"))
 
     # bchoc verify
     sp_verify = sub.add_parser("verify", help="Verify blockchain integrity")
-    sp_verify.set_defaults(func=run_verify)
+    sp_verify.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-check the whole chain instead of resuming from the last checkpoint",
+    )
+    sp_verify.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        help="Hash blocks with N worker processes",
+    )
+    sp_verify.set_defaults(func=_lazy("bchoc.commands.verify_cmd", "run_verify"))
+
+    # bchoc snapshot
+    sp_snapshot = sub.add_parser(
+        "snapshot",
+        help="Save derived state (items, cases, verify checkpoint) for fast startup",
+    )
+    sp_snapshot.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild from genesis instead of updating the last snapshot",
+    )
+    sp_snapshot.set_defaults(func=_lazy("bchoc.commands.snapshot_cmd", "run_snapshot"))
+
+    # bchoc segments
+    sp_segments = sub.add_parser(
+        "segments",
+        help="List chain segments (BCHOC_SEGMENT_BLOCKS) and export sealed ones",
+    )
+    sp_segments.add_argument(
+        "--export",
+        metavar="DIR",
+        required=False,
+        help="Copy sealed segments not already in DIR there, one file each",
+    )
+    sp_segments.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        help="Build missing manifests with N worker processes",
+    )
+    sp_segments.set_defaults(func=_lazy("bchoc.commands.segments_cmd", "run_segments"))
+
+    # bchoc serve
+    sp_serve = sub.add_parser(
+        "serve",
+        help="Keep the chain loaded and run commands sent over a Unix socket",
+    )
+    sp_serve.add_argument(
+        "-s",
+        "--socket",
+        required=False,
+        help="Socket path (default: $BCHOC_SOCKET or ./bchoc.sock)",
+    )
+    sp_serve.set_defaults(func=_lazy("bchoc.commands.serve_cmd", "run_serve"))
+
+    # bchoc bench
+    sp_bench = sub.add_parser(
+        "bench",
+        help="Time every command against a generated chain (JSON results)",
+    )
+    sp_bench.add_argument(
+        "-n",
+        "--blocks",
+        type=int,
+        default=10_000,
+        help="Blocks in the generated chain (default 10000)",
+    )
+    sp_bench.add_argument("--seed", type=int, default=0, help="Generator seed")
+    sp_bench.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=5,
+        help="Runs per command (default 5)",
+    )
+    sp_bench.add_argument(
+        "--add",
+        type=int,
+        default=100,
+        help="Items per timed add (default 100)",
+    )
+    sp_bench.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        help="Write the JSON results here instead of stdout",
+    )
+    sp_bench.add_argument(
+        "--dir",
+        required=False,
+        help="Generate the chain here and keep it (default: a temporary directory)",
+    )
+    sp_bench.set_defaults(func=_lazy("bchoc.commands.bench_cmd", "run_bench"))
 
     return parser
 
-def dispatch(argv=None):
-    parser = build_parser()
+def dispatch(argv=None, parser=None):
+    # bchoc serve passes in the parser it built once
+    if parser is None:
+        parser = build_parser()
     args = parser.parse_args(argv)
-    return args.func(args)
+
+    # --stats / --profile, or BCHOC_PROFILE=1 / BCHOC_PROFILE=<file>
+    profile = args.profile
+    setting = profile_setting()
+    if setting is not None and setting != "1" and profile is None:
+        profile = setting
+    if not (args.stats or profile or setting):
+        return args.func(args)
+
+    title = " ".join(a for a in (args.cmd, getattr(args, "show_what", None)) if a)
+    return stats.run(args.func, args, title=title, profile=profile)
@@ -4,13 +4,11 @@ from datetime import datetime, timezone
 
 from bchoc.env import require_creator_password
 from bchoc.ids import case_uuid_to_enc32, item_id_to_enc32
-from bchoc.storage import append_block, iter_blocks
+from bchoc.index import load_item_index
+from bchoc.storage import NewBlock, append_blocks, resolve_path, writer_lock
 
 def _existing_items_enc() -> set[bytes]:
-    seen: set[bytes] = set()
-    for hdr, _data in iter_blocks():
-        seen.add(hdr.item_id)
-    return seen
+    return set(load_item_index())
 
 def run_add(args) -> int:
     # 1) Password must be CREATOR (exits with code 1 if invalid)
@@ -37,36 +35,41 @@ def run_add(args) -> int:
         print("> No item IDs provided")
         return 1
 
-    # 5) Check for duplicates against existing chain
-    existing = _existing_items_enc()
-    for item_id in item_ids_int:
-        enc_item = item_id_to_enc32(item_id)
-        if enc_item in existing:
-            print(f"> Item {item_id} already exists")
-            return 1
-
-    # 6) Prepare creator/owner fields (12-byte ASCII, padded in storage)
+    # 5) Prepare creator/owner fields (12-byte ASCII, padded in storage)
     creator_bytes = args.creator.encode("ascii")[:12]
     # For simplicity, set owner == creator on add (spec does not constrain this)
     owner_bytes = creator_bytes
+    items_enc = [(item_id, item_id_to_enc32(item_id)) for item_id in item_ids_int]
 
-    # 7) Append one CHECKEDIN block per item
-    action_time = (
-        datetime.now(timezone.utc)
-        .isoformat(timespec="microseconds")
-        .replace("+00:00", "Z")
-    )
+    # Hold the writer lock so no other add can append the same item between the check and the write
+    with writer_lock(resolve_path()):
+        # 6) Check for duplicates against existing chain
+        existing = _existing_items_enc()
+        for item_id, enc_item in items_enc:
+            if enc_item in existing:
+                print(f"> Item {item_id} already exists")
+                return 1
 
-    for item_id in item_ids_int:
-        enc_item = item_id_to_enc32(item_id)
-        append_block(
-            case_id=case_enc,
-            item_id=enc_item,
-            state="CHECKEDIN",
-            creator=creator_bytes,
-            owner=owner_bytes,
-            data=b"",
+        # 7) Append one CHECKEDIN block per item, all in a single write
+        action_time = (
+            datetime.now(timezone.utc)
+            .isoformat(timespec="microseconds")
+            .replace("+00:00", "Z")
         )
+
+        append_blocks([
+            NewBlock(
+                case_id=case_enc,
+                item_id=enc_item,
+                state="CHECKEDIN",
+                creator=creator_bytes,
+                owner=owner_bytes,
+                data=b"",
+            )
+            for _item_id, enc_item in items_enc
+        ])
+
+    for item_id in item_ids_int:
         print(f"> Added item: {item_id}")
         print("> Status: CHECKEDIN")
         print(f"> Time of action: {action_time}")
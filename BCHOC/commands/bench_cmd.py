@@ -0,0 +1,44 @@
+# bchoc/commands/bench_cmd.py
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from bchoc.bench import bench_report, generate_chain, run_benchmarks, startup_ms
+
+def run_bench(args) -> int:
+    # 1) Validate sizes
+    if args.blocks < 2:
+        print("> --blocks must be at least 2")
+        return 1
+    if args.repeat < 1 or args.add < 1:
+        print("> --repeat and --add must be at least 1")
+        return 1
+
+    # 2) Generate the chain in a scratch directory (kept with --dir)
+    workdir = args.dir or tempfile.mkdtemp(prefix="bchoc-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, f"bench-{args.blocks}-{args.seed}.dat")
+    try:
+        start = time.perf_counter()
+        chain = generate_chain(path, args.blocks, seed=args.seed)
+        generate_s = time.perf_counter() - start
+
+        # 3) Time every command path, plus interpreter startup
+        results = run_benchmarks(chain, repeat=args.repeat, add_items=args.add)
+        report = bench_report(chain, generate_s, results, startup_ms(runs=5))
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # 4) JSON to --output, or to stdout
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for name, stats in results.items():
+            print(f"> {name}: {stats['median_ms']:.2f} ms")
+        print(f"> Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
@@ -2,53 +2,57 @@
 from datetime import datetime, timezone
 
 from bchoc.env import require_owner_password
-from bchoc.ids import item_id_to_enc32, enc32_to_case_uuid
-from bchoc.storage import get_latest_items, append_block
-
-TERMINAL_STATES = {"DISPOSED", "DESTROYED", "RELEASED"}
+from bchoc.ids import item_ids_to_enc32_many, enc32_to_case_uuid_many
+from bchoc.index import load_item_index
+from bchoc.models import TERMINAL_STATES, State
+from bchoc.storage import NewBlock, append_blocks, resolve_path, writer_lock
 
 def run_checkin(args) -> int:
     # 1) Check password (any owner-level password)
     require_owner_password(args.password)
 
-    # 2) Parse item id
+    # 2) Parse item ids
     try:
-        item_id_int = int(args.item_id)
+        item_ids_int = [int(x) for x in args.item_ids]
     except ValueError:
         print("> Item ID must be an integer")
         return 1
-
-    item_enc = item_id_to_enc32(item_id_int)
-
-    # 3) Get latest state for this item
-    latest = get_latest_items()
-    if item_enc not in latest:
-        print(f"> Item {item_id_int} not found in blockchain.")
+    if len(set(item_ids_int)) != len(item_ids_int):
+        print("> Each item ID may only be given once")
         return 1
 
-    case_enc, state_bytes, creator_bytes, _owner_bytes = latest[item_enc]
-    state = state_bytes.rstrip(b"\x00").decode("ascii", errors="replace")
+    # Hold the writer lock so no item changes state between the checks and the write
+    with writer_lock(resolve_path()):
+        # 3) Latest state of every item; nothing is written unless all can be checked in
+        items = load_item_index()
+        blocks = []
+        for item_id_int, item_enc in zip(item_ids_int, item_ids_to_enc32_many(item_ids_int)):
+            record = items.get(item_enc)
+            if record is None:
+                print(f"> Item {item_id_int} not found in blockchain.")
+                return 1
 
-    if state in TERMINAL_STATES:
-        print(f"> Item {item_id_int} is in terminal state {state}; cannot checkin.")
-        return 1
+            state = State.of(record.state)
+            if state in TERMINAL_STATES:
+                print(f"> Item {item_id_int} is in terminal state {state.name}; cannot checkin.")
+                return 1
 
-    if state != "CHECKEDOUT":
-        print(f"> Item {item_id_int} must be CHECKEDOUT to checkin (current: {state}).")
-        return 1
+            if state is not State.CHECKEDOUT:
+                print(f"> Item {item_id_int} must be CHECKEDOUT to checkin (current: {state.name}).")
+                return 1
 
-    # 4) On checkin, owner becomes blank (no outstanding checkout)
-    owner_bytes = b""
+            # 4) On checkin, owner becomes blank (no outstanding checkout)
+            blocks.append(NewBlock(
+                case_id=record.case_id,
+                item_id=item_enc,
+                state="CHECKEDIN",
+                creator=record.creator.rstrip(b"\x00"),
+                owner=b"",
+                data=b"",
+            ))
 
-    # 5) Append CHECKEDIN block
-    append_block(
-        case_id=case_enc,
-        item_id=item_enc,
-        state="CHECKEDIN",
-        creator=creator_bytes.rstrip(b"\x00"),
-        owner=owner_bytes,
-        data=b"",
-    )
+        # 5) Append all CHECKEDIN blocks in a single write
+        append_blocks(blocks)
 
     # Prepare time string for output (UTC, ISO 8601 with Z)
     action_time = (
@@ -57,12 +61,13 @@ def run_checkin(args) -> int:
         .replace("+00:00", "Z")
     )
 
-    # Decode case UUID for printing
-    case_str = enc32_to_case_uuid(case_enc)
+    # Decode case UUIDs for printing
+    case_strs = enc32_to_case_uuid_many([b.case_id for b in blocks])
 
-    print(f"> Case: {case_str}")
-    print(f"> Checked in item: {item_id_int}")
-    print("> Status: CHECKEDIN")
-    print(f"> Time of action: {action_time}")
+    for item_id_int, case_str in zip(item_ids_int, case_strs):
+        print(f"> Case: {case_str}")
+        print(f"> Checked in item: {item_id_int}")
+        print("> Status: CHECKEDIN")
+        print(f"> Time of action: {action_time}")
 
     return 0
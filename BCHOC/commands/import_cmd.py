@@ -0,0 +1,232 @@
+# bchoc/commands/import_cmd.py
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from bchoc.env import require_creator_password
+from bchoc.ids import case_uuid_to_enc32, item_ids_to_enc32_many
+from bchoc.index import load_item_index
+from bchoc.storage import NewBlock, append_blocks, resolve_path, writer_lock
+
+# Rows per append_blocks() call (one write + fsync, one progress line)
+IMPORT_CHUNK = 10_000
+
+# Invalid rows listed before the rest are only counted
+MAX_ERRORS = 20
+
+def _format(args) -> Optional[str]:
+    if args.format:
+        return args.format
+    ext = os.path.splitext(args.file)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return None
+
+# A record that is not valid JSON (reported as such by _parse)
+_BAD_JSON = object()
+
+def _records(path: str, fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, raw record) for each non-blank record in the manifest."""
+    # utf-8-sig: spreadsheet exports start with a byte order mark
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            missing = {"case_id", "item_id"} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"CSV header must have {', '.join(sorted(missing))}")
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = _BAD_JSON
+                    yield line_no, record
+
+@lru_cache(maxsize=4096)
+def _case_uuid(value: str) -> str:
+    # A manifest repeats a handful of case IDs across thousands of rows
+    try:
+        return str(uuid.UUID(value.strip()))
+    except ValueError:
+        raise ValueError("invalid case ID (must be a UUID)") from None
+
+def _parse(record, default_creator: Optional[str]) -> Tuple[str, int, bytes]:
+    """(case UUID, item ID, creator bytes) from one record; ValueError if invalid."""
+    if record is _BAD_JSON:
+        raise ValueError("invalid JSON")
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    case_id = _case_uuid(str(record.get("case_id")))
+
+    item = record.get("item_id")
+    if isinstance(item, bool) or not isinstance(item, (int, str)):
+        raise ValueError("item ID must be an integer")
+    try:
+        item_id = int(item)
+    except ValueError:
+        raise ValueError("item ID must be an integer") from None
+    if not 0 <= item_id <= 0xFFFFFFFF:
+        raise ValueError("item ID must be in 0..2^32-1")
+
+    creator = record.get("creator") or default_creator
+    if isinstance(creator, str):
+        creator = creator.strip()
+    if not isinstance(creator, str) or not creator:
+        raise ValueError("no creator (add a creator column or pass -g)")
+    try:
+        creator_bytes = creator.encode("ascii")[:12]
+    except UnicodeEncodeError:
+        raise ValueError("creator must be ASCII") from None
+    return case_id, item_id, creator_bytes
+
+class _ValidRows:
+    """
+    Rows that passed validation, in file order: item IDs plus indexes into
+    the distinct case IDs and creators (a manifest repeats a handful).
+    """
+
+    def __init__(self) -> None:
+        self.item_ids = array("I")
+        self.case_ix = array("I")
+        self.creator_ix = array("I")
+        self.cases: Dict[str, int] = {}
+        self.creators: Dict[bytes, int] = {}
+
+    def add(self, case_id: str, item_id: int, creator: bytes) -> None:
+        self.item_ids.append(item_id)
+        self.case_ix.append(self.cases.setdefault(case_id, len(self.cases)))
+        self.creator_ix.append(self.creators.setdefault(creator, len(self.creators)))
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+def _validate(path: str, fmt: str, default_creator: Optional[str]) -> Tuple[int, int, _ValidRows]:
+    """
+    First pass: check every row and that no item ID is already on the chain
+    or repeated in the file. Returns (rows, invalid rows, the valid rows).
+    """
+    existing = load_item_index()
+    valid = _ValidRows()
+    seen: set[int] = set()
+    batch: list[Tuple[int, int]] = []
+    errors: list[Tuple[int, str]] = []
+    rows = 0
+
+    def error(line_no: int, msg: str) -> None:
+        errors.append((line_no, msg))
+
+    def check_existing() -> None:
+        # Encrypt a chunk of item IDs in one AES call and look them up
+        encs = item_ids_to_enc32_many([item_id for _line, item_id in batch])
+        for (line_no, item_id), enc_item in zip(batch, encs):
+            if enc_item in existing:
+                error(line_no, f"item {item_id} already exists")
+        batch.clear()
+
+    for line_no, record in _records(path, fmt):
+        rows += 1
+        try:
+            case_id, item_id, creator = _parse(record, default_creator)
+        except ValueError as e:
+            error(line_no, str(e))
+            continue
+        if item_id in seen:
+            error(line_no, f"item {item_id} appears more than once")
+            continue
+        seen.add(item_id)
+        valid.add(case_id, item_id, creator)
+        batch.append((line_no, item_id))
+        if len(batch) >= IMPORT_CHUNK:
+            check_existing()
+    check_existing()
+
+    # Items already on the chain are found a chunk later; report in line order
+    errors.sort()
+    for line_no, msg in errors[:MAX_ERRORS]:
+        print(f"> Line {line_no}: {msg}")
+    return rows, len(errors), valid
+
+def _write(valid: _ValidRows) -> None:
+    """
+    Second pass: append the CHECKEDIN blocks in chunks, from the rows the
+    first pass kept (the manifest is not read again, so it cannot fail here).
+    """
+    case_encs = [case_uuid_to_enc32(case_id) for case_id in valid.cases]
+    creators = list(valid.creators)
+    total = len(valid)
+    start = time.perf_counter()
+
+    for lo in range(0, total, IMPORT_CHUNK):
+        hi = min(lo + IMPORT_CHUNK, total)
+        encs = item_ids_to_enc32_many(valid.item_ids[lo:hi])
+        append_blocks([
+            NewBlock(
+                case_id=case_encs[case_ix],
+                item_id=enc_item,
+                state="CHECKEDIN",
+                creator=creators[creator_ix],
+                owner=creators[creator_ix],  # as in bchoc add
+            )
+            for enc_item, case_ix, creator_ix in zip(encs, valid.case_ix[lo:hi], valid.creator_ix[lo:hi])
+        ])
+        elapsed = time.perf_counter() - start
+        print(f"> {hi}/{total} items ({hi / elapsed:.0f} items/s)", file=sys.stderr, flush=True)
+
+def run_import(args) -> int:
+    # 1) Password must be CREATOR (exits with code 1 if invalid)
+    require_creator_password(args.password)
+
+    # 2) Manifest format from --format or the file extension
+    fmt = _format(args)
+    if fmt is None:
+        print("> Unknown manifest format (use a .csv/.ndjson file or --format)")
+        return 1
+    if not os.path.isfile(args.file):
+        print(f"> Manifest not found: {args.file}")
+        return 1
+
+    # 3) Validate everything, then write; other writers wait until we are done
+    start = time.perf_counter()
+    with writer_lock(resolve_path()):
+        try:
+            rows, errors, valid = _validate(args.file, fmt, args.creator)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            print(f"> Cannot read manifest: {e}")
+            return 1
+        if errors:
+            if errors > MAX_ERRORS:
+                print(f"> ... and {errors - MAX_ERRORS} more")
+            print(f"> {errors} of {rows} rows invalid; nothing imported")
+            return 1
+        if rows == 0:
+            print("> No rows in manifest")
+            return 1
+        print(f"> Validated {rows} rows in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+
+        _write(valid)
+        items, cases = len(valid), len(valid.cases)
+
+    # 4) Summary
+    elapsed = time.perf_counter() - start
+    action_time = (
+        datetime.now(timezone.utc)
+        .isoformat(timespec="microseconds")
+        .replace("+00:00", "Z")
+    )
+    print(f"> Imported {items} items into {cases} cases")
+    print("> Status: CHECKEDIN")
+    print(f"> Time of action: {action_time}")
+    print(f"> {items / elapsed:.0f} items/s ({elapsed:.2f} s)", file=sys.stderr)
+    return 0
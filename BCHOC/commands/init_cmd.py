@@ -1,6 +1,6 @@
 from bchoc.storage import init_file
 
-def run_init() -> int:
+def run_init(args=None) -> int:
     created, msg = init_file()
     print(f"> {msg}")
     return 0
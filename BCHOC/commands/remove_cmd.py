@@ -2,78 +2,88 @@
 from datetime import datetime, timezone
 
 from bchoc.env import require_creator_password
-from bchoc.ids import item_id_to_enc32, enc32_to_case_uuid
-from bchoc.storage import get_latest_items, append_block
-
-TERMINAL_STATES = {"DISPOSED", "DESTROYED", "RELEASED"}
+from bchoc.ids import item_ids_to_enc32_many, enc32_to_case_uuid_many
+from bchoc.index import load_item_index
+from bchoc.models import TERMINAL_STATES, State
+from bchoc.storage import NewBlock, append_blocks, resolve_path, writer_lock
 
 def run_remove(args) -> int:
     # 1) Password must be CREATOR (exits with code 1 if invalid)
     require_creator_password(args.password)
 
-    # 2) Parse item id
+    # 2) Parse item ids
     try:
-        item_id_int = int(args.item_id)
+        item_ids_int = [int(x) for x in args.item_ids]
     except ValueError:
         print("> Item ID must be an integer")
         return 1
-
-    item_enc = item_id_to_enc32(item_id_int)
-
-    # 3) Get latest state
-    latest = get_latest_items()
-    if item_enc not in latest:
-        print(f"> Item {item_id_int} not found in blockchain.")
+    if len(set(item_ids_int)) != len(item_ids_int):
+        print("> Each item ID may only be given once")
         return 1
 
-    case_enc, state_bytes, creator_bytes, _owner_bytes = latest[item_enc]
-    state = state_bytes.rstrip(b"\x00").decode("ascii", errors="replace")
+    # Hold the writer lock so no item changes state between the checks and the write
+    with writer_lock(resolve_path()):
+        # 3) Latest state of every item; nothing is written unless all can be removed
+        items = load_item_index()
+        records = []
+        for item_id_int, item_enc in zip(item_ids_int, item_ids_to_enc32_many(item_ids_int)):
+            record = items.get(item_enc)
+            if record is None:
+                print(f"> Item {item_id_int} not found in blockchain.")
+                return 1
 
-    if state in TERMINAL_STATES:
-        print(f"> Item {item_id_int} is already in terminal state {state}.")
-        return 1
+            state = State.of(record.state)
+            if state in TERMINAL_STATES:
+                print(f"> Item {item_id_int} is already in terminal state {state.name}.")
+                return 1
 
-    if state != "CHECKEDIN":
-        print(f"> Item {item_id_int} must be CHECKEDIN to remove (current: {state}).")
-        return 1
+            if state is not State.CHECKEDIN:
+                print(f"> Item {item_id_int} must be CHECKEDIN to remove (current: {state.name}).")
+                return 1
 
-    # 4) Validate target state (reason from -y / --why)
-    target_state = args.state.upper()
-    if target_state not in TERMINAL_STATES:
-        print("> Invalid remove state. Use one of: DISPOSED, DESTROYED, RELEASED.")
-        return 1
+            records.append((item_enc, record))
 
-    # 5) Owner for RELEASED, blank otherwise
-    if target_state == "RELEASED":
-        if not getattr(args, "owner", None):
-            print("> Owner is required when state is RELEASED.")
+        # 4) Validate target state (reason from -y / --why)
+        target_state = args.state.upper()
+        if State.__members__.get(target_state) not in TERMINAL_STATES:
+            print("> Invalid remove state. Use one of: DISPOSED, DESTROYED, RELEASED.")
             return 1
-        owner_bytes = args.owner.encode("ascii")[:12]
-    else:
-        owner_bytes = b""
 
-    # 6) Append terminal state block
-    append_block(
-        case_id=case_enc,
-        item_id=item_enc,
-        state=target_state,
-        creator=creator_bytes.rstrip(b"\x00"),
-        owner=owner_bytes,
-        data=b"",  # you could store reason/owner text here if desired
-    )
+        # 5) Owner for RELEASED, blank otherwise
+        if target_state == "RELEASED":
+            if not getattr(args, "owner", None):
+                print("> Owner is required when state is RELEASED.")
+                return 1
+            owner_bytes = args.owner.encode("ascii")[:12]
+        else:
+            owner_bytes = b""
+
+        # 6) Append all terminal state blocks in a single write
+        append_blocks([
+            NewBlock(
+                case_id=record.case_id,
+                item_id=item_enc,
+                state=target_state,
+                creator=record.creator.rstrip(b"\x00"),
+                owner=owner_bytes,
+                data=b"",  # you could store reason/owner text here if desired
+            )
+            for item_enc, record in records
+        ])
 
     # 7) Output (include case + time for consistency)
-    case_str = enc32_to_case_uuid(case_enc)
+    case_strs = enc32_to_case_uuid_many([record.case_id for _item_enc, record in records])
     action_time = (
         datetime.now(timezone.utc)
         .isoformat(timespec="microseconds")
         .replace("+00:00", "Z")
     )
 
-    print(f"> Case: {case_str}")
-    print(f"> Item {item_id_int} marked as {target_state}.")
-    if target_state == "RELEASED":
-        print(f"> Released to: {args.owner}")
-    print(f"> Time of action: {action_time}")
+    for item_id_int, case_str in zip(item_ids_int, case_strs):
+        print(f"> Case: {case_str}")
+        print(f"> Item {item_id_int} marked as {target_state}.")
+        if target_state == "RELEASED":
+            print(f"> Released to: {args.owner}")
+        print(f"> Time of action: {action_time}")
 
     return 0
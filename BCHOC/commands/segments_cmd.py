@@ -0,0 +1,44 @@
+# bchoc/commands/segments_cmd.py
+import os
+
+from bchoc.env import SEGMENT_BLOCKS
+from bchoc.models import State
+from bchoc.segments import export_segments, load_segments
+from bchoc.storage import get_tip, resolve_path
+
+TRACKED_STATES = [State.CHECKEDIN, State.CHECKEDOUT, State.DISPOSED, State.DESTROYED, State.RELEASED]
+
+def run_segments(args) -> int:
+    # 1) The layout is opt-in and needs a chain
+    if SEGMENT_BLOCKS <= 0:
+        print("> Segmented layout is off (set BCHOC_SEGMENT_BLOCKS)")
+        return 1
+    if not os.path.exists(resolve_path()):
+        print("> Blockchain file not found.")
+        return 1
+    jobs = getattr(args, "jobs", None) or 1
+    if jobs < 1:
+        print("> --jobs must be at least 1")
+        return 1
+
+    # 2) Seal any full segments, then list them from their manifests
+    segments = load_segments(jobs=jobs)
+    for seg in segments:
+        first_block = seg.index * SEGMENT_BLOCKS
+        print(f"> Segment {seg.index}: blocks {first_block}-{first_block + seg.count - 1}"
+              f" (bytes {seg.start}-{seg.end}), {len(seg.cases)} cases")
+        print(f">   First block: {seg.first_hash.hex()}")
+        print(f">   Last block: {seg.last_hash.hex()}")
+        print(">   " + ", ".join(f"{state.name}: {seg.states[state]}" for state in TRACKED_STATES))
+
+    # 3) The open segment (no manifest until it fills up)
+    count = get_tip().count
+    sealed = len(segments) * SEGMENT_BLOCKS
+    print(f"> Open segment: {count - sealed} of {SEGMENT_BLOCKS} blocks")
+
+    # 4) Optional incremental export of the sealed segments
+    dest = getattr(args, "export", None)
+    if dest:
+        written, kept = export_segments(dest)
+        print(f"> Exported {written} segments to {dest} ({kept} already there)")
+    return 0
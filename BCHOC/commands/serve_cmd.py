@@ -0,0 +1,6 @@
+from bchoc.server import serve
+
+def run_serve(args) -> int:
+    # Runs until interrupted; clients reach it via BCHOC_SOCKET
+    serve(getattr(args, "socket", None))
+    return 0
@@ -1,7 +1,7 @@
 # bchoc/commands/show_cases_cmd.py
 from bchoc.env import get_role_for_password
-from bchoc.ids import enc32_to_case_uuid
-from bchoc.storage import iter_blocks
+from bchoc.ids import enc32_to_case_uuid_many
+from bchoc.state import load_state
 
 def run_show_cases(args) -> int:
     # Determine privilege level
@@ -13,32 +13,21 @@ def run_show_cases(args) -> int:
             return 1
         has_priv = True
 
-    # Build map: case_enc -> set(item_enc)
-    cases: dict[bytes, set[bytes]] = {}
-
-    for hdr, _data in iter_blocks():
-        state = hdr.state.rstrip(b"\x00").decode("ascii", errors="replace")
-        # Skip genesis block
-        if state == "INITIAL" and hdr.case_id == b"0" * 32 and hdr.item_id == b"0" * 32:
-            continue
-
-        if hdr.case_id not in cases:
-            cases[hdr.case_id] = set()
-        cases[hdr.case_id].add(hdr.item_id)
+    # Map case_enc -> set(item_enc), from the state snapshot plus newer blocks
+    cases = load_state().cases
 
     if not cases:
         print("> No cases in blockchain.")
         return 0
 
-    # Print results
-    for idx, (case_enc, items) in enumerate(cases.items(), start=1):
-        if has_priv:
-            try:
-                case_str = enc32_to_case_uuid(case_enc)
-            except Exception:
-                case_str = case_enc.hex()
-        else:
-            case_str = case_enc.hex()
+    # Print results (decrypting every case ID in one batch)
+    if has_priv:
+        case_ids = enc32_to_case_uuid_many(list(cases))
+    else:
+        case_ids = [None] * len(cases)
+
+    for idx, ((case_enc, items), case_id) in enumerate(zip(cases.items(), case_ids), start=1):
+        case_str = case_id if case_id is not None else case_enc.hex()
 
         print(f"> Case #{idx}")
         print(f">   Case ID      : {case_str}")
@@ -1,16 +1,20 @@
 # bchoc/commands/show_history_cmd.py
 import uuid
 from datetime import datetime, timezone
-from typing import List, Tuple, Optional
+from itertools import chain, islice
+from typing import Iterator, List, Optional
 
 from bchoc.env import get_role_for_password
 from bchoc.ids import (
     case_uuid_to_enc32,
     item_id_to_enc32,
-    enc32_to_case_uuid,
-    enc32_to_item_id,
+    enc32_to_case_uuid_many,
+    enc32_to_item_id_many,
 )
-from bchoc.storage import iter_blocks
+from bchoc.history import HistoryEntry, iter_history, make_cursor, parse_cursor
+
+# Entries decrypted and printed together
+HISTORY_BATCH = 256
 
 def _utc_iso(ts: float) -> str:
     """Convert timestamp float (seconds since epoch) to UTC ISO string with Z."""
@@ -20,6 +24,13 @@ def _utc_iso(ts: float) -> str:
         .replace("+00:00", "Z")
     )
 
+def _parse_time(value: str) -> float:
+    """ISO 8601 time (a trailing Z or no offset means UTC) as epoch seconds."""
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
 def run_show_history(args) -> int:
     # 1) Determine privilege from password
     has_priv = False
@@ -50,53 +61,90 @@ def run_show_history(args) -> int:
             return 1
         item_enc_filter = item_id_to_enc32(item_id_int)
 
-    # 4) Collect all matching entries in file order (oldest first)
-    entries: List[Tuple] = []
-    for hdr, _data in iter_blocks():
-        state = hdr.state.rstrip(b"\x00").decode("ascii", errors="replace")
-        # skip genesis
-        if state == "INITIAL" and hdr.case_id == b"0" * 32 and hdr.item_id == b"0" * 32:
-            continue
+    # 4) Optional page size (--limit) and cursor from a previous page (--after)
+    limit = getattr(args, "limit", None)
+    if limit is not None and limit < 1:
+        print("> --limit must be at least 1")
+        return 1
+
+    after: Optional[int] = None
+    if getattr(args, "after", None):
+        try:
+            after = parse_cursor(args.after)
+        except ValueError as e:
+            print(f"> {e}")
+            return 1
 
-        if case_enc_filter is not None and hdr.case_id != case_enc_filter:
-            continue
-        if item_enc_filter is not None and hdr.item_id != item_enc_filter:
-            continue
+    # 5) Optional time range (--since/--until, both inclusive)
+    since = until = None
+    try:
+        if getattr(args, "since", None):
+            since = _parse_time(args.since)
+        if getattr(args, "until", None):
+            until = _parse_time(args.until)
+    except ValueError:
+        print("> Invalid time (use ISO 8601, e.g. 2024-05-01T12:00:00Z)")
+        return 1
 
-        entries.append((hdr, state))
+    # 6) Stream matching entries, oldest-first or newest-first with -r;
+    #    with a case filter only that case's blocks are read
+    entries = iter_history(
+        case_enc_filter,
+        item_enc_filter,
+        reverse=getattr(args, "reverse", False),
+        after=after,
+        since=since,
+        until=until,
+    )
 
-    if not entries:
+    first = next(entries, None)
+    if first is None:
         print("> No history entries match the given filters.")
         return 0
+    entries = chain([first], entries)
+
+    # 7) Apply num_entries (-n) and page size (--limit); reading stops as
+    #    soon as enough entries have been printed
+    n = getattr(args, "num_entries", None)
+    if n is not None and n < 0:
+        entries = iter(list(entries)[:n])
+    elif n is not None:
+        entries = islice(entries, n)
+
+    page = islice(entries, limit) if limit is not None else entries
 
-    # 5) Apply reverse and num_entries (-n) options
-    if getattr(args, "reverse", False):
-        entries.reverse()
-
-    if getattr(args, "num_entries", None) is not None:
-        n = args.num_entries
-        if n < len(entries):
-            entries = entries[:n]
-
-    # 6) Print each entry
-    for hdr, state in entries:
-        if has_priv:
-            try:
-                case_str = enc32_to_case_uuid(hdr.case_id)
-            except Exception:
-                case_str = hdr.case_id.hex()
-            try:
-                item_str = str(enc32_to_item_id(hdr.item_id))
-            except Exception:
-                item_str = hdr.item_id.hex()
-        else:
-            case_str = hdr.case_id.hex()
-            item_str = hdr.item_id.hex()
+    last_offset = None
+    for batch in _batches(page, HISTORY_BATCH):
+        _print_entries(batch, has_priv)
+        last_offset = batch[-1].offset
+
+    # 8) More results than the page holds: print a cursor for the next page
+    if limit is not None and last_offset is not None and next(entries, None) is not None:
+        print(f"> Next: {make_cursor(last_offset)}")
+
+    return 0
+
+def _batches(entries: Iterator[HistoryEntry], size: int) -> Iterator[List[HistoryEntry]]:
+    while True:
+        batch = list(islice(entries, size))
+        if not batch:
+            return
+        yield batch
+
+def _print_entries(batch: List[HistoryEntry], has_priv: bool) -> None:
+    # Decrypt all displayed IDs in one batch, then print each entry
+    if has_priv:
+        case_ids = enc32_to_case_uuid_many([e.header.case_id for e in batch])
+        item_ids = enc32_to_item_id_many([e.header.item_id for e in batch])
+    else:
+        case_ids = item_ids = [None] * len(batch)
+
+    for (_offset, hdr), case_id, item_id in zip(batch, case_ids, item_ids):
+        case_str = case_id if case_id is not None else hdr.case_id.hex()
+        item_str = str(item_id) if item_id is not None else hdr.item_id.hex()
 
         print(f"> Case: {case_str}")
         print(f"> Item: {item_str}")
-        print(f"> Action: {state}")
+        print(f"> Action: {hdr.state_name}")
         print(f"> Time: {_utc_iso(hdr.timestamp)}")
         print()
-
-    return 0
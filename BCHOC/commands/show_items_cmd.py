@@ -3,7 +3,8 @@ import uuid
 
 from bchoc.env import get_role_for_password
 from bchoc.ids import case_uuid_to_enc32, enc32_to_item_id
-from bchoc.storage import get_latest_items
+from bchoc.index import case_blocks
+from bchoc.models import state_to_str
 
 def run_show_items(args) -> int:
     # 1) Validate case_id (must be UUID)
@@ -28,13 +29,13 @@ def run_show_items(args) -> int:
             return 1
         has_priv = True
 
-    # 3) Get latest items and filter by case_enc
-    all_latest = get_latest_items()
+    # 3) Latest block per item, reading only this case's blocks
+    latest = {}
+    for _offset, hdr in case_blocks(case_enc_filter):
+        latest[hdr.item_id] = hdr
     filtered = [
-        (item_enc, case_enc, state_bytes, creator_bytes, owner_bytes)
-        for item_enc, (case_enc, state_bytes, creator_bytes, owner_bytes)
-        in all_latest.items()
-        if case_enc == case_enc_filter
+        (item_enc, hdr.case_id, hdr.state, hdr.creator, hdr.owner)
+        for item_enc, hdr in latest.items()
     ]
 
     if not filtered:
@@ -43,9 +44,9 @@ def run_show_items(args) -> int:
 
     # 4) Print results
     for idx, (item_enc, case_enc, state_bytes, creator_bytes, owner_bytes) in enumerate(filtered, start=1):
-        state = state_bytes.rstrip(b"\x00").decode("ascii", errors="replace")
-        creator = creator_bytes.rstrip(b"\x00").decode("ascii", errors="replace") or "(none)"
-        owner = owner_bytes.rstrip(b"\x00").decode("ascii", errors="replace") or "(none)"
+        state = state_to_str(state_bytes)
+        creator = state_to_str(creator_bytes) or "(none)"
+        owner = state_to_str(owner_bytes) or "(none)"
 
         if has_priv:
             item_str = str(enc32_to_item_id(item_enc))
@@ -0,0 +1,25 @@
+# bchoc/commands/snapshot_cmd.py
+import os
+
+from bchoc.state import save_snapshot
+from bchoc.storage import resolve_path
+from bchoc.verify import verify_chain
+
+def run_snapshot(args) -> int:
+    # 1) Nothing to snapshot without a chain
+    if not os.path.exists(resolve_path()):
+        print("> Blockchain file not found.")
+        return 1
+    full = getattr(args, "full", False)
+
+    # 2) Item map and case sets (<file>.snap)
+    state = save_snapshot(full=full)
+    print(f"> Snapshot: {state.count} blocks, {len(state.items)} items, {len(state.cases)} cases")
+
+    # 3) Per-item state machine: verify saves its checkpoint when the chain is CLEAN
+    verifier = verify_chain(full=full)
+    if verifier.result() is None:
+        print(f"> Verify checkpoint: {verifier.count} blocks")
+    else:
+        print("> Verify checkpoint: not saved (run bchoc verify)")
+    return 0
@@ -1,10 +1,37 @@
 # bchoc/commands/summary_cmd.py
 import uuid
+from typing import Dict, Tuple
 
 from bchoc.ids import case_uuid_to_enc32
-from bchoc.storage import iter_blocks
+from bchoc.index import case_offsets
+from bchoc.models import State
+from bchoc.storage import load_headers_array, numpy_worthwhile, read_headers
 
-TRACKED_STATES = ["CHECKEDIN", "CHECKEDOUT", "DISPOSED", "DESTROYED", "RELEASED"]
+TRACKED_STATES = [State.CHECKEDIN, State.CHECKEDOUT, State.DISPOSED, State.DESTROYED, State.RELEASED]
+
+def _case_stats(offsets) -> Tuple[int, Dict[State, int]]:
+    """(unique items, blocks per tracked state) of the blocks at `offsets`."""
+    unique_items = set()
+    counts = {state: 0 for state in TRACKED_STATES}
+
+    for _offset, hdr in read_headers(offsets):
+        if hdr.code is State.INITIAL:
+            continue
+
+        unique_items.add(hdr.item_id)
+        if hdr.code in counts:
+            counts[hdr.code] += 1
+    return len(unique_items), counts
+
+def _case_stats_numpy(offsets) -> Tuple[int, Dict[State, int]]:
+    """Same as _case_stats(), vectorised."""
+    import numpy as np
+
+    headers = load_headers_array(offsets=offsets)
+    headers = headers[headers["code"] != State.INITIAL]
+    per_code = np.bincount(headers["code"], minlength=len(State))
+    counts = {state: int(per_code[state]) for state in TRACKED_STATES}
+    return len(np.unique(headers["item_id"])), counts
 
 def run_summary(args) -> int:
     # 1) Validate case UUID
@@ -17,31 +44,23 @@ def run_summary(args) -> int:
     # Encrypted version used to match blocks
     case_enc_filter = case_uuid_to_enc32(str(uuid_obj))
 
-    # 2) Iterate blocks and gather stats
-    unique_items = set()
-    counts = {state: 0 for state in TRACKED_STATES}
-
-    for hdr, _data in iter_blocks():
-        if hdr.case_id != case_enc_filter:
-            continue
-
-        state_str = hdr.state.rstrip(b"\x00").decode("ascii", errors="replace")
-        if state_str == "INITIAL":
-            continue
-
-        unique_items.add(hdr.item_id)
-        if state_str in counts:
-            counts[state_str] += 1
+    # 2) Gather stats over this case's blocks (via the case index),
+    #    vectorised when the case is big enough to be worth it
+    offsets = case_offsets(case_enc_filter)
+    if numpy_worthwhile(len(offsets)):
+        n_items, counts = _case_stats_numpy(offsets)
+    else:
+        n_items, counts = _case_stats(offsets)
 
     # 3) Handle case with no blocks
-    if not unique_items and all(v == 0 for v in counts.values()):
+    if not n_items and all(v == 0 for v in counts.values()):
         print(f"> No records found for case {args.case_id}")
         return 0
 
     # 4) Print summary
     print(f"> Case: {args.case_id}")
-    print(f"> Unique item IDs: {len(unique_items)}")
+    print(f"> Unique item IDs: {n_items}")
     for state in TRACKED_STATES:
-        print(f"> {state:9}: {counts[state]}")
+        print(f"> {state.name:9}: {counts[state]}")
 
     return 0
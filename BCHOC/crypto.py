@@ -1,17 +1,53 @@
 # bchoc/crypto.py
-from Crypto.Cipher import AES
+from typing import List, Sequence
+
+from . import stats
 from .env import AES_KEY
 
+# ECB keeps no state between blocks, so one cipher object serves every call.
+# It is created (and the AES backend imported) on first use, so commands
+# that never touch IDs do not pay for loading it.
+_CIPHER = None
+
+def _cipher():
+    global _CIPHER
+    if _CIPHER is None:
+        from Crypto.Cipher import AES
+        _CIPHER = AES.new(AES_KEY, AES.MODE_ECB)
+    return _CIPHER
+
+def _encrypt(buf: bytes) -> bytes:
+    stats.add("aes_calls")
+    stats.add("aes_fields", len(buf) // 32)
+    return stats.call("aes", _cipher().encrypt, buf)
+
+def _decrypt(buf: bytes) -> bytes:
+    stats.add("aes_calls")
+    stats.add("aes_fields", len(buf) // 32)
+    return stats.call("aes", _cipher().decrypt, buf)
+
 def _require_len(buf: bytes, n: int, label: str) -> None:
     if len(buf) != n:
         raise ValueError(f"{label} must be exactly {n} bytes (got {len(buf)})")
 
 def encrypt32(plain32: bytes) -> bytes:
     _require_len(plain32, 32, "plain32")
-    cipher = AES.new(AES_KEY, AES.MODE_ECB)
-    return cipher.encrypt(plain32)
+    return _encrypt(plain32)
 
 def decrypt32(enc32: bytes) -> bytes:
     _require_len(enc32, 32, "enc32")
-    cipher = AES.new(AES_KEY, AES.MODE_ECB)
-    return cipher.decrypt(enc32)
+    return _decrypt(enc32)
+
+def encrypt32_many(plains: Sequence[bytes]) -> List[bytes]:
+    """Encrypt many 32-byte fields with a single AES call."""
+    for plain32 in plains:
+        _require_len(plain32, 32, "plain32")
+    out = _encrypt(b"".join(plains))
+    return [out[i:i + 32] for i in range(0, len(out), 32)]
+
+def decrypt32_many(encs: Sequence[bytes]) -> List[bytes]:
+    """Decrypt many 32-byte fields with a single AES call."""
+    for enc32 in encs:
+        _require_len(enc32, 32, "enc32")
+    out = _decrypt(b"".join(encs))
+    return [out[i:i + 32] for i in range(0, len(out), 32)]
@@ -1,6 +1,7 @@
 # bchoc/env.py
 import os
-from typing import Optional, Literal
+import sys
+from typing import Literal, Optional, Set
 
 Role = Literal["POLICE", "LAWYER", "ANALYST", "EXECUTIVE", "CREATOR"]
 
@@ -14,29 +15,48 @@ _ENV_KEYS = {
 
 AES_KEY = b"R0chLi4uLi4uLi4="
 
-BLOCKCHAIN_FILE = os.environ.get("BCHOC_FILE_PATH", "bchoc.dat")
-
-# Load password values
-PW_POLICE     = os.getenv("BCHOC_PASSWORD_POLICE")
-PW_LAWYER     = os.getenv("BCHOC_PASSWORD_LAWYER")
-PW_ANALYST    = os.getenv("BCHOC_PASSWORD_ANALYST")
-PW_EXECUTIVE  = os.getenv("BCHOC_PASSWORD_EXECUTIVE")
-PW_CREATOR    = os.getenv("BCHOC_PASSWORD_CREATOR")
-
-# Creator-only password
-CREATOR_PASSWORD = PW_CREATOR
-
-# Owner-level passwords: (creator counts as owner)
-OWNER_PASSWORDS = {
-    pw for pw in [
-        PW_POLICE,
-        PW_LAWYER,
-        PW_ANALYST,
-        PW_EXECUTIVE,
-        PW_CREATOR,
-    ]
-    if pw is not None
-}
+def _env_int(name: str, default: int) -> int:
+    """
+    Non-negative integer setting `name`, or `default` (with a warning on
+    stderr) when it is not one. Read at import, so it must not raise:
+    a typo would otherwise break every command, --help included.
+    """
+    raw = os.environ.get(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        print(f"> Ignoring {name}={raw!r}: expected a non-negative integer, using {default}", file=sys.stderr)
+        return default
+    return value
+
+# Max entries per direction in the ID encryption caches (bchoc.ids)
+ID_CACHE_SIZE = _env_int("BCHOC_ID_CACHE_SIZE", 4096)
+
+# Blocks replayed past the state snapshot before it is rewritten (bchoc.state)
+SNAPSHOT_INTERVAL = _env_int("BCHOC_SNAPSHOT_INTERVAL", 4096)
+
+# Blocks per chain segment; 0 leaves the chain unsegmented (bchoc.segments)
+SEGMENT_BLOCKS = _env_int("BCHOC_SEGMENT_BLOCKS", 0)
+
+# The chain path and passwords are read when needed rather than at import
+def blockchain_file() -> str:
+    return os.environ.get("BCHOC_FILE_PATH", "bchoc.dat")
+
+def profile_setting() -> Optional[str]:
+    """BCHOC_PROFILE: "1" prints per-command stats; any other value is a cProfile output path."""
+    return os.environ.get("BCHOC_PROFILE") or None
+
+def creator_password() -> Optional[str]:
+    """Creator-only password."""
+    return os.getenv(_ENV_KEYS["CREATOR"])
+
+def owner_passwords() -> Set[str]:
+    """Owner-level passwords (creator counts as owner)."""
+    return {pw for pw in map(os.getenv, _ENV_KEYS.values()) if pw is not None}
 
 def get_role_for_password(pw: str) -> Optional[Role]:
     for role, env_name in _ENV_KEYS.items():
@@ -45,11 +65,11 @@ def get_role_for_password(pw: str) -> Optional[Role]:
     return None
 
 def require_creator_password(pw: str):
-    if pw != CREATOR_PASSWORD:
+    if pw != creator_password():
         print("> Invalid password")
         raise SystemExit(1)
 
 def require_owner_password(pw: str):
-    if pw not in OWNER_PASSWORDS:
+    if pw not in owner_passwords():
         print("> Invalid password")
         raise SystemExit(1)
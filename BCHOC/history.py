@@ -0,0 +1,182 @@
+# bchoc/history.py
+"""
+Streaming, resumable history queries.
+
+- iter_history(): matching (offset, Header) entries, oldest or newest
+  first, optionally starting after a cursor block and limited to a
+  time range
+- make_cursor() / parse_cursor(): opaque "<block hash>@<offset>" tokens
+
+A cursor names a block by its hash and carries its offset, so resuming
+seeks straight to it instead of rescanning; the hash is re-checked so a
+stale or forged cursor is rejected. A bare block hash is accepted too
+but has to be located with a scan.
+
+Block timestamps need not increase along the chain, so a time range is a
+filter, not a seek. On large chains (see storage.numpy_worthwhile()) the
+matching offsets are picked out of a header array in one vectorised pass
+and only those blocks are read. With the segmented layout on
+(bchoc.segments), sealed segments outside the time range are skipped.
+"""
+
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, NamedTuple, Optional
+
+from . import stats
+from .index import blocks_reverse, case_offsets
+from .segments import segment_spans
+from .storage import (
+    Header,
+    hash_block_at,
+    load_headers_array,
+    numpy_worthwhile,
+    read_headers,
+    resolve_path,
+    scan_blocks,
+    scan_offsets,
+)
+
+
+class HistoryEntry(NamedTuple):
+    offset: int
+    header: Header
+
+
+def make_cursor(offset: int, path: Optional[str] = None) -> str:
+    """Cursor token for the block at `offset`."""
+    block_hash, _end = hash_block_at(offset, path)
+    return f"{block_hash.hex()}@{offset}"
+
+def parse_cursor(token: str, path: Optional[str] = None) -> int:
+    """Offset of the block a cursor token points at (ValueError if it does not)."""
+    hash_hex, sep, offset_str = token.partition("@")
+    try:
+        want = bytes.fromhex(hash_hex)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {token}") from None
+    if len(want) != 32:
+        raise ValueError(f"Invalid cursor: {token}")
+
+    if sep:
+        try:
+            offset = int(offset_str)
+            block_hash, _end = hash_block_at(offset, path)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {token}") from None
+        if block_hash != want:
+            raise ValueError(f"Cursor does not match the chain: {token}")
+        return offset
+
+    # Bare block hash: find it the slow way
+    for blk in scan_blocks(path):
+        stats.add("hashes")
+        if hashlib.sha256(blk.raw).digest() == want:
+            return blk.offset
+    raise ValueError(f"Cursor block not found: {token}")
+
+def _select_time_range(
+    p: str,
+    case_id: Optional[bytes],
+    item_id: Optional[bytes],
+    since: Optional[float],
+    until: Optional[float],
+) -> Optional[List[int]]:
+    """
+    Offsets of the blocks that can match the filters and time range: the
+    exact matches, selected with NumPy, when there are enough candidates
+    to be worth it; otherwise the blocks of the segments overlapping the
+    range. None when neither narrows the scan.
+    """
+    spans = None
+    if case_id is not None:
+        offsets = case_offsets(case_id, p)
+    else:
+        spans = segment_spans(since, until, p)
+        if spans is None:
+            offsets = scan_offsets(p)
+        else:
+            offsets = array("Q")
+            for start, end in spans:
+                offsets += scan_offsets(p, start=start, end=end)
+    if not numpy_worthwhile(len(offsets)):
+        return None if spans is None else offsets.tolist()
+    import numpy as np
+
+    headers = load_headers_array(p, offsets=offsets)
+    keep = np.ones(len(headers), dtype=bool)
+    if since is not None:
+        keep &= headers["timestamp"] >= since
+    if until is not None:
+        keep &= headers["timestamp"] <= until
+    if item_id is not None:
+        keep &= headers["item_id"] == np.void(item_id)
+    return headers["offset"][keep].tolist()
+
+def iter_history(
+    case_id: Optional[bytes] = None,
+    item_id: Optional[bytes] = None,
+    *,
+    reverse: bool = False,
+    after: Optional[int] = None,
+    end: Optional[int] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    path: Optional[str] = None,
+) -> Iterator[HistoryEntry]:
+    """
+    Non-genesis blocks matching the (encrypted) case/item filters, in file
+    order or newest first. `after` is a cursor block offset (see
+    parse_cursor); entries resume just past it in the chosen direction.
+    `end` ignores blocks at or beyond that byte offset (a chain snapshot).
+    `since`/`until` keep blocks whose timestamp (epoch seconds) lies in
+    that range, both ends included.
+    """
+    p = resolve_path(path)
+
+    selected = None
+    if since is not None or until is not None:
+        selected = _select_time_range(p, case_id, item_id, since, until)
+
+    if selected is not None:
+        if reverse:
+            before = after
+            if end is not None and (before is None or end < before):
+                before = end
+            hi = len(selected) if before is None else bisect_left(selected, before)
+            source = read_headers(reversed(selected[:hi]), p)
+        else:
+            lo = 0 if after is None else bisect_right(selected, after)
+            hi = len(selected) if end is None else bisect_left(selected, end)
+            source = read_headers(selected[lo:hi], p)
+    elif reverse:
+        before = after
+        if end is not None and (before is None or end < before):
+            before = end
+        source = blocks_reverse(case_id, p, before=before)
+    elif case_id is not None:
+        offsets = case_offsets(case_id, p)
+        lo = 0 if after is None else bisect_right(offsets, after)
+        hi = len(offsets) if end is None else bisect_left(offsets, end)
+        source = read_headers(offsets[lo:hi], p)
+    else:
+        start = 0 if after is None else hash_block_at(after, p)[1]
+        source = (
+            (blk.offset, blk.header)
+            for blk in scan_blocks(p, headers_only=True, start=start, end=end)
+        )
+
+    for offset, hdr in source:
+        # skip genesis
+        if hdr.is_genesis():
+            continue
+        if case_id is not None and hdr.case_id != case_id:
+            continue
+        if item_id is not None and hdr.item_id != item_id:
+            continue
+        if since is not None and hdr.timestamp < since:
+            continue
+        if until is not None and hdr.timestamp > until:
+            continue
+        yield HistoryEntry(offset, hdr)
@@ -1,7 +1,85 @@
 # bchoc/ids.py
 import uuid
-from .crypto import encrypt32, decrypt32
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence
 
+from .crypto import encrypt32, encrypt32_many, decrypt32, decrypt32_many
+from .env import ID_CACHE_SIZE
+
+# ---------------- ID caches ----------------
+#
+# AES-ECB under a fixed key is deterministic, so plaintext <-> ciphertext
+# pairs never change. Both directions are memoized in bounded LRUs.
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def get(self, key: Hashable):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        while len(self._data) > max(maxsize, 0):
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+_CASE_TO_ENC = _LRU(ID_CACHE_SIZE)
+_ENC_TO_CASE = _LRU(ID_CACHE_SIZE)
+_ITEM_TO_ENC = _LRU(ID_CACHE_SIZE)
+_ENC_TO_ITEM = _LRU(ID_CACHE_SIZE)
+
+_CACHES = {
+    "case_to_enc": _CASE_TO_ENC,
+    "enc_to_case": _ENC_TO_CASE,
+    "item_to_enc": _ITEM_TO_ENC,
+    "enc_to_item": _ENC_TO_ITEM,
+}
+
+def set_id_cache_size(maxsize: int) -> None:
+    """Resize every ID cache (0 disables caching)."""
+    for cache in _CACHES.values():
+        cache.resize(maxsize)
+
+def clear_id_caches() -> None:
+    for cache in _CACHES.values():
+        cache.clear()
+
+def id_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters and sizes per cache direction."""
+    return {
+        name: {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "size": len(cache._data),
+            "maxsize": cache.maxsize,
+        }
+        for name, cache in _CACHES.items()
+    }
+
+# ---------------- Conversions ----------------
 def _pad32(raw: bytes) -> bytes:
     if len(raw) > 32:
         raise ValueError("value longer than 32 bytes")
@@ -10,23 +88,51 @@ def _pad32(raw: bytes) -> bytes:
 def _strip_zeros(raw32: bytes, expected: int) -> bytes:
     if len(raw32) != 32:
         raise ValueError("must be 32 bytes")
-    core = raw32.rstrip(b"\x00")
-    if len(core) != expected:
+    # The value itself may end in zero bytes (e.g. item 256), so only the padding is checked
+    core, padding = raw32[:expected], raw32[expected:]
+    if padding.strip(b"\x00"):
         raise ValueError("unexpected length after unpad")
     return core
 
 def case_uuid_to_enc32(case_id: str) -> bytes:
+    enc32 = _CASE_TO_ENC.get(case_id)
+    if enc32 is not None:
+        return enc32
     try:
         u = uuid.UUID(case_id)
     except Exception as e:
         raise ValueError(f"Invalid UUID: {case_id}") from e
     plain32 = _pad32(u.bytes)
-    return encrypt32(plain32)
+    enc32 = encrypt32(plain32)
+    _CASE_TO_ENC.put(case_id, enc32)
+    _ENC_TO_CASE.put(enc32, str(u))
+    return enc32
 
 def enc32_to_case_uuid(enc32: bytes) -> str:
+    case_str = _ENC_TO_CASE.get(enc32)
+    if case_str is not None:
+        return case_str
     plain32 = decrypt32(enc32)
     raw16 = _strip_zeros(plain32, 16)
-    return str(uuid.UUID(bytes=raw16))
+    case_str = str(uuid.UUID(bytes=raw16))
+    _ENC_TO_CASE.put(enc32, case_str)
+    return case_str
+
+def enc32_to_case_uuid_many(encs: Sequence[bytes]) -> List[Optional[str]]:
+    """Batch enc32_to_case_uuid; None where a field does not decode to a UUID."""
+    out: List[Optional[str]] = [_ENC_TO_CASE.get(enc32) for enc32 in encs]
+    missing = list(dict.fromkeys(enc32 for enc32, case_str in zip(encs, out) if case_str is None))
+    if missing:
+        decoded: Dict[bytes, str] = {}
+        for enc32, plain32 in zip(missing, decrypt32_many(missing)):
+            try:
+                decoded[enc32] = str(uuid.UUID(bytes=_strip_zeros(plain32, 16)))
+            except ValueError:
+                continue
+            _ENC_TO_CASE.put(enc32, decoded[enc32])
+        out = [case_str if case_str is not None else decoded.get(enc32)
+               for enc32, case_str in zip(encs, out)]
+    return out
 
 def _int_to_4(n: int) -> bytes:
     if not (0 <= n <= 0xFFFFFFFF):
@@ -39,11 +145,45 @@ def _4_to_int(b: bytes) -> int:
     return int.from_bytes(b, "big", signed=False)
 
 def item_id_to_enc32(item_id: int) -> bytes:
+    enc32 = _ITEM_TO_ENC.get(item_id)
+    if enc32 is not None:
+        return enc32
     raw4 = _int_to_4(item_id)
     plain32 = _pad32(raw4)
-    return encrypt32(plain32)
+    enc32 = encrypt32(plain32)
+    _ITEM_TO_ENC.put(item_id, enc32)
+    _ENC_TO_ITEM.put(enc32, item_id)
+    return enc32
+
+def item_ids_to_enc32_many(item_ids: Sequence[int]) -> List[bytes]:
+    """
+    Batch item_id_to_enc32 in one AES call. Bulk callers (bchoc import) see
+    each ID once, so this bypasses the ID caches rather than flushing them.
+    """
+    return encrypt32_many([_pad32(_int_to_4(item_id)) for item_id in item_ids])
 
 def enc32_to_item_id(enc32: bytes) -> int:
+    item_id = _ENC_TO_ITEM.get(enc32)
+    if item_id is not None:
+        return item_id
     plain32 = decrypt32(enc32)
     raw4 = _strip_zeros(plain32, 4)
-    return _4_to_int(raw4)
+    item_id = _4_to_int(raw4)
+    _ENC_TO_ITEM.put(enc32, item_id)
+    return item_id
+
+def enc32_to_item_id_many(encs: Sequence[bytes]) -> List[Optional[int]]:
+    """Batch enc32_to_item_id; None where a field does not decode to an item ID."""
+    out: List[Optional[int]] = [_ENC_TO_ITEM.get(enc32) for enc32 in encs]
+    missing = list(dict.fromkeys(enc32 for enc32, item_id in zip(encs, out) if item_id is None))
+    if missing:
+        decoded: Dict[bytes, int] = {}
+        for enc32, plain32 in zip(missing, decrypt32_many(missing)):
+            try:
+                decoded[enc32] = _4_to_int(_strip_zeros(plain32, 4))
+            except ValueError:
+                continue
+            _ENC_TO_ITEM.put(enc32, decoded[enc32])
+        out = [item_id if item_id is not None else decoded.get(enc32)
+               for enc32, item_id in zip(encs, out)]
+    return out
@@ -0,0 +1,476 @@
+# bchoc/index.py
+"""
+On-disk item-state index kept next to the blockchain file.
+
+<file>.idx maps each encrypted item ID to its latest (case, state,
+creator, owner, block offset). <file>.cases/ holds one file per
+encrypted case ID listing the offsets of that case's blocks, so per-case
+queries only read the case's own blocks. Both are stamped with the chain
+tip they were built for; if a stamp does not match storage.get_tip() that
+index is rebuilt from the chain, under the writer lock so that no append
+lands halfway through. <file>.off lists the offset of every
+block so the chain (or one case) can be read newest-first. The indexes
+are caches: where they cannot be written (a read-only location), queries
+are answered from a scan of the chain instead.
+
+- load_item_index(): {item_id_enc: ItemRecord}, rebuilt if stale
+- lookup_item(): latest ItemRecord for one item (or None)
+- case_offsets(): block offsets for one case, rebuilt if stale
+- case_blocks(): (offset, Header) for one case's blocks, in chain order
+- blocks_reverse(): (offset, Header) newest first, optionally for one case
+- update_indexes(): called by storage.append_blocks() after each write
+
+update_indexes() also seals the chain segment an append fills up, when
+the segmented layout is on (see bchoc.segments).
+"""
+
+import os
+import shutil
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .env import SEGMENT_BLOCKS
+from .storage import (
+    Header,
+    Tip,
+    cache_lock,
+    get_tip,
+    read_headers,
+    resolve_path,
+    scan_blocks,
+    scan_offsets,
+)
+
+# ---------------- Binary layout ----------------
+#
+# Index header:  4s     32s       Q
+#                magic  tip_hash  block_count
+#
+# Then one record per appended block (later records win):
+#
+# 32s      32s      12s    12s      12s    Q
+# item_id  case_id  state  creator  owner  offset
+# ---------------------------------------------------------
+
+INDEX_MAGIC = b"BCIX"
+INDEX_HEADER_FMT = "<4s 32s Q"
+INDEX_HEADER_SIZE = struct.calcsize(INDEX_HEADER_FMT)
+INDEX_RECORD_FMT = "<32s 32s 12s 12s 12s Q"
+INDEX_RECORD_SIZE = struct.calcsize(INDEX_RECORD_FMT)
+
+# <file>.cases/TIP uses the index header layout above (magic "BCCX");
+# <file>.cases/<case_id hex> is a flat array of little-endian Q offsets.
+CASES_MAGIC = b"BCCX"
+
+# <file>.off is the index header (magic "BCOX") followed by one Q offset per block
+OFFSETS_MAGIC = b"BCOX"
+OFFSETS_CHUNK = 4096
+
+
+class ItemRecord(NamedTuple):
+    case_id: bytes
+    state: bytes
+    creator: bytes
+    owner: bytes
+    offset: int
+
+
+def _index_path(p: str) -> str:
+    return p + ".idx"
+
+def _pack_record(item_id: bytes, rec: ItemRecord) -> bytes:
+    return struct.pack(
+        INDEX_RECORD_FMT,
+        item_id, rec.case_id, rec.state, rec.creator, rec.owner, rec.offset,
+    )
+
+def _scan_items(p: str) -> Dict[bytes, ItemRecord]:
+    """Rebuild the item map from the state snapshot plus the blocks after it."""
+    from .state import load_state  # bchoc.state builds on this module
+
+    return load_state(p).items
+
+def _write_index(p: str, tip: Tip, items: Dict[bytes, ItemRecord]) -> None:
+    buf = bytearray(struct.pack(INDEX_HEADER_FMT, INDEX_MAGIC, tip.hash, tip.count))
+    for item_id, rec in items.items():
+        buf += _pack_record(item_id, rec)
+    tmp = _index_path(p) + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, _index_path(p))
+    except OSError:
+        pass  # only a cache; the next load scans again
+
+def _read_index(p: str, tip: Tip) -> Optional[Tuple[Dict[bytes, ItemRecord], int]]:
+    """Parse <file>.idx if it is stamped with `tip`; returns (items, record_count)."""
+    try:
+        with open(_index_path(p), "rb") as f:
+            buf = f.read()
+    except OSError:
+        return None
+
+    if len(buf) < INDEX_HEADER_SIZE:
+        return None
+    magic, tip_hash, count = struct.unpack_from(INDEX_HEADER_FMT, buf, 0)
+    if magic != INDEX_MAGIC or tip_hash != tip.hash or count != tip.count:
+        return None
+    body = len(buf) - INDEX_HEADER_SIZE
+    if body % INDEX_RECORD_SIZE:
+        return None
+
+    items: Dict[bytes, ItemRecord] = {}
+    for item_id, case_id, state, creator, owner, offset in struct.iter_unpack(
+        INDEX_RECORD_FMT, memoryview(buf)[INDEX_HEADER_SIZE:]
+    ):
+        items[item_id] = ItemRecord(case_id, state, creator, owner, offset)
+    return items, body // INDEX_RECORD_SIZE
+
+# Item maps already loaded by this process, keyed by chain path and kept
+# with the tip they describe. A long-running process (bchoc serve) then
+# only re-reads <file>.idx when another writer has moved the tip.
+_ITEM_MEMO: Dict[str, Tuple[Tip, Dict[bytes, ItemRecord]]] = {}
+
+def _needs_compaction(items: Dict[bytes, ItemRecord], n_records: int) -> bool:
+    # Superseded records pile up as items change state; compact when they dominate
+    return n_records > 2 * len(items) + 64
+
+def _same_tip(a: Tip, b: Tip) -> bool:
+    return a.hash == b.hash and a.count == b.count
+
+# ---------------- Public API ----------------
+def load_item_index(path: Optional[str] = None) -> Dict[bytes, ItemRecord]:
+    """Latest record per encrypted item ID, in first-seen order (do not mutate)."""
+    p = resolve_path(path)
+    if not os.path.exists(p):
+        return {}
+
+    tip = get_tip(p)
+    memo = _ITEM_MEMO.get(p)
+    if memo is not None and _same_tip(memo[0], tip):
+        return memo[1]
+
+    loaded = _read_index(p, tip)
+    if loaded is not None and not _needs_compaction(*loaded):
+        items = loaded[0]
+    else:
+        # Rewrite under the writer lock so no append lands in between
+        with cache_lock(p) as locked:
+            tip = get_tip(p)
+            loaded = _read_index(p, tip)
+            if loaded is None:
+                items = _scan_items(p)
+                if locked:
+                    _write_index(p, tip, items)
+            else:
+                items = loaded[0]
+                if locked and _needs_compaction(*loaded):
+                    _write_index(p, tip, items)
+    _ITEM_MEMO[p] = (tip, items)
+    return items
+
+def lookup_item(item_id: bytes, path: Optional[str] = None) -> Optional[ItemRecord]:
+    return load_item_index(path).get(item_id)
+
+# ---------------- Case index ----------------
+def _cases_dir(p: str) -> str:
+    return p + ".cases"
+
+def _cases_stamp(p: str) -> str:
+    return os.path.join(_cases_dir(p), "TIP")
+
+def _case_file(p: str, case_id: bytes) -> str:
+    return os.path.join(_cases_dir(p), case_id.hex())
+
+def _stamped(stamp_path: str, magic: bytes, tip: Tip) -> bool:
+    try:
+        with open(stamp_path, "rb") as f:
+            head = f.read(INDEX_HEADER_SIZE)
+    except OSError:
+        return False
+    if len(head) != INDEX_HEADER_SIZE:
+        return False
+    return struct.unpack(INDEX_HEADER_FMT, head) == (magic, tip.hash, tip.count)
+
+def _write_stamp(stamp_path: str, magic: bytes, tip: Tip) -> None:
+    tmp = stamp_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack(INDEX_HEADER_FMT, magic, tip.hash, tip.count))
+    os.replace(tmp, stamp_path)
+
+def _rebuild_cases(p: str, tip: Tip) -> None:
+    """Rewrite <file>.cases/ from the chain (slow path)."""
+    cases: Dict[bytes, "array[int]"] = {}
+    for blk in scan_blocks(p, headers_only=True):
+        if blk.header.is_genesis():
+            continue
+        cases.setdefault(blk.header.case_id, array("Q")).append(blk.offset)
+
+    shutil.rmtree(_cases_dir(p), ignore_errors=True)
+    os.makedirs(_cases_dir(p))
+    for case_id, offsets in cases.items():
+        with open(_case_file(p, case_id), "wb") as f:
+            f.write(_le(offsets).tobytes())
+    # Stamp last: a crash mid-rebuild leaves no stamp, so we rebuild again
+    _write_stamp(_cases_stamp(p), CASES_MAGIC, tip)
+
+def _ensure_cases(p: str) -> bool:
+    """
+    Rebuild <file>.cases/ if it is not stamped with the current tip.
+    False if it cannot be (a read-only location): scan instead.
+    """
+    if _stamped(_cases_stamp(p), CASES_MAGIC, get_tip(p)):
+        return True
+    with cache_lock(p) as locked:
+        tip = get_tip(p)
+        if _stamped(_cases_stamp(p), CASES_MAGIC, tip):
+            return True
+        if locked:
+            try:
+                _rebuild_cases(p, tip)
+                return True
+            except OSError:
+                pass
+    return False
+
+def _scan_case(p: str, case_id: bytes) -> "array[int]":
+    """Offsets of one case's blocks, from the chain itself (no index)."""
+    return array("Q", (
+        blk.offset for blk in scan_blocks(p, headers_only=True)
+        if blk.header.case_id == case_id and not blk.header.is_genesis()
+    ))
+
+def _le(offsets: "array[int]") -> "array[int]":
+    if sys.byteorder != "little":
+        offsets = array("Q", offsets)
+        offsets.byteswap()
+    return offsets
+
+def case_offsets(case_id: bytes, path: Optional[str] = None) -> "array[int]":
+    """Offsets of every block recorded for `case_id`, oldest first."""
+    p = resolve_path(path)
+    offsets = array("Q")
+    if not os.path.exists(p):
+        return offsets
+
+    if not _ensure_cases(p):
+        return _scan_case(p, case_id)
+
+    try:
+        with open(_case_file(p, case_id), "rb") as f:
+            offsets.frombytes(f.read())
+    except OSError:
+        return offsets
+    return _le(offsets)
+
+def case_blocks(case_id: bytes, path: Optional[str] = None) -> Iterator[Tuple[int, Header]]:
+    """(offset, Header) for the blocks of one case, reading only those blocks."""
+    return read_headers(case_offsets(case_id, path), path)
+
+# ---------------- Offsets index ----------------
+def _offsets_path(p: str) -> str:
+    return p + ".off"
+
+def _rebuild_offsets(p: str, tip: Tip) -> None:
+    tmp = _offsets_path(p) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack(INDEX_HEADER_FMT, OFFSETS_MAGIC, tip.hash, tip.count))
+        f.write(_le(scan_offsets(p)).tobytes())
+    os.replace(tmp, _offsets_path(p))
+
+def _ensure_offsets(p: str) -> bool:
+    """
+    Rebuild <file>.off if it is not stamped with the current tip.
+    False if it cannot be (a read-only location): scan instead.
+    """
+    if _stamped(_offsets_path(p), OFFSETS_MAGIC, get_tip(p)):
+        return True
+    with cache_lock(p) as locked:
+        tip = get_tip(p)
+        if _stamped(_offsets_path(p), OFFSETS_MAGIC, tip):
+            return True
+        if locked:
+            try:
+                _rebuild_offsets(p, tip)
+                return True
+            except OSError:
+                pass
+    return False
+
+def _reverse_before(offsets: "array[int]", before: Optional[int]) -> Iterator[int]:
+    """Ascending `offsets` last one first, only those below `before` (no index)."""
+    if before is not None:
+        offsets = offsets[:bisect_left(offsets, before)]
+    return reversed(offsets)
+
+def _offset_at(f, pos: int) -> int:
+    f.seek(pos)
+    return struct.unpack("<Q", f.read(8))[0]
+
+def _read_offsets_reverse(
+    fname: str,
+    start: int,
+    before: Optional[int] = None,
+) -> Iterator[int]:
+    """
+    Q offsets stored in `fname` after byte `start`, last one first, read in
+    chunks. With `before`, binary-search the (ascending) file and only yield
+    offsets smaller than it.
+    """
+    try:
+        f = open(fname, "rb")
+    except OSError:
+        return
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        if (pos - start) % 8:
+            raise SystemExit(f"Corrupted index file {fname}.")
+        if before is not None:
+            lo, hi = 0, (pos - start) // 8
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if _offset_at(f, start + mid * 8) < before:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            pos = start + lo * 8
+        while pos > start:
+            n = min(OFFSETS_CHUNK * 8, pos - start)
+            pos -= n
+            f.seek(pos)
+            chunk = array("Q")
+            chunk.frombytes(f.read(n))
+            yield from reversed(_le(chunk))
+
+def blocks_reverse(
+    case_id: Optional[bytes] = None,
+    path: Optional[str] = None,
+    *,
+    before: Optional[int] = None,
+) -> Iterator[Tuple[int, Header]]:
+    """
+    (offset, Header) newest block first, reading offsets backwards from
+    <file>.off (or from the case's file when `case_id` is given), so taking
+    the last N blocks only touches those N blocks. `before` starts the walk
+    at the last block whose offset is below it.
+    """
+    p = resolve_path(path)
+    if not os.path.exists(p):
+        return iter(())
+
+    if case_id is not None:
+        if _ensure_cases(p):
+            offsets = _read_offsets_reverse(_case_file(p, case_id), 0, before)
+        else:
+            offsets = _reverse_before(_scan_case(p, case_id), before)
+    else:
+        if _ensure_offsets(p):
+            offsets = _read_offsets_reverse(_offsets_path(p), INDEX_HEADER_SIZE, before)
+        else:
+            offsets = _reverse_before(scan_offsets(p), before)
+    return read_headers(offsets, p)
+
+# ---------------- Append hook ----------------
+def update_indexes(
+    p: str,
+    old_tip: Tip,
+    new_tip: Tip,
+    written: List[Tuple[int, Header]],
+) -> None:
+    """
+    Record freshly appended blocks. Any index on disk that is not stamped
+    with `old_tip` is simply left stale and rebuilt on next load.
+    """
+    _update_item_memo(p, old_tip, new_tip, written)
+    _update_item_index(p, old_tip, new_tip, written)
+    _update_case_index(p, old_tip, new_tip, written)
+    _update_offsets_index(p, old_tip, new_tip, written)
+    _update_segments(p, old_tip, new_tip)
+
+def _update_segments(p: str, old_tip: Tip, new_tip: Tip) -> None:
+    # Roll over: write the manifest of each segment this append filled up
+    if SEGMENT_BLOCKS > 0 and new_tip.count // SEGMENT_BLOCKS > old_tip.count // SEGMENT_BLOCKS:
+        from .segments import load_segments
+        load_segments(p)
+
+def _update_offsets_index(
+    p: str,
+    old_tip: Tip,
+    new_tip: Tip,
+    written: List[Tuple[int, Header]],
+) -> None:
+    if not _stamped(_offsets_path(p), OFFSETS_MAGIC, old_tip):
+        return
+    with open(_offsets_path(p), "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        f.write(_le(array("Q", [offset for offset, _hdr in written])).tobytes())
+        f.seek(0)
+        f.write(struct.pack(INDEX_HEADER_FMT, OFFSETS_MAGIC, new_tip.hash, new_tip.count))
+
+def _update_case_index(
+    p: str,
+    old_tip: Tip,
+    new_tip: Tip,
+    written: List[Tuple[int, Header]],
+) -> None:
+    if not _stamped(_cases_stamp(p), CASES_MAGIC, old_tip):
+        return
+
+    added: Dict[bytes, "array[int]"] = {}
+    for offset, hdr in written:
+        if not hdr.is_genesis():
+            added.setdefault(hdr.case_id, array("Q")).append(offset)
+    for case_id, offsets in added.items():
+        with open(_case_file(p, case_id), "ab") as f:
+            f.write(_le(offsets).tobytes())
+    _write_stamp(_cases_stamp(p), CASES_MAGIC, new_tip)
+
+def _update_item_memo(
+    p: str,
+    old_tip: Tip,
+    new_tip: Tip,
+    written: List[Tuple[int, Header]],
+) -> None:
+    memo = _ITEM_MEMO.pop(p, None)
+    if memo is None or not _same_tip(memo[0], old_tip):
+        return
+    items = memo[1]
+    for offset, hdr in written:
+        if not hdr.is_genesis():
+            items[hdr.item_id] = ItemRecord(hdr.case_id, hdr.state, hdr.creator, hdr.owner, offset)
+    _ITEM_MEMO[p] = (new_tip, items)
+
+def _update_item_index(
+    p: str,
+    old_tip: Tip,
+    new_tip: Tip,
+    written: List[Tuple[int, Header]],
+) -> None:
+    try:
+        f = open(_index_path(p), "r+b")
+    except OSError:
+        return
+
+    with f:
+        head = f.read(INDEX_HEADER_SIZE)
+        if len(head) != INDEX_HEADER_SIZE:
+            return
+        magic, tip_hash, count = struct.unpack(INDEX_HEADER_FMT, head)
+        if magic != INDEX_MAGIC or tip_hash != old_tip.hash or count != old_tip.count:
+            return
+
+        buf = bytearray()
+        for offset, hdr in written:
+            if hdr.is_genesis():
+                continue
+            buf += _pack_record(
+                hdr.item_id,
+                ItemRecord(hdr.case_id, hdr.state, hdr.creator, hdr.owner, offset),
+            )
+        f.seek(0, os.SEEK_END)
+        f.write(buf)
+        f.seek(0)
+        f.write(struct.pack(INDEX_HEADER_FMT, INDEX_MAGIC, new_tip.hash, new_tip.count))
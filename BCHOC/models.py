@@ -1,6 +1,7 @@
 # bchoc/models.py
 import struct
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from enum import IntEnum
 from typing import Tuple
 
 # ---------------------------------------------------------------------------
@@ -8,23 +9,43 @@ from typing import Tuple
 #
 # 32s  : prev_hash (32 bytes)
 # d    : timestamp (8-byte double, UTC)
-# 32s  : case_id_enc (32 bytes, usually AES-ECB ciphertext-as-raw)
-# 32s  : item_id_enc (32 bytes, usually AES-ECB ciphertext-as-raw)
+# 32s  : case_id (32 bytes, usually AES-ECB ciphertext-as-raw)
+# 32s  : item_id (32 bytes, usually AES-ECB ciphertext-as-raw)
 # 12s  : state (ASCII, null-padded to 12 bytes)
 # 12s  : creator (ASCII, null-padded to 12 bytes)
 # 12s  : owner (ASCII, null-padded to 12 bytes)
-# I    : d_length (4-byte unsigned int; length of data that follows)
+# I    : data_length (4-byte unsigned int; length of data that follows)
 # ---------------------------------------------------------------------------
 
 HEADER_FMT = "32s d 32s 32s 12s 12s 12s I"
 HEADER_SIZE = struct.calcsize(HEADER_FMT)
+HEADER_STRUCT = struct.Struct(HEADER_FMT)
 
 def pad_state(name: str) -> bytes:
+    """Pad a state name (ASCII) to 12 bytes with NULs."""
     raw = name.encode("ascii")
     if len(raw) > 12:
         raise ValueError(f"state name '{name}' longer than 12 bytes")
     return raw + b"\x00" * (12 - len(raw))
 
+class State(IntEnum):
+    UNKNOWN    = 0
+    INITIAL    = 1
+    CHECKEDIN  = 2
+    CHECKEDOUT = 3
+    DISPOSED   = 4
+    DESTROYED  = 5
+    RELEASED   = 6
+
+    @staticmethod
+    def of(raw: bytes) -> "State":
+        """State for a 12-byte padded state field (UNKNOWN if unrecognised)."""
+        return _STATE_BY_RAW.get(raw, State.UNKNOWN)
+
+_STATE_BY_RAW = {pad_state(s.name): s for s in State if s is not State.UNKNOWN}
+
+TERMINAL_STATES = frozenset({State.DISPOSED, State.DESTROYED, State.RELEASED})
+
 # State constants (12-byte padded)
 STATE_INITIAL   = pad_state("INITIAL")
 STATE_CHECKEDIN = pad_state("CHECKEDIN")
@@ -33,56 +54,79 @@ STATE_DISPOSED  = pad_state("DISPOSED")
 STATE_DESTROYED = pad_state("DESTROYED")
 STATE_RELEASED  = pad_state("RELEASED")
 
+GENESIS_ID = b"0" * 32
+
 def state_to_str(state: bytes) -> str:
-    return state.rstrip(b"\x00").decode("ascii", errors="ignore")
+    return state.rstrip(b"\x00").decode("ascii", errors="replace")
 
-# Header and Block dataclasses
-@dataclass
+# Header and Block records
+@dataclass(slots=True)
 class Header:
     prev_hash: bytes
     timestamp: float
-    case_id_enc: bytes
-    item_id_enc: bytes
+    case_id: bytes
+    item_id: bytes
     state: bytes
     creator: bytes
     owner: bytes
-    d_length: int
+    data_length: int
+    # State decoded once at construction so scans compare small ints
+    code: State = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.code = _STATE_BY_RAW.get(self.state, State.UNKNOWN)
+
+    @property
+    def state_name(self) -> str:
+        if self.code is State.UNKNOWN:
+            return state_to_str(self.state)
+        return self.code.name
+
+    def is_genesis(self) -> bool:
+        return (
+            self.code is State.INITIAL
+            and self.case_id == GENESIS_ID
+            and self.item_id == GENESIS_ID
+        )
 
     def pack(self) -> bytes:
         """Pack the header into binary using HEADER_FMT."""
-        return struct.pack(
-            HEADER_FMT,
+        return HEADER_STRUCT.pack(
             self.prev_hash,
             self.timestamp,
-            self.case_id_enc,
-            self.item_id_enc,
+            self.case_id,
+            self.item_id,
             self.state,
             self.creator,
             self.owner,
-            self.d_length,
+            self.data_length,
         )
 
+    @staticmethod
+    def unpack(buf: bytes) -> "Header":
+        if len(buf) != HEADER_SIZE:
+            raise ValueError(f"header must be {HEADER_SIZE} bytes")
+        return Header(*HEADER_STRUCT.unpack(buf))
+
     @classmethod
     def unpack_from(cls, buf: bytes, offset: int) -> Tuple["Header", int]:
-        chunk = buf[offset:offset + HEADER_SIZE]
-        fields = struct.unpack(HEADER_FMT, chunk)
-        header = cls(*fields)
+        header = cls(*HEADER_STRUCT.unpack_from(buf, offset))
         return header, offset + HEADER_SIZE
 
-@dataclass
+@dataclass(slots=True)
 class Block:
     header: Header
     data: bytes
 
     def pack(self) -> bytes:
-        self.header.d_length = len(self.data)
+        self.header.data_length = len(self.data)
         return self.header.pack() + self.data
 
     @classmethod
     def unpack_from(cls, buf: bytes, offset: int) -> Tuple["Block", int]:
         header, after_header = Header.unpack_from(buf, offset)
         data_start = after_header
-        data_end = data_start + header.d_length
+        data_end = data_start + header.data_length
         data = buf[data_start:data_end]
         block = cls(header=header, data=data)
         return block, data_end
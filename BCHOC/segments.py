@@ -0,0 +1,278 @@
+# bchoc/segments.py
+"""
+Optional segmented layout: the chain cut into fixed-size segments, each
+described by a manifest.
+
+With BCHOC_SEGMENT_BLOCKS=N, blocks 0..N-1 form segment 0, N..2N-1
+segment 1, and so on. The chain file itself is not touched, so its
+bytes, hashes and every offset-keyed index stay exactly as they are. A
+full segment can never change again (the chain is append-only), so its
+manifest is written once to <file>.seg when it fills up (rollover) and
+kept: byte range, block count, hashes of its first and last block,
+blocks per state, and the time range and cases of its non-genesis blocks.
+The last, still filling segment has no manifest. The manifests are a
+cache: where <file>.seg cannot be written, they are built in memory.
+
+- load_segments(): manifests of the full segments, sealing new ones
+- segment_spans(): byte ranges worth scanning for a time range
+- export_segments(): copy sealed segments out as separate files
+
+show history --since/--until reads only the segments whose time range
+overlaps, and verify --jobs hashes one segment per task. Manifests for
+many segments at once (first use, or a rebuild) are built in a process
+pool with jobs > 1.
+"""
+
+import hashlib
+import math
+import os
+import struct
+from typing import FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from .env import SEGMENT_BLOCKS
+from .models import State
+from .storage import (
+    HEADER_SIZE,
+    cache_lock,
+    hash_block_at,
+    read_headers,
+    resolve_path,
+    scan_offsets,
+)
+
+# ---------------- Binary layout ----------------
+#
+# Header:  4s     Q               Q
+#          magic  segment_blocks  n_segments
+#
+# then per segment:
+#   Q      Q    Q      32s         Q            32s        d         d         Q * len(State)  I
+#   start  end  count  first_hash  last_offset  last_hash  min_time  max_time  states          n_cases
+# followed by n_cases * 32s case_id
+# ---------------------------------------------------------------
+
+SEGMENTS_MAGIC = b"BCSG"
+SEGMENTS_HEADER_FMT = "<4s Q Q"
+SEGMENTS_HEADER_SIZE = struct.calcsize(SEGMENTS_HEADER_FMT)
+SEGMENT_FMT = f"<Q Q Q 32s Q 32s d d {len(State)}Q I"
+SEGMENT_SIZE = struct.calcsize(SEGMENT_FMT)
+
+
+class Segment(NamedTuple):
+    index: int
+    start: int                 # offset of its first block
+    end: int                   # offset just past its last block
+    count: int                 # blocks
+    first_hash: bytes
+    last_offset: int
+    last_hash: bytes
+    min_time: float            # inf/-inf when it has only the genesis block
+    max_time: float
+    states: Tuple[int, ...]    # blocks per State code
+    cases: FrozenSet[bytes]    # encrypted case IDs
+
+
+def _manifest_path(p: str) -> str:
+    return p + ".seg"
+
+def _build_segment(p: str, index: int, offsets: Sequence[int]) -> Segment:
+    """Manifest for the blocks at `offsets` (also run in worker processes)."""
+    states = [0] * len(State)
+    cases = set()
+    min_time, max_time = math.inf, -math.inf
+    for _offset, hdr in read_headers(offsets, p):
+        states[hdr.code] += 1
+        if hdr.is_genesis():
+            continue
+        cases.add(hdr.case_id)
+        min_time = min(min_time, hdr.timestamp)
+        max_time = max(max_time, hdr.timestamp)
+
+    first_hash, _end = hash_block_at(offsets[0], p)
+    last_hash, end = hash_block_at(offsets[-1], p)
+    return Segment(
+        index, offsets[0], end, len(offsets), first_hash, offsets[-1], last_hash,
+        min_time, max_time, tuple(states), frozenset(cases),
+    )
+
+def _pack_manifests(segments: List[Segment]) -> bytes:
+    buf = bytearray(struct.pack(SEGMENTS_HEADER_FMT, SEGMENTS_MAGIC, SEGMENT_BLOCKS, len(segments)))
+    for seg in segments:
+        buf += struct.pack(
+            SEGMENT_FMT,
+            seg.start, seg.end, seg.count, seg.first_hash, seg.last_offset,
+            seg.last_hash, seg.min_time, seg.max_time, *seg.states, len(seg.cases),
+        )
+        buf += b"".join(sorted(seg.cases))
+    return bytes(buf)
+
+def _write_manifests(p: str, segments: List[Segment]) -> None:
+    buf = _pack_manifests(segments)
+    with cache_lock(p) as locked:
+        if not locked:
+            return
+        tmp = _manifest_path(p) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(buf)
+            os.replace(tmp, _manifest_path(p))
+        except OSError:
+            pass  # sealed again from the chain on the next load
+
+def _read_manifests(p: str) -> Optional[List[Segment]]:
+    """
+    Parse <file>.seg, or None if there is none, it is malformed, it was
+    cut for another segment size, or the chain no longer has its last
+    sealed block where the manifest says.
+    """
+    try:
+        with open(_manifest_path(p), "rb") as f:
+            buf = f.read()
+    except OSError:
+        return None
+
+    if len(buf) < SEGMENTS_HEADER_SIZE:
+        return None
+    magic, segment_blocks, n_segments = struct.unpack_from(SEGMENTS_HEADER_FMT, buf, 0)
+    if magic != SEGMENTS_MAGIC or segment_blocks != SEGMENT_BLOCKS:
+        return None
+
+    segments: List[Segment] = []
+    pos = SEGMENTS_HEADER_SIZE
+    for index in range(n_segments):
+        if pos + SEGMENT_SIZE > len(buf):
+            return None
+        fields = struct.unpack_from(SEGMENT_FMT, buf, pos)
+        pos += SEGMENT_SIZE
+        n_cases = fields[-1]
+        if pos + 32 * n_cases > len(buf):
+            return None
+        cases = frozenset(buf[i:i + 32] for i in range(pos, pos + 32 * n_cases, 32))
+        pos += 32 * n_cases
+        (start, end, count, first_hash, last_offset,
+         last_hash, min_time, max_time) = fields[:8]
+        segments.append(Segment(
+            index, start, end, count, first_hash, last_offset, last_hash,
+            min_time, max_time, tuple(fields[8:-1]), cases,
+        ))
+    if pos != len(buf):
+        return None
+
+    # The chain must still end its last sealed segment with the same block
+    if segments:
+        last = segments[-1]
+        try:
+            if hash_block_at(last.last_offset, p) != (last.last_hash, last.end):
+                return None
+        except ValueError:
+            return None
+    return segments
+
+# ---------------- Public API ----------------
+def load_segments(path: Optional[str] = None, *, jobs: int = 1) -> List[Segment]:
+    """
+    Manifests of every full segment, in chain order (empty when the layout
+    is off). Segments that filled up since the last call are sealed first,
+    built by `jobs` worker processes when there are several.
+    """
+    p = resolve_path(path)
+    if SEGMENT_BLOCKS <= 0 or not os.path.exists(p):
+        return []
+
+    segments = _read_manifests(p) or []
+    start = segments[-1].end if segments else 0
+    offsets = scan_offsets(p, start=start)
+    n_new = len(offsets) // SEGMENT_BLOCKS
+    if n_new == 0:
+        return segments
+
+    first = len(segments)
+    chunks = [offsets[i * SEGMENT_BLOCKS:(i + 1) * SEGMENT_BLOCKS] for i in range(n_new)]
+    if jobs > 1 and n_new > 1:
+        # Imported here: it pulls in multiprocessing, which one rollover never needs
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            segments += pool.map(_build_segment, [p] * n_new, range(first, first + n_new), chunks)
+    else:
+        segments += [_build_segment(p, first + i, chunk) for i, chunk in enumerate(chunks)]
+    _write_manifests(p, segments)
+    return segments
+
+def segment_spans(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    path: Optional[str] = None,
+) -> Optional[List[Tuple[int, Optional[int]]]]:
+    """
+    (start, end) byte ranges that can hold blocks timestamped between
+    `since` and `until`: the sealed segments whose time range overlaps,
+    merged when adjacent, then the open segment (end None, to the end of
+    the file). None when the layout is off.
+    """
+    p = resolve_path(path)
+    if SEGMENT_BLOCKS <= 0:
+        return None
+
+    spans: List[Tuple[int, Optional[int]]] = []
+    tail = 0
+    for seg in load_segments(p):
+        tail = seg.end
+        if since is not None and seg.max_time < since:
+            continue
+        if until is not None and seg.min_time > until:
+            continue
+        if spans and spans[-1][1] == seg.start:
+            spans[-1] = (spans[-1][0], seg.end)
+        else:
+            spans.append((seg.start, seg.end))
+
+    if spans and spans[-1][1] == tail:
+        spans[-1] = (spans[-1][0], None)
+    else:
+        spans.append((tail, None))
+    return spans
+
+def _exported(out: str, seg: Segment) -> bool:
+    """Whether `out` already holds this segment (right size, same last block)."""
+    try:
+        with open(out, "rb") as f:
+            if f.seek(0, os.SEEK_END) != seg.end - seg.start:
+                return False
+            f.seek(seg.last_offset - seg.start)
+            block = f.read(seg.end - seg.last_offset)
+    except OSError:
+        return False
+    return len(block) >= HEADER_SIZE and hashlib.sha256(block).digest() == seg.last_hash
+
+def export_segments(dest: str, path: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Copy each sealed segment to DEST/<file name>.<index> (six digits) and
+    the manifests to DEST/<file name>.seg. Segments already there are left
+    alone, so repeated exports only copy what was sealed since. The files
+    concatenated in order are the chain up to the open segment, byte for
+    byte. Returns (segments written, segments already there).
+    """
+    p = resolve_path(path)
+    segments = load_segments(p)
+    os.makedirs(dest, exist_ok=True)
+    base = os.path.basename(p)
+
+    written = 0
+    with open(p, "rb") as f:
+        for seg in segments:
+            out = os.path.join(dest, f"{base}.{seg.index:06d}")
+            if _exported(out, seg):
+                continue
+            f.seek(seg.start)
+            data = f.read(seg.end - seg.start)
+            with open(out + ".tmp", "wb") as g:
+                g.write(data)
+                g.flush()
+                os.fsync(g.fileno())
+            os.replace(out + ".tmp", out)
+            written += 1
+    if segments:
+        with open(os.path.join(dest, base + ".seg"), "wb") as f:
+            f.write(_pack_manifests(segments))
+    return written, len(segments) - written
@@ -0,0 +1,217 @@
+# bchoc/server.py
+"""
+Long-running bchoc daemon on a Unix domain socket.
+
+- serve(): load the cipher, chain tip and item index once, then run CLI
+  commands sent by clients (one at a time) against that warm process
+- make_server(): the bound, warmed-up server that serve() runs
+- forward(): client side; send one command line to a running daemon
+
+Protocol: one JSON object per line in each direction, any number of
+commands per connection. Each connection has its own thread, so a client
+that stays connected without sending anything holds up no one (and is
+dropped after IDLE_TIMEOUT seconds); the commands themselves still run
+one at a time, since each one changes directory and captures stdout.
+
+    request:  {"argv": ["checkout", "-i", "1", "-o", "Alice", "-p", "..."],
+               "file": "/abs/path/bchoc.dat", "cwd": "/abs/client/dir"}
+    response: {"rc": 0, "out": "...", "err": "..."}
+              {"error": "..."}   (not run; the client runs the command itself)
+
+The daemon serves the chain it was started on (BCHOC_FILE_PATH) with the
+role passwords from its own environment. Each command runs in the
+client's working directory, so relative paths in its arguments (import
+FILE, --profile FILE, segments --export DIR, bench -o/--dir) mean what
+they would locally. Anyone who can connect to the
+socket can run commands, so it is created mode 0600.
+
+Only the standard library and bchoc.env are imported at module level so
+the client path stays cheap; the daemon imports the commands in serve().
+"""
+
+import json
+import os
+import socket
+import threading
+from typing import List, Optional, Tuple
+
+from .env import blockchain_file
+
+DEFAULT_SOCKET = "bchoc.sock"
+
+# Seconds a connection may sit idle between requests before it is closed
+IDLE_TIMEOUT = 60.0
+
+# Held while a command runs: _run() changes the process's directory and stdout
+_RUN_LOCK = threading.Lock()
+
+def socket_path(path: Optional[str] = None) -> str:
+    """Socket path: explicit argument, then BCHOC_SOCKET, then ./bchoc.sock."""
+    return path or os.environ.get("BCHOC_SOCKET") or DEFAULT_SOCKET
+
+def chain_file() -> str:
+    """Absolute path of the chain this process would use (BCHOC_FILE_PATH)."""
+    return os.path.abspath(blockchain_file())
+
+# ---------------- Client ----------------
+def forward(argv: List[str], path: Optional[str] = None) -> Optional[Tuple[int, str, str]]:
+    """
+    Run `argv` on the daemon; returns (rc, stdout, stderr), or None when no
+    daemon is listening or it serves a different chain file.
+    """
+    request = json.dumps({"argv": list(argv), "file": chain_file(), "cwd": os.getcwd()}) + "\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path(path))
+            s.sendall(request.encode("utf-8"))
+            with s.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+
+    reply = json.loads(line)
+    if "error" in reply:
+        return None
+    return reply["rc"], reply["out"], reply["err"]
+
+# ---------------- Daemon ----------------
+def _run(argv: List[str], parser, cwd: Optional[str] = None) -> Tuple[int, str, str]:
+    """
+    Run one command line in-process from `cwd` (the client's directory),
+    capturing what it prints. Raises OSError if `cwd` cannot be entered.
+    """
+    import io
+    from contextlib import redirect_stderr, redirect_stdout
+
+    from .cli import dispatch
+
+    home = os.getcwd()
+    if cwd is not None:
+        os.chdir(cwd)
+    out, err = io.StringIO(), io.StringIO()
+    try:
+        with redirect_stdout(out), redirect_stderr(err):
+            # Same handling as __main__.main()
+            try:
+                rc = dispatch(argv, parser) or 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    rc = e.code or 0
+                else:
+                    print(e.code, file=err)
+                    rc = 1
+            except Exception as e:
+                print(f"Error: {e}")
+                rc = 1
+    finally:
+        os.chdir(home)
+    return rc, out.getvalue(), err.getvalue()
+
+def _warm_up():
+    """
+    Pay the one-off costs (imports, cipher, argument parser, tip, item
+    index) before serving; returns the parser to reuse for every request.
+    """
+    import importlib
+    import pkgutil
+
+    from . import commands
+    from .cli import build_parser
+    from .crypto import encrypt32
+    from .index import load_item_index
+    from .storage import resolve_path
+
+    # The CLI imports command modules lazily; a daemon wants them all up front
+    for module in pkgutil.iter_modules(commands.__path__):
+        importlib.import_module(f"{commands.__name__}.{module.name}")
+    encrypt32(bytes(32))  # creates the cipher
+
+    if os.path.exists(resolve_path()):
+        load_item_index()
+    return build_parser()
+
+def _in_use(path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+    except OSError:
+        return False
+    return True
+
+def make_server(path: Optional[str] = None):
+    """Bind the socket and warm up; returns the server, not yet serving."""
+    import socketserver
+
+    sock = socket_path(path)
+    if os.path.exists(sock):
+        if _in_use(sock):
+            raise SystemExit(f"> Already serving on {sock}")
+        os.unlink(sock)  # left behind by a daemon that died
+
+    # Commands run from the client's directory: pin the chain to its absolute path
+    served = chain_file()
+    os.environ["BCHOC_FILE_PATH"] = served
+    parser = _warm_up()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def setup(self) -> None:
+            self.timeout = IDLE_TIMEOUT
+            super().setup()
+
+        def handle(self) -> None:
+            try:
+                for line in self.rfile:
+                    self._reply(line)
+            except OSError:
+                pass  # idle too long, or the client went away
+
+        def _reply(self, line: bytes) -> None:
+            try:
+                request = json.loads(line)
+                argv = request["argv"]
+                cwd = request.get("cwd")
+                if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                    raise ValueError
+                if cwd is not None and not (isinstance(cwd, str) and os.path.isabs(cwd)):
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                reply = {"error": "malformed request"}
+            else:
+                if request.get("file", served) != served:
+                    reply = {"error": f"serving {served}"}
+                elif argv[:1] == ["serve"]:
+                    reply = {"error": "already serving"}
+                else:
+                    try:
+                        with _RUN_LOCK:
+                            rc, out, err = _run(argv, parser, cwd)
+                    except OSError:
+                        reply = {"error": f"cannot enter {cwd}"}
+                    else:
+                        reply = {"rc": rc, "out": out, "err": err}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    old_umask = os.umask(0o177)
+    try:
+        return Server(sock, Handler)
+    finally:
+        os.umask(old_umask)
+
+def serve(path: Optional[str] = None) -> None:
+    """Serve commands on the socket until interrupted. Commands run one at a time."""
+    server = make_server(path)
+    sock = server.server_address
+    print(f"> Serving {chain_file()} on {sock}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(sock)
@@ -0,0 +1,276 @@
+# bchoc/state.py
+"""
+Snapshot of the state derived from the chain, for cheap cold starts.
+
+<file>.snap holds, as of one block boundary, the latest ItemRecord per
+item and the set of items seen in each case, together with the offset and
+hash of the block it ends with and a SHA-256 of the chain bytes up to
+there. load_state() reads it, checks that the chain still has that block
+there and re-hashes the prefix (so a block edited in place is noticed, as
+for verify's checkpoint), then replays only the blocks appended since. A
+missing or mismatched snapshot is ignored and the state rebuilt from
+genesis. The digest carries no key: the snapshot is trusted as far as the
+chain file next to it is, since whoever can rewrite one can rewrite both.
+
+- load_state(): ChainState for the whole chain (snapshot + replay)
+- save_snapshot(): bring <file>.snap up to date with the chain
+
+A load that had to replay SNAPSHOT_INTERVAL blocks or more saves a new
+snapshot itself, so the replay stays short however long the chain gets.
+That save is best-effort: where it cannot be written (a read-only
+location) the load still returns the replayed state.
+The tip sidecar, the item index and show cases are rebuilt from here.
+Long replays (a cold start without a snapshot) are vectorised with NumPy
+when it is installed; see storage.numpy_worthwhile().
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from .env import SNAPSHOT_INTERVAL
+from .index import INDEX_RECORD_FMT, INDEX_RECORD_SIZE, ItemRecord
+from .models import GENESIS_ID, State
+from .storage import (
+    cache_lock,
+    hash_block_at,
+    load_headers_array,
+    numpy_worthwhile,
+    read_headers,
+    resolve_path,
+    scan_offsets,
+    writer_lock,
+)
+
+# ---------------- Binary layout ----------------
+#
+# Header:  4s     Q    Q      32s       Q           32s            Q        Q
+#          magic  end  count  tip_hash  tip_offset  prefix_digest  n_items  n_cases
+#
+# then n_items index records (index.INDEX_RECORD_FMT, first-seen order),
+# then per case (first-seen order):  32s      I        n * 32s
+#                                    case_id  n_items  item_id
+# ---------------------------------------------------------------
+
+SNAPSHOT_MAGIC = b"BCS2"
+SNAPSHOT_HEADER_FMT = "<4s Q Q 32s Q 32s Q Q"
+SNAPSHOT_HEADER_SIZE = struct.calcsize(SNAPSHOT_HEADER_FMT)
+SNAPSHOT_CASE_FMT = "<32s I"
+SNAPSHOT_CASE_SIZE = struct.calcsize(SNAPSHOT_CASE_FMT)
+
+
+@dataclass
+class ChainState:
+    end: int = 0                     # chain bytes covered (a block boundary)
+    count: int = 0                   # blocks in that prefix
+    tip_hash: bytes = b"\x00" * 32   # hash of its last block
+    tip_offset: int = 0              # offset of its last block
+    items: Dict[bytes, ItemRecord] = field(default_factory=dict)
+    cases: Dict[bytes, Set[bytes]] = field(default_factory=dict)
+
+
+def _snapshot_path(p: str) -> str:
+    return p + ".snap"
+
+def _prefix_digest(p: str, end: int) -> Optional[bytes]:
+    """SHA-256 of the chain's first `end` bytes, or None if it is shorter."""
+    with open(p, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return hashlib.sha256().digest() if end == 0 else None  # empty file
+    with mm:
+        if len(mm) < end:
+            return None
+        with memoryview(mm) as view:
+            return hashlib.sha256(view[:end]).digest()
+
+def _replay(p: str, state: ChainState) -> int:
+    """Apply the blocks after state.end to `state`; returns how many there were."""
+    offsets = scan_offsets(p, start=state.end)
+    if numpy_worthwhile(len(offsets)):
+        _apply_numpy(p, state, offsets)
+    else:
+        _apply(p, state, offsets)
+
+    n = len(offsets)
+    if n:
+        state.tip_hash, state.end = hash_block_at(offsets[-1], p)
+        state.tip_offset = offsets[-1]
+        state.count += n
+    return n
+
+def _apply(p: str, state: ChainState, offsets) -> None:
+    items, cases = state.items, state.cases
+    for offset, hdr in read_headers(offsets, p):
+        if hdr.is_genesis():
+            continue
+        items[hdr.item_id] = ItemRecord(hdr.case_id, hdr.state, hdr.creator, hdr.owner, offset)
+        case_items = cases.get(hdr.case_id)
+        if case_items is None:
+            case_items = cases[hdr.case_id] = set()
+        case_items.add(hdr.item_id)
+
+def _apply_numpy(p: str, state: ChainState, offsets) -> None:
+    """_apply() with one Python step per item and per (case, item) pair, not per block."""
+    import numpy as np
+
+    headers = load_headers_array(p, offsets=offsets)
+    genesis = (
+        (headers["code"] == State.INITIAL)
+        & (headers["case_id"] == np.void(GENESIS_ID))
+        & (headers["item_id"] == np.void(GENESIS_ID))
+    )
+    headers = headers[~genesis]
+    n = len(headers)
+    if n == 0:
+        return
+
+    # Latest block per item, items in order of their first block
+    _ids, first, item_of = np.unique(headers["item_id"], return_index=True, return_inverse=True)
+    last = np.zeros(len(first), dtype=np.intp)
+    np.maximum.at(last, item_of, np.arange(n))
+    latest = headers[last[np.argsort(first)]]
+    records = zip(
+        _column(latest, "case_id"),
+        _column(latest, "state"),
+        _column(latest, "creator"),
+        _column(latest, "owner"),
+        latest["offset"].tolist(),
+    )
+    items = state.items
+    for item_id, record in zip(_column(latest, "item_id"), records):
+        items[item_id] = ItemRecord(*record)
+
+    # Items per case, (case, item) pairs in order of their first block
+    _cases, case_of = np.unique(headers["case_id"], return_inverse=True)
+    pair_of = case_of.astype(np.int64) * len(first) + item_of
+    _pairs, pair_first = np.unique(pair_of, return_index=True)
+    pairs = headers[np.sort(pair_first)]
+    cases = state.cases
+    for case_id, item_id in zip(_column(pairs, "case_id"), _column(pairs, "item_id")):
+        case_items = cases.get(case_id)
+        if case_items is None:
+            case_items = cases[case_id] = set()
+        case_items.add(item_id)
+
+def _column(headers, name: str) -> List[bytes]:
+    """A void-typed header field as a list of bytes, via one copy."""
+    raw = headers[name].tobytes()
+    size = headers.dtype[name].itemsize
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+def _write_snapshot(p: str, state: ChainState) -> None:
+    digest = _prefix_digest(p, state.end)
+    if digest is None:
+        return  # the file shrank under us; nothing consistent to save
+    buf = bytearray(struct.pack(
+        SNAPSHOT_HEADER_FMT,
+        SNAPSHOT_MAGIC,
+        state.end,
+        state.count,
+        state.tip_hash,
+        state.tip_offset,
+        digest,
+        len(state.items),
+        len(state.cases),
+    ))
+    pack_record = struct.Struct(INDEX_RECORD_FMT).pack
+    for item_id, rec in state.items.items():
+        buf += pack_record(item_id, *rec)
+    for case_id, case_items in state.cases.items():
+        buf += struct.pack(SNAPSHOT_CASE_FMT, case_id, len(case_items))
+        buf += b"".join(case_items)
+
+    # Under the writer lock so concurrent saves do not share the tmp file
+    with writer_lock(p):
+        tmp = _snapshot_path(p) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, _snapshot_path(p))
+
+def _read_snapshot(p: str) -> Optional[ChainState]:
+    """
+    Parse <file>.snap, or None if there is none, it is malformed, or the
+    chain no longer has the snapshot's last block where it says it ends.
+    """
+    try:
+        with open(_snapshot_path(p), "rb") as f:
+            buf = f.read()
+    except OSError:
+        return None
+
+    if len(buf) < SNAPSHOT_HEADER_SIZE:
+        return None
+    (magic, end, count, tip_hash, tip_offset,
+     digest, n_items, n_cases) = struct.unpack_from(SNAPSHOT_HEADER_FMT, buf, 0)
+    items_end = SNAPSHOT_HEADER_SIZE + n_items * INDEX_RECORD_SIZE
+    if magic != SNAPSHOT_MAGIC or count == 0 or len(buf) < items_end:
+        return None
+
+    # The prefix must still end with the block the snapshot was taken at
+    try:
+        block_hash, block_end = hash_block_at(tip_offset, p)
+    except ValueError:
+        return None
+    if block_hash != tip_hash or block_end != end:
+        return None
+    # ... and the bytes before it must be the ones the snapshot was built from
+    if _prefix_digest(p, end) != digest:
+        return None
+
+    state = ChainState(end, count, tip_hash, tip_offset)
+    view = memoryview(buf)
+    for item_id, case_id, st, creator, owner, offset in struct.iter_unpack(
+        INDEX_RECORD_FMT, view[SNAPSHOT_HEADER_SIZE:items_end]
+    ):
+        state.items[item_id] = ItemRecord(case_id, st, creator, owner, offset)
+
+    pos = items_end
+    for _ in range(n_cases):
+        if pos + SNAPSHOT_CASE_SIZE > len(buf):
+            return None
+        case_id, n = struct.unpack_from(SNAPSHOT_CASE_FMT, buf, pos)
+        pos += SNAPSHOT_CASE_SIZE
+        if pos + 32 * n > len(buf):
+            return None
+        state.cases[case_id] = {buf[i:i + 32] for i in range(pos, pos + 32 * n, 32)}
+        pos += 32 * n
+    if pos != len(buf):
+        return None
+    return state
+
+# ---------------- Public API ----------------
+def load_state(path: Optional[str] = None, *, full: bool = False) -> ChainState:
+    """
+    State of the whole chain: the snapshot plus the blocks after it, or a
+    replay from genesis when `full` is set or there is no usable snapshot.
+    """
+    p = resolve_path(path)
+    state = None if full else _read_snapshot(p)
+    if state is None:
+        state = ChainState()
+    if _replay(p, state) >= SNAPSHOT_INTERVAL:
+        # Only a cache: where it cannot be written, the next load replays again
+        with cache_lock(p) as locked:
+            if locked:
+                try:
+                    _write_snapshot(p, state)
+                except OSError:
+                    pass
+    return state
+
+def save_snapshot(path: Optional[str] = None, *, full: bool = False) -> ChainState:
+    """Write <file>.snap for the chain as it is now; returns the state saved."""
+    p = resolve_path(path)
+    with writer_lock(p):
+        state = None if full else _read_snapshot(p)
+        if state is None:
+            state = ChainState()
+        _replay(p, state)
+        if state.count:
+            _write_snapshot(p, state)
+    return state
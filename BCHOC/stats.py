@@ -0,0 +1,131 @@
+# bchoc/stats.py
+"""
+Hot-path counters and timers, reported per command.
+
+- add(): bump a counter (blocks scanned, bytes scanned, hashes, AES calls)
+- call() / timed(): run a function, adding its time to a named timer
+- run(): run one command with stats enabled, optionally under cProfile,
+  then print the report to stderr
+
+Counters are plain dict updates and always on; hot loops update them once
+per scan rather than per block. Timers cost a clock read per call, so
+call() and timed() only measure while ENABLED is set, i.e. inside run().
+`bchoc --stats ...`, `bchoc --profile FILE ...` and BCHOC_PROFILE
+(see cli.dispatch) turn it on.
+"""
+
+import sys
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+ENABLED = False
+
+_counters: Dict[str, int] = {}
+_timers: Dict[str, float] = {}
+
+# Report order; anything else is listed after these
+COUNTERS = (
+    "blocks_scanned",
+    "bytes_scanned",
+    "offsets_scanned",
+    "headers_read",
+    "hashes",
+    "aes_calls",
+    "aes_fields",
+)
+TIMERS = ("import", "read", "decode", "sha256", "aes")
+
+def add(name: str, n: int = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + n
+
+def call(name: str, fn: Callable, *args):
+    """fn(*args), timed under `name` when stats are enabled."""
+    if not ENABLED:
+        return fn(*args)
+    start = perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        _timers[name] = _timers.get(name, 0.0) + perf_counter() - start
+
+def timed(name: str, fn: Callable) -> Callable:
+    """
+    `fn` itself, or a wrapper timing every call under `name` when stats
+    are enabled. Fetch it once before a loop rather than per iteration.
+    """
+    if not ENABLED:
+        return fn
+
+    def wrapper(*args):
+        start = perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            _timers[name] = _timers.get(name, 0.0) + perf_counter() - start
+    return wrapper
+
+def reset() -> None:
+    _counters.clear()
+    _timers.clear()
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    return {"counters": dict(_counters), "timers": dict(_timers)}
+
+def run(fn: Callable, args, *, title: str, profile: Optional[str] = None):
+    """Run fn(args) with stats on; report to stderr and dump cProfile stats to `profile`."""
+    global ENABLED
+    reset()
+    ids_before = _id_cache_stats()
+    ENABLED = True
+    start = perf_counter()
+    try:
+        if profile is None:
+            return fn(args)
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, args)
+        finally:
+            profiler.dump_stats(profile)
+    finally:
+        wall = perf_counter() - start
+        ENABLED = False
+        report(title, wall, ids_before, profile)
+
+def _id_cache_stats() -> Dict[str, Dict[str, int]]:
+    # Only if bchoc.ids is already loaded; importing it would load the AES backend
+    ids = sys.modules.get("bchoc.ids")
+    return ids.id_cache_stats() if ids is not None else {}
+
+def report(
+    title: str,
+    wall: float,
+    ids_before: Dict[str, Dict[str, int]],
+    profile: Optional[str] = None,
+    file=None,
+) -> None:
+    out = file or sys.stderr
+    print(f"> Stats: {title}", file=out)
+    print(f">   {'wall':<16}{wall * 1000:10.3f} ms", file=out)
+
+    timed_total = 0.0
+    for name in _ordered(TIMERS, _timers):
+        timed_total += _timers[name]
+        print(f">   {name:<16}{_timers[name] * 1000:10.3f} ms", file=out)
+    print(f">   {'other':<16}{max(wall - timed_total, 0.0) * 1000:10.3f} ms", file=out)
+
+    for name in _ordered(COUNTERS, _counters):
+        print(f">   {name:<16}{_counters[name]:10d}", file=out)
+
+    # ID cache hits/misses during this command (the caches outlive it in bchoc serve)
+    for cache, s in _id_cache_stats().items():
+        before = ids_before.get(cache, {"hits": 0, "misses": 0})
+        hits = s["hits"] - before["hits"]
+        misses = s["misses"] - before["misses"]
+        print(f">   {cache:<16}{hits:10d} hits, {misses} misses", file=out)
+
+    if profile is not None:
+        print(f"> cProfile stats written to {profile}", file=out)
+
+def _ordered(preferred, values: Dict) -> list:
+    return [k for k in preferred if k in values] + sorted(k for k in values if k not in preferred)
@@ -4,41 +4,62 @@ Low-level binary I/O for the blockchain file.
 
 - init_file(): create file + INITIAL (genesis) block if missing
 - iter_blocks(): iterate (Header, data) over all blocks
+- scan_blocks(): zero-copy mmap iteration, optionally headers only
+- scan_offsets(): block boundaries from the data_length fields alone
+- read_headers(): headers at known block offsets
+- load_headers_array(): all (or some) headers as a NumPy structured array
+- numpy_worthwhile(): whether a scan is big enough to vectorise
+- hash_block_at(): hash of the block at a known offset
 - append_block(): append a new block linked by prev_hash
-- get_latest_items(): map latest state per item_id
+- append_blocks(): append several blocks in one write + fsync
+- writer_lock(): exclusive fcntl lock serialising appends across processes
+- cache_lock(): writer_lock for reads that refresh a sidecar, if it can be taken
+- GroupCommitter: merges appends from concurrent writers into one write + fsync
+- get_tip(): last block hash/offset, cached in a <file>.tip sidecar
 """
 
+import importlib.util
+import mmap
 import os
 import struct
+import sys
+import threading
 import time
 import hashlib
+from array import array
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Iterator, Tuple, Dict, Optional
-
-from .env import BLOCKCHAIN_FILE
-
-# ---------------- Binary layout ----------------
-#
-# 32s  d  32s     32s     12s    12s     12s     I
-# prev ts case_id item_id state  creator owner  data_length
-# ---------------------------------------------------------
-
-HEADER_FMT = "32s d 32s 32s 12s 12s 12s I"
-HEADER_SIZE = struct.calcsize(HEADER_FMT)
-
-
-def pad_state(name: str) -> bytes:
-    """Pad a state name (ASCII) to 12 bytes with NULs."""
-    raw = name.encode("ascii")
-    if len(raw) > 12:
-        raise ValueError("state name too long")
-    return raw + b"\x00" * (12 - len(raw))
+from typing import Iterable, Iterator, List, NamedTuple, Tuple, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: appends are not locked
+    fcntl = None
+
+from . import stats
+from .env import blockchain_file
+from .models import (
+    HEADER_FMT,
+    HEADER_SIZE,
+    HEADER_STRUCT as _HEADER_STRUCT,
+    Header,
+    State,
+    pad_state,
+)
+
+# Header layout and state codes live in bchoc.models (re-exported here)
+_DATA_LENGTH = struct.Struct("I")
+_DATA_LENGTH_POS = HEADER_SIZE - _DATA_LENGTH.size
 
 def _zero32() -> bytes:
     return b"\x00" * 32
 
 def _hash_block(header_bytes: bytes, data: bytes) -> bytes:
     """Compute SHA-256 hash of header+data (full block)."""
+    stats.add("hashes")
+    return stats.call("sha256", _sha256_pair, header_bytes, data)
+
+def _sha256_pair(header_bytes: bytes, data: bytes) -> bytes:
     h = hashlib.sha256()
     h.update(header_bytes)
     h.update(data)
@@ -48,39 +69,155 @@ def resolve_path(path: Optional[str] = None) -> str:
     """Blockchain file path from argument or env or default."""
     if path is not None:
         return path
-    return BLOCKCHAIN_FILE
+    return blockchain_file()
+
+# ---------------- Tip sidecar ----------------
+#
+# <file>.tip remembers where the chain ends so an append does not need
+# to rehash every block to find its prev_hash.
+#
+# 32s   Q            Q            Q     q
+# hash  last_offset  block_count  size  mtime_ns
+# ---------------------------------------------
+
+TIP_FMT = "<32s Q Q Q q"
+TIP_SIZE = struct.calcsize(TIP_FMT)
+
 
-# ---------------- Header dataclass ----------------
 @dataclass
-class Header:
-    prev_hash: bytes
-    timestamp: float
-    case_id: bytes
-    item_id: bytes
-    state: bytes
-    creator: bytes
-    owner: bytes
-    data_length: int
+class Tip:
+    hash: bytes       # sha256 of the last block (zeros if the file is empty)
+    offset: int       # byte offset of the last block
+    count: int        # number of blocks in the file
+    size: int         # file size the tip was computed for
+    mtime_ns: int     # file mtime the tip was computed for
 
     def pack(self) -> bytes:
         return struct.pack(
-            HEADER_FMT,
-            self.prev_hash,
-            self.timestamp,
-            self.case_id,
-            self.item_id,
-            self.state,
-            self.creator,
-            self.owner,
-            self.data_length,
+            TIP_FMT, self.hash, self.offset, self.count, self.size, self.mtime_ns
         )
 
     @staticmethod
-    def unpack(buf: bytes) -> "Header":
-        if len(buf) != HEADER_SIZE:
-            raise ValueError(f"header must be {HEADER_SIZE} bytes")
-        fields = struct.unpack(HEADER_FMT, buf)
-        return Header(*fields)
+    def unpack(buf: bytes) -> "Tip":
+        if len(buf) != TIP_SIZE:
+            raise ValueError(f"tip record must be {TIP_SIZE} bytes")
+        return Tip(*struct.unpack(TIP_FMT, buf))
+
+
+def _tip_path(p: str) -> str:
+    return p + ".tip"
+
+def _scan_tip(p: str) -> Tip:
+    """Rebuild the tip from the state snapshot plus the blocks after it (slow path)."""
+    from .state import load_state  # bchoc.state builds on this module
+
+    state = load_state(p)
+    st = os.stat(p)
+    return Tip(state.tip_hash, state.tip_offset, state.count, st.st_size, st.st_mtime_ns)
+
+def _read_tip(p: str) -> Optional[Tip]:
+    """Load the sidecar tip, or None if it is missing or stale."""
+    try:
+        with open(_tip_path(p), "rb") as f:
+            tip = Tip.unpack(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
+
+    st = os.stat(p)
+    if st.st_size != tip.size or st.st_mtime_ns != tip.mtime_ns:
+        return None
+    if tip.count == 0:
+        return tip if st.st_size == 0 else None
+
+    # Size/mtime match; confirm the recorded last block really hashes to tip.hash
+    with open(p, "rb") as f:
+        f.seek(tip.offset)
+        header_bytes = f.read(HEADER_SIZE)
+        if len(header_bytes) != HEADER_SIZE:
+            return None
+        hdr = Header.unpack(header_bytes)
+        if tip.offset + HEADER_SIZE + hdr.data_length != tip.size:
+            return None
+        data = f.read(hdr.data_length)
+    if _hash_block(header_bytes, data) != tip.hash:
+        return None
+    return tip
+
+def _write_tip(p: str, tip: Tip) -> None:
+    # The sidecar is only a cache: where it cannot be written, reads rescan
+    tmp = _tip_path(p) + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(tip.pack())
+        os.replace(tmp, _tip_path(p))
+    except OSError:
+        pass
+
+def get_tip(path: Optional[str] = None) -> Tip:
+    """Current chain tip, from the sidecar when it matches the file."""
+    p = resolve_path(path)
+    tip = _read_tip(p)
+    if tip is None:
+        # Rebuild under the writer lock so we never scan a half-written append
+        with cache_lock(p) as locked:
+            tip = _read_tip(p)
+            if tip is None:
+                tip = _scan_tip(p)
+                if locked:
+                    _write_tip(p, tip)
+    return tip
+
+# ---------------- Writer lock ----------------
+#
+# Appends read the tip and then write after it; two writers doing that at
+# once would both link to the same parent. <file>.lock is held with an
+# exclusive flock around the read-tip/write/update-sidecars sequence.
+# The lock is re-entrant per thread.
+
+_lock_state = threading.local()
+
+def _lock_path(p: str) -> str:
+    return p + ".lock"
+
+@contextmanager
+def _locked(p: str, best_effort: bool) -> Iterator[bool]:
+    held = getattr(_lock_state, "held", None)
+    if held is None:
+        held = _lock_state.held = set()
+    if p in held or fcntl is None:
+        yield True
+        return
+
+    try:
+        f = open(_lock_path(p), "a+b")
+    except OSError:
+        if not best_effort:
+            raise
+        yield False
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        held.add(p)
+        try:
+            yield True
+        finally:
+            held.discard(p)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def writer_lock(path: Optional[str] = None) -> Iterator[None]:
+    with _locked(resolve_path(path), best_effort=False):
+        yield
+
+@contextmanager
+def cache_lock(path: Optional[str] = None) -> Iterator[bool]:
+    """
+    writer_lock for reads that refresh a cache sidecar. Yields whether it
+    is held: where the lock file cannot be created (a read-only location)
+    it yields False, and the caller answers from memory without writing.
+    """
+    with _locked(resolve_path(path), best_effort=True) as locked:
+        yield locked
 
 # ---------------- Genesis (INITIAL) block ----------------
 def _genesis_block() -> Tuple[Header, bytes]:
@@ -120,37 +257,286 @@ def init_file(path: Optional[str] = None) -> Tuple[bool, str]:
     p = resolve_path(path)
 
     if not os.path.exists(p):
-        header, data = _genesis_block()
-        with open(p, "wb") as f:
-            f.write(header.pack())
-            f.write(data)
-        return True, "Blockchain file not found. Created INITIAL block."
+        with writer_lock(p):
+            # Another writer may have created it while we waited for the lock
+            if not os.path.exists(p):
+                header, data = _genesis_block()
+                header_bytes = header.pack()
+                with open(p, "wb") as f:
+                    f.write(header_bytes)
+                    f.write(data)
+                st = os.stat(p)
+                _write_tip(p, Tip(_hash_block(header_bytes, data), 0, 1, st.st_size, st.st_mtime_ns))
+                return True, "Blockchain file not found. Created INITIAL block."
 
     with open(p, "rb") as f:
         first = f.read(HEADER_SIZE)
         if len(first) != HEADER_SIZE:
             raise SystemExit("Corrupted blockchain file (short header).")
         hdr = Header.unpack(first)
-        state = hdr.state.rstrip(b"\x00").decode("ascii", errors="replace")
-        if state != "INITIAL" or hdr.case_id != b"0" * 32 or hdr.item_id != b"0" * 32:
+        if not hdr.is_genesis():
             raise SystemExit("Invalid genesis block (not INITIAL with zero IDs).")
 
     return False, "Blockchain file found with INITIAL block."
 
 def iter_blocks(path: Optional[str] = None) -> Iterator[Tuple[Header, bytes]]:
+    p = resolve_path(path)
+    blocks = nbytes = 0
+    with open(p, "rb") as f:
+        read = stats.timed("read", f.read)
+        unpack = stats.timed("decode", Header.unpack)
+        try:
+            while True:
+                header_bytes = read(HEADER_SIZE)
+                if not header_bytes:
+                    break
+                if len(header_bytes) != HEADER_SIZE:
+                    raise SystemExit("Corrupted blockchain file (trailing header).")
+                hdr = unpack(header_bytes)
+                data = read(hdr.data_length)
+                if len(data) != hdr.data_length:
+                    raise SystemExit("Corrupted blockchain file (truncated data).")
+                blocks += 1
+                nbytes += HEADER_SIZE + hdr.data_length
+                yield hdr, data
+        finally:
+            stats.add("blocks_scanned", blocks)
+            stats.add("bytes_scanned", nbytes)
+
+def scan_offsets(
+    path: Optional[str] = None,
+    *,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> "array[int]":
+    """
+    Offsets of every block from `start` to the end of the file (or to byte
+    `end`, a block boundary).
+
+    Only each header's data_length field is read, so this is much cheaper
+    than decoding full headers.
+    """
+    p = resolve_path(path)
+    offsets = array("Q")
+    with open(p, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return offsets  # empty file
+    with mm:
+        size = len(mm) if end is None else min(end, len(mm))
+        offset = start
+        unpack_from = _DATA_LENGTH.unpack_from
+        while offset < size:
+            if offset + HEADER_SIZE > size:
+                raise SystemExit("Corrupted blockchain file (trailing header).")
+            offsets.append(offset)
+            offset += HEADER_SIZE + unpack_from(mm, offset + _DATA_LENGTH_POS)[0]
+        if offset > size:
+            raise SystemExit("Corrupted blockchain file (truncated data).")
+    stats.add("offsets_scanned", len(offsets))
+    return offsets
+
+def read_headers(
+    offsets: Iterable[int],
+    path: Optional[str] = None,
+) -> Iterator[Tuple[int, Header]]:
+    """(offset, Header) for each given block offset, read straight from an mmap."""
+    p = resolve_path(path)
+    with open(p, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+    unpack_from = stats.timed("decode", _HEADER_STRUCT.unpack_from)
+    n = 0
+    with mm:
+        size = len(mm)
+        try:
+            for offset in offsets:
+                if offset + HEADER_SIZE > size:
+                    raise SystemExit("Corrupted blockchain file (trailing header).")
+                n += 1
+                yield offset, Header(*unpack_from(mm, offset))
+        finally:
+            stats.add("headers_read", n)
+
+# ---------------- NumPy header arrays ----------------
+#
+# numpy is optional and only load_headers_array() imports it. Importing it
+# cold costs more than the vectorised pass saves until a scan reaches
+# ~200k headers, so callers ask numpy_worthwhile() first and otherwise
+# keep their Python loops.
+
+# Headers below which a Python loop beats importing numpy
+NUMPY_MIN_HEADERS = 200_000
+
+_HEADER_FIELDS = ("prev_hash", "timestamp", "case_id", "item_id", "state", "creator", "owner", "data_length")
+_NUMPY_FORMATS = {"32s": "V32", "12s": "V12", "d": "=f8", "I": "=u4"}
+
+# Headers gathered per step when they are not stored back to back
+GATHER_CHUNK = 8192
+
+def numpy_worthwhile(n_headers: int, min_headers: int = NUMPY_MIN_HEADERS) -> bool:
+    """Whether to vectorise over `n_headers` headers: numpy is loaded, or installed and n >= min_headers."""
+    if "numpy" in sys.modules:
+        return True
+    return n_headers >= min_headers and importlib.util.find_spec("numpy") is not None
+
+def _row_dtype(np):
+    """load_headers_array() row: the block offset, the header as on disk, its State code."""
+    codes = HEADER_FMT.split()
+    offsets = [
+        8 + struct.calcsize(" ".join(codes[:i + 1])) - struct.calcsize(code)
+        for i, code in enumerate(codes)
+    ]
+    return np.dtype({
+        "names": ["offset", *_HEADER_FIELDS, "code"],
+        "formats": ["=u8", *(_NUMPY_FORMATS[code] for code in codes), "u1"],
+        "offsets": [0, *offsets, 8 + HEADER_SIZE],
+        "itemsize": 8 + HEADER_SIZE + 1,
+    })
+
+def load_headers_array(
+    path: Optional[str] = None,
+    *,
+    offsets: Optional[Iterable[int]] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+):
+    """
+    Block headers as a NumPy structured array, one row per block: its
+    offset, every header field (IDs and padded strings as raw void bytes)
+    and `code`, the State of its state field. Covers the blocks between
+    `start` and `end`, or only those at `offsets`. Raises ImportError
+    when numpy is not installed.
+
+    Boundaries come from scan_offsets(); runs of headers stored back to
+    back (no payload between them) are copied out of the mmap in one go.
+    See numpy_worthwhile() for when this beats read_headers().
+    """
+    import numpy as np
+
+    p = resolve_path(path)
+    if offsets is None:
+        offsets = scan_offsets(p, start=start, end=end)
+    offs = np.asarray(offsets, dtype=np.uint64)
+    n = len(offs)
+    rows = np.empty(n, _row_dtype(np))
+    if n == 0:
+        return rows
+
+    # Each row's header bytes, copied in as they are on disk
+    raw = rows.view(np.uint8).reshape(n, rows.itemsize)[:, 8:8 + HEADER_SIZE]
+    with open(p, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with mm:
+        if int(offs.max()) + HEADER_SIZE > len(mm):
+            raise SystemExit("Corrupted blockchain file (trailing header).")
+        buf = np.frombuffer(mm, np.uint8)
+        runs = np.concatenate(([0], np.flatnonzero(np.diff(offs) != HEADER_SIZE) + 1, [n])).tolist()
+        if len(runs) <= n // 8:
+            for lo, hi in zip(runs, runs[1:]):
+                first = int(offs[lo])
+                raw[lo:hi] = buf[first:first + (hi - lo) * HEADER_SIZE].reshape(hi - lo, HEADER_SIZE)
+        else:
+            # Mostly blocks with payloads: gather each header's bytes instead
+            cols = np.arange(HEADER_SIZE)
+            for lo in range(0, n, GATHER_CHUNK):
+                chunk = offs[lo:lo + GATHER_CHUNK].astype(np.intp)
+                raw[lo:lo + len(chunk)] = buf[chunk[:, None] + cols]
+        del buf  # the map cannot close while a view of it exists
+    stats.add("headers_read", n)
+
+    rows["offset"] = offs
+    code = rows["code"]
+    code[:] = State.UNKNOWN
+    raw_state = rows["state"]
+    for state in State:
+        if state is not State.UNKNOWN:
+            code[raw_state == np.void(pad_state(state.name))] = state
+    return rows
+
+def hash_block_at(offset: int, path: Optional[str] = None) -> Tuple[bytes, int]:
+    """(sha256, end offset) of the block starting at `offset`."""
     p = resolve_path(path)
     with open(p, "rb") as f:
-        while True:
-            header_bytes = f.read(HEADER_SIZE)
-            if not header_bytes:
-                break
-            if len(header_bytes) != HEADER_SIZE:
+        f.seek(offset)
+        header_bytes = f.read(HEADER_SIZE)
+        if len(header_bytes) != HEADER_SIZE:
+            raise ValueError(f"no block at offset {offset}")
+        hdr = Header.unpack(header_bytes)
+        data = f.read(hdr.data_length)
+        if len(data) != hdr.data_length:
+            raise ValueError(f"no block at offset {offset}")
+    return _hash_block(header_bytes, data), offset + HEADER_SIZE + hdr.data_length
+
+@dataclass
+class NewBlock:
+    """A block waiting to be appended (prev_hash/timestamp filled in on write)."""
+    case_id: bytes
+    item_id: bytes
+    state: str
+    creator: bytes
+    owner: bytes
+    data: bytes = b""
+
+class BlockView(NamedTuple):
+    """One block as seen through scan_blocks(); views are only valid while scanning."""
+    offset: int
+    header: Header
+    data: Optional[memoryview]   # payload slice (None when headers_only)
+    raw: Optional[memoryview]    # header+payload slice, i.e. what gets hashed
+
+def scan_blocks(
+    path: Optional[str] = None,
+    *,
+    headers_only: bool = False,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[BlockView]:
+    """
+    Iterate blocks over an mmap of the file without copying payloads.
+
+    Headers are decoded with struct.unpack_from straight from the map and
+    payloads are memoryview slices. With headers_only=True payloads are
+    skipped entirely. `start` and `end` must be block boundaries; `end`
+    stops the scan there, e.g. to read a snapshot while appends go on.
+    """
+    p = resolve_path(path)
+    with open(p, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+    unpack_from = stats.timed("decode", _HEADER_STRUCT.unpack_from)
+    n = 0
+    view = memoryview(mm)
+    offset = start
+    try:
+        size = len(mm) if end is None else min(end, len(mm))
+        while offset < size:
+            data_start = offset + HEADER_SIZE
+            if data_start > size:
                 raise SystemExit("Corrupted blockchain file (trailing header).")
-            hdr = Header.unpack(header_bytes)
-            data = f.read(hdr.data_length)
-            if len(data) != hdr.data_length:
+            hdr = Header(*unpack_from(mm, offset))
+            block_end = data_start + hdr.data_length
+            if block_end > size:
                 raise SystemExit("Corrupted blockchain file (truncated data).")
-            yield hdr, data
+            n += 1
+            if headers_only:
+                yield BlockView(offset, hdr, None, None)
+            else:
+                yield BlockView(offset, hdr, view[data_start:block_end], view[offset:block_end])
+            offset = block_end
+    finally:
+        stats.add("blocks_scanned", n)
+        stats.add("bytes_scanned", offset - start)
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            pass  # caller still holds a payload view; the map goes when it does
 
 def append_block(
     *,
@@ -162,55 +548,205 @@ def append_block(
     data: bytes,
     path: Optional[str] = None,
 ) -> None:
-    
-    p = resolve_path(path)
+    append_blocks(
+        [NewBlock(case_id=case_id, item_id=item_id, state=state,
+                  creator=creator, owner=owner, data=data)],
+        path=path,
+    )
 
-    if not os.path.exists(p):
-        init_file(p)
+def append_blocks(blocks: Sequence[NewBlock], path: Optional[str] = None) -> None:
+    """
+    Append all blocks in order, each linked to the one before it.
 
-    prev_hash = _zero32()
-    for hdr, dat in iter_blocks(p):
-        prev_hash = _hash_block(hdr.pack(), dat)
+    Hashes are chained in memory and everything is written with a single
+    write + fsync. Nothing is written if any block fails validation.
+    """
+    p = resolve_path(path)
 
-    if len(case_id) != 32 or len(item_id) != 32:
-        raise ValueError("case_id and item_id must be exactly 32 bytes")
+    if not blocks:
+        return
 
-    if len(creator) > 12 or len(owner) > 12:
-        raise ValueError("creator/owner must be <= 12 bytes")
+    check_new_blocks(blocks)
 
-    hdr_new = Header(
-        prev_hash=prev_hash,
-        timestamp=time.time(),
-        case_id=case_id,
-        item_id=item_id,
-        state=pad_state(state),
-        creator=creator + b"\x00" * (12 - len(creator)),
-        owner=owner + b"\x00" * (12 - len(owner)),
-        data_length=len(data),
-    )
+    with writer_lock(p):
+        _append_locked(p, blocks)
 
-    with open(p, "ab") as f:
-        f.write(hdr_new.pack())
-        f.write(data)
+def check_new_blocks(blocks: Sequence[NewBlock]) -> None:
+    """Raise ValueError if any block could not be written as given."""
+    for b in blocks:
+        if len(b.case_id) != 32 or len(b.item_id) != 32:
+            raise ValueError("case_id and item_id must be exactly 32 bytes")
+        if len(b.creator) > 12 or len(b.owner) > 12:
+            raise ValueError("creator/owner must be <= 12 bytes")
+        pad_state(b.state)
 
+def _append_locked(p: str, blocks: Sequence[NewBlock]) -> None:
+    if not os.path.exists(p):
+        init_file(p)
 
-def get_latest_items(path: Optional[str] = None) -> Dict[bytes, Tuple[bytes, bytes, bytes, bytes]]:
-    p = resolve_path(path)
-    latest: Dict[bytes, Tuple[bytes, bytes, bytes, bytes]] = {}
+    tip = get_tip(p)
+
+    buf = bytearray()
+    written = []
+    prev_hash = tip.hash
+    last_offset = tip.offset
+    for b in blocks:
+        hdr_new = Header(
+            prev_hash=prev_hash,
+            timestamp=time.time(),
+            case_id=b.case_id,
+            item_id=b.item_id,
+            state=pad_state(b.state),
+            creator=b.creator + b"\x00" * (12 - len(b.creator)),
+            owner=b.owner + b"\x00" * (12 - len(b.owner)),
+            data_length=len(b.data),
+        )
+        header_bytes = hdr_new.pack()
+        prev_hash = _hash_block(header_bytes, b.data)
+        last_offset = tip.size + len(buf)
+        written.append((last_offset, hdr_new))
+        buf += header_bytes
+        buf += b.data
 
-    if not os.path.exists(p):
-        return latest
+    with open(p, "ab") as f:
+        f.write(buf)
+        f.flush()
+        os.fsync(f.fileno())
+
+    st = os.stat(p)
+    new_tip = Tip(
+        hash=prev_hash,
+        offset=last_offset,
+        count=tip.count + len(blocks),
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+    )
+    _write_tip(p, new_tip)
+
+    from .index import update_indexes
+    update_indexes(p, tip, new_tip, written)
 
-    for hdr, _data in iter_blocks(p):
-        state = hdr.state.rstrip(b"\x00").decode("ascii", errors="replace")
 
-        if state == "INITIAL" and hdr.case_id == b"0" * 32 and hdr.item_id == b"0" * 32:
-            continue
+class GroupCommitter:
+    """
+    Group commit for appends made by many processes (or threads) at once.
+
+    Each append() spools its blocks to a request file in <file>.spool/ and
+    then waits for the writer lock. Whoever takes the lock while its own
+    request is still spooled becomes the leader and appends every spooled
+    request with a single write + fsync; the others find their request
+    gone once they get the lock, i.e. already durable. Blocks from one
+    append() call stay contiguous and in order.
+
+    A waiting writer holds a shared flock on its request file, so the
+    leader can tell (and drops) requests left by a process that died
+    before they were committed. The leader journals the requests it is
+    about to append, so a crash between the write and removing them
+    cannot get them appended twice.
+    """
 
-        latest[hdr.item_id] = (
-            hdr.case_id,
-            hdr.state,
-            hdr.creator,
-            hdr.owner,
+    def __init__(self, path: Optional[str] = None):
+        self.path = resolve_path(path)
+        self._spool = _spool_path(self.path)
+
+    def append(self, blocks: Sequence[NewBlock]) -> None:
+        if not blocks:
+            return
+        # Validate up front so one bad request cannot fail a merged batch
+        check_new_blocks(blocks)
+        if fcntl is None:
+            append_blocks(blocks, self.path)
+            return
+
+        os.makedirs(self._spool, exist_ok=True)
+        name = os.path.join(
+            self._spool, f"{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}.req"
         )
-    return latest
+        with open(name + ".tmp", "wb") as f:
+            # Locked before it is visible, so it is never taken for an orphan
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            f.write(_pack_request(blocks))
+            f.flush()
+            os.replace(name + ".tmp", name)
+            with writer_lock(self.path):
+                try:
+                    if os.path.exists(name):
+                        _commit_spool(self.path)
+                finally:
+                    if os.path.exists(name):  # the commit failed: withdraw it
+                        os.unlink(name)
+
+
+def _spool_path(p: str) -> str:
+    return p + ".spool"
+
+_REQUEST_BLOCK = struct.Struct("<32s 32s 12s 12s 12s I")
+
+def _pack_request(blocks: Sequence[NewBlock]) -> bytes:
+    buf = bytearray(struct.pack("<I", len(blocks)))
+    for b in blocks:
+        buf += _REQUEST_BLOCK.pack(b.case_id, b.item_id, pad_state(b.state), b.creator, b.owner, len(b.data))
+        buf += b.data
+    return bytes(buf)
+
+def _unpack_request(buf: bytes) -> List[NewBlock]:
+    (n,), pos = struct.unpack_from("<I", buf), 4
+    blocks = []
+    for _ in range(n):
+        case_id, item_id, state, creator, owner, length = _REQUEST_BLOCK.unpack_from(buf, pos)
+        pos += _REQUEST_BLOCK.size
+        blocks.append(NewBlock(
+            case_id=case_id,
+            item_id=item_id,
+            state=state.rstrip(b"\x00").decode("ascii"),
+            creator=creator.rstrip(b"\x00"),
+            owner=owner.rstrip(b"\x00"),
+            data=buf[pos:pos + length],
+        ))
+        pos += length
+    return blocks
+
+def _commit_spool(p: str) -> None:
+    """Append every live spooled request in one write + fsync (writer lock held)."""
+    spool = _spool_path(p)
+    journal = os.path.join(spool, "commit")
+
+    # A leader died mid-commit: its requests are on the chain if it grew
+    try:
+        with open(journal, "rb") as f:
+            start, names = f.read().split(b"\n", 1)
+        if os.path.getsize(p) > int(start):
+            for done in names.split():
+                if os.path.exists(os.path.join(spool, done.decode())):
+                    os.unlink(os.path.join(spool, done.decode()))
+        os.unlink(journal)
+    except FileNotFoundError:
+        pass
+
+    names, blocks = [], []
+    for name in sorted(n for n in os.listdir(spool) if n.endswith(".req")):
+        with open(os.path.join(spool, name), "rb") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                names.append(name)
+                blocks += _unpack_request(f.read())
+                continue
+        os.unlink(os.path.join(spool, name))  # its writer is gone
+    if not blocks:
+        return
+
+    if not os.path.exists(p):
+        init_file(p)
+    start = os.path.getsize(p)
+    with open(journal, "wb") as f:
+        f.write(b"%d\n" % start + "\n".join(names).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        _append_locked(p, blocks)
+    finally:
+        if os.path.getsize(p) > start:
+            for name in names:
+                os.unlink(os.path.join(spool, name))
+        os.unlink(journal)
@@ -0,0 +1,538 @@
+# bchoc/verify.py
+"""
+Streaming chain verifier.
+
+Blocks are fed one at a time in file order; only hash-sized state is kept
+per block (its hash and its parent hash) plus the current state of each
+item, never payloads. Once every block has been fed, result() reports the
+same first failure the three-phase check used to find:
+
+1. genesis layout
+2. hash links (parent not found / two blocks with the same parent)
+3. per-item state machine
+
+After a CLEAN pass the verifier state is saved to a <file>.vck checkpoint
+so the next run only has to verify the blocks that were appended since.
+The checkpoint holds a SHA-256 of the whole verified prefix, re-read
+before resuming, so a block edited in place sends verify back to
+genesis. The checkpoint is not signed: its SHA-256 digests carry no key
+and only catch damage and a changed chain, so it is as trustworthy as the
+chain file beside it. Saving it is best-effort; where it cannot be written
+(a read-only location) the next run simply starts from genesis. A
+resumed verifier only knows the hash of the prefix's last block; if the
+new blocks do not link cleanly onto it, the run is repeated from genesis
+so the report is the one a full pass gives.
+
+With jobs > 1 the SHA-256 work is split across a process pool: block
+boundaries are found first, each worker hashes a contiguous range over
+its own mmap of the file, and the merged hashes are fed to the same
+verifier, so the report is identical to the sequential one. With the
+segmented layout on (bchoc.segments) each range is one segment.
+
+On very large chains (VECTORISE_MIN_BLOCKS), or when numpy is already
+loaded, the per-item state machine is checked after the scan instead of block by block: blocks are
+grouped by item with a stable sort, every (previous state, next state)
+pair is looked up in a transition table at once, and the earliest bad
+block in file order is reported, as the block-by-block check would.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from . import stats
+from .env import SEGMENT_BLOCKS
+from .models import TERMINAL_STATES, State
+from .storage import (
+    HEADER_SIZE,
+    Header,
+    cache_lock,
+    hash_block_at,
+    load_headers_array,
+    numpy_worthwhile,
+    resolve_path,
+    scan_blocks,
+    scan_offsets,
+)
+
+ZERO32 = b"\x00" * 32
+
+# Failure kinds
+PARENT_NOT_FOUND = "parent_not_found"
+DUPLICATE_PARENT = "duplicate_parent"
+CHECKSUM = "checksum"
+SEQUENCE = "sequence"
+
+
+class Failure(NamedTuple):
+    kind: str
+    bad_hash: bytes
+    parent_hash: Optional[bytes] = None
+
+
+class ChainVerifier:
+    def __init__(self) -> None:
+        self.count = 0
+        # Where the verified prefix ends (filled in by verify_chain)
+        self.end = 0
+        self.tip_offset = 0
+        self.tip_hash = ZERO32
+        self.hashes: Set[bytes] = set()
+        self.parents: Set[bytes] = set()
+        # Blocks whose parent had not appeared yet: (index, hash, parent)
+        self.pending: List[Tuple[int, bytes, bytes]] = []
+        self.genesis_error: Optional[Failure] = None
+        self.missing_error: Optional[Tuple[int, Failure]] = None
+        self.duplicate_error: Optional[Tuple[int, Failure]] = None
+        self.sequence_error: Optional[Failure] = None
+        # item_id_enc -> current state (terminal states mean "removed")
+        self.item_state: Dict[bytes, State] = {}
+        # Restored from a checkpoint: only the prefix's tip hash is known
+        self.resumed = False
+        # SHA-256 of the file bytes before prefix_end (see save_checkpoint)
+        self.prefix = hashlib.sha256()
+        self.prefix_end = 0
+
+    def feed(self, hdr: Header, block_hash: bytes, data=None, *, sequence: bool = True) -> None:
+        """
+        Feed the next block. `data` is only looked at for the genesis block.
+        With `sequence` false the state machine is left to check_sequences().
+        """
+        idx = self.count
+        self.count += 1
+
+        if idx == 0:
+            self._check_genesis(hdr, block_hash, data)
+            self.hashes.add(block_hash)
+            return
+
+        self._check_link(idx, hdr, block_hash)
+        self.hashes.add(block_hash)
+
+        if sequence and self.sequence_error is None:
+            self._check_sequence(hdr, block_hash)
+
+    def result(self) -> Optional[Failure]:
+        """First failure in report order, or None if the chain is clean."""
+        if self.count == 0:
+            # No blocks at all -> treat as error on "missing genesis"
+            return Failure(CHECKSUM, ZERO32)
+        if self.genesis_error is not None:
+            return self.genesis_error
+
+        link_errors = []
+        if self.duplicate_error is not None:
+            link_errors.append(self.duplicate_error)
+        for idx, block_hash, parent_hash in self.pending:
+            if parent_hash not in self.hashes:
+                link_errors.append((idx, Failure(PARENT_NOT_FOUND, block_hash)))
+                break
+        if self.missing_error is not None:
+            link_errors.append(self.missing_error)
+        if link_errors:
+            return min(link_errors, key=lambda e: e[0])[1]
+
+        return self.sequence_error
+
+    # ---------------- checks ----------------
+    def _check_genesis(self, hdr: Header, block_hash: bytes, data) -> None:
+        if not (
+            hdr.prev_hash == ZERO32
+            and hdr.timestamp == 0.0
+            and hdr.is_genesis()
+            and hdr.creator == b"\x00" * 12
+            and hdr.owner == b"\x00" * 12
+            and data == b"Initial block\x00"
+            and hdr.data_length == len(data)
+        ):
+            # Any deviation from the expected genesis layout: call it a checksum/content error
+            self.genesis_error = Failure(CHECKSUM, block_hash)
+
+    def _check_link(self, idx: int, hdr: Header, block_hash: bytes) -> None:
+        parent_hash = hdr.prev_hash
+
+        # prev_hash must not be all zeros for non-genesis blocks
+        if parent_hash == ZERO32:
+            if self.missing_error is None:
+                self.missing_error = (idx, Failure(PARENT_NOT_FOUND, block_hash))
+            return
+
+        # The parent may legitimately appear later in the file; settle that in result()
+        if parent_hash not in self.hashes:
+            self.pending.append((idx, block_hash, parent_hash))
+
+        # Another block already uses this same parent_hash (branching).
+        # If that parent turns out not to exist, the earlier child is the
+        # first error anyway, so recording the second child here is safe.
+        if parent_hash in self.parents:
+            if self.duplicate_error is None:
+                self.duplicate_error = (idx, Failure(DUPLICATE_PARENT, block_hash, parent_hash))
+            return
+        self.parents.add(parent_hash)
+
+    def _check_sequence(self, hdr: Header, block_hash: bytes) -> None:
+        state = hdr.code
+
+        if state is State.INITIAL:
+            # Should not appear again, but ignore if it does
+            return
+
+        enc_item = hdr.item_id
+        current = self.item_state.get(enc_item)
+
+        # First time we see this item: first action must be CHECKEDIN
+        if current is None:
+            if state is not State.CHECKEDIN:
+                self.sequence_error = Failure(SEQUENCE, block_hash)
+                return
+            self.item_state[enc_item] = State.CHECKEDIN
+            return
+
+        # If already removed, any further action is invalid
+        if current in TERMINAL_STATES:
+            self.sequence_error = Failure(SEQUENCE, block_hash)
+            return
+
+        if state is State.CHECKEDIN:
+            # Must come from CHECKEDOUT
+            if current is not State.CHECKEDOUT:
+                self.sequence_error = Failure(SEQUENCE, block_hash)
+                return
+            self.item_state[enc_item] = state
+        elif state is State.CHECKEDOUT:
+            # Must come from CHECKEDIN
+            if current is not State.CHECKEDIN:
+                self.sequence_error = Failure(SEQUENCE, block_hash)
+                return
+            self.item_state[enc_item] = state
+        elif state in TERMINAL_STATES:
+            # Terminal must come from CHECKEDIN and only once
+            if current is not State.CHECKEDIN:
+                self.sequence_error = Failure(SEQUENCE, block_hash)
+                return
+            self.item_state[enc_item] = state
+        else:
+            # Unknown state: treat as content error
+            self.sequence_error = Failure(CHECKSUM, block_hash)
+
+
+# ---------------- Vectorised state machine ----------------
+# Blocks from which importing numpy for this pass pays off. The per-block
+# check it replaces is cheap: a cold import merely breaks even around 400k
+# blocks, so the threshold sits well above that
+VECTORISE_MIN_BLOCKS = 1_000_000
+
+# Outcome of one block given the item's state before it
+_OK, _BAD_SEQUENCE, _BAD_STATE = 0, 1, 2
+
+# Row for items with no block yet
+_NEW = len(State)
+
+def _transition_table(np):
+    """table[previous state, block state] -> outcome, the rules of _check_sequence()."""
+    table = np.full((_NEW + 1, len(State)), _BAD_SEQUENCE, dtype=np.uint8)
+    table[_NEW, State.CHECKEDIN] = _OK
+    for prev, allowed in (
+        (State.CHECKEDIN, (State.CHECKEDOUT, *TERMINAL_STATES)),
+        (State.CHECKEDOUT, (State.CHECKEDIN,)),
+    ):
+        table[prev, State.UNKNOWN] = _BAD_STATE
+        for state in allowed:
+            table[prev, state] = _OK
+    # Terminal states (and anything else) allow nothing after them
+    return table
+
+def check_sequences(verifier: ChainVerifier, p: str, offsets, first_index: int) -> None:
+    """
+    Check the per-item state machine for the blocks at `offsets` (block
+    numbers from `first_index`) in one vectorised pass, as if each had been
+    fed with sequence checking on: sets sequence_error to the first bad
+    block and advances item_state up to it.
+    """
+    import numpy as np
+
+    headers = load_headers_array(p, offsets=offsets)
+    keep = headers["code"] != State.INITIAL
+    if first_index == 0:
+        keep[:1] = False  # the genesis slot is never sequence-checked
+    rows = np.flatnonzero(keep)
+    n = len(rows)
+    if n == 0:
+        return
+    codes = headers["code"][rows]
+    ids = headers["item_id"][rows]
+
+    # Group by item, keeping file order within each item: a stable sort
+    # on the 32-byte ID read as four integers
+    words = ids.view(np.uint64).reshape(n, 4)
+    order = np.lexsort(words.T[::-1])
+    sorted_words = words[order]
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (sorted_words[1:] != sorted_words[:-1]).any(axis=1)
+    key = np.cumsum(starts) - 1
+    first_row = order[starts]
+
+    # State of each item before this range (from a checkpoint), or _NEW
+    before = np.full(len(first_row), _NEW, dtype=np.uint8)
+    if verifier.item_state:
+        get = verifier.item_state.get
+        before[:] = [get(item, _NEW) for item in _ids(ids[first_row])]
+
+    code = codes[order]
+    prev = np.empty_like(code)
+    prev[1:] = code[:-1]
+    prev[starts] = before
+
+    outcome = _transition_table(np)[prev, code]
+    bad = np.flatnonzero(outcome != _OK)
+    n_ok = n
+    if len(bad):
+        first_bad = bad[np.argmin(order[bad])]
+        n_ok = int(order[first_bad])
+        kind = SEQUENCE if outcome[first_bad] == _BAD_SEQUENCE else CHECKSUM
+        bad_hash, _end = hash_block_at(int(headers["offset"][rows[n_ok]]), p)
+        verifier.sequence_error = Failure(kind, bad_hash)
+
+    # Latest state per item from the blocks before the first bad one,
+    # new items added in order of their first block
+    if n_ok == 0:
+        return
+    ok = np.flatnonzero(order < n_ok)
+    ok_key = key[ok]
+    last = ok[np.flatnonzero(np.append(ok_key[1:] != ok_key[:-1], True))]
+    last = last[np.argsort(first_row[key[last]])]
+    states = tuple(State)
+    item_state = verifier.item_state
+    for item, state in zip(_ids(ids[order[last]]), code[last].tolist()):
+        item_state[item] = states[state]
+
+def _ids(ids) -> List[bytes]:
+    raw = ids.tobytes()
+    return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+
+# ---------------- Checkpoint ----------------
+#
+# 4s     Q    Q      32s       Q           32s            Q
+# magic  end  count  tip_hash  tip_offset  prefix_digest  n_items
+#
+# then n_items * (32s item, B state code), then a SHA-256 of everything
+# before it. That only catches a damaged file: it is not keyed, so the
+# checkpoint is no more trustworthy than the chain it describes.
+# -----------------------------------------------------------------
+
+CHECKPOINT_MAGIC = b"BCV2"
+CHECKPOINT_HEADER_FMT = "<4s Q Q 32s Q 32s Q"
+CHECKPOINT_HEADER_SIZE = struct.calcsize(CHECKPOINT_HEADER_FMT)
+CHECKPOINT_ITEM_FMT = "<32s B"
+CHECKPOINT_ITEM_SIZE = struct.calcsize(CHECKPOINT_ITEM_FMT)
+
+
+def _checkpoint_path(p: str) -> str:
+    return p + ".vck"
+
+def _hash_prefix(verifier: ChainVerifier, p: str, end: int) -> bool:
+    """Extend verifier.prefix with the file bytes up to `end`; False if the file is shorter."""
+    with open(p, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return end == verifier.prefix_end  # empty file
+    with mm:
+        if len(mm) < end:
+            return False
+        with memoryview(mm) as view:
+            stats.call("sha256", verifier.prefix.update, view[verifier.prefix_end:end])
+    verifier.prefix_end = end
+    return True
+
+def save_checkpoint(p: str, verifier: ChainVerifier) -> None:
+    """Persist the state of a verifier whose result() was CLEAN."""
+    if not _hash_prefix(verifier, p, verifier.end):
+        return
+    body = bytearray(struct.pack(
+        CHECKPOINT_HEADER_FMT,
+        CHECKPOINT_MAGIC,
+        verifier.end,
+        verifier.count,
+        verifier.tip_hash,
+        verifier.tip_offset,
+        verifier.prefix.digest(),
+        len(verifier.item_state),
+    ))
+    for item_id, state in verifier.item_state.items():
+        body += struct.pack(CHECKPOINT_ITEM_FMT, item_id, state)
+    body += hashlib.sha256(body).digest()
+
+    # Same lock as the other sidecars, so concurrent saves do not share the tmp file
+    with cache_lock(p) as locked:
+        if not locked:
+            return
+        tmp = _checkpoint_path(p) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, _checkpoint_path(p))
+        except OSError:
+            pass  # only saves work for the next run
+
+def load_checkpoint(p: str) -> Optional[ChainVerifier]:
+    """
+    Restore a verifier from <file>.vck, or None if there is none, it is
+    damaged, or the chain's bytes up to where it ends are not the ones
+    that were verified.
+    """
+    try:
+        with open(_checkpoint_path(p), "rb") as f:
+            buf = f.read()
+    except OSError:
+        return None
+
+    if len(buf) < CHECKPOINT_HEADER_SIZE + 32:
+        return None
+    body, checksum = buf[:-32], buf[-32:]
+    if hashlib.sha256(body).digest() != checksum:
+        return None
+
+    (magic, end, count, tip_hash, tip_offset,
+     prefix_digest, n_items) = struct.unpack_from(CHECKPOINT_HEADER_FMT, body, 0)
+    expected = CHECKPOINT_HEADER_SIZE + CHECKPOINT_ITEM_SIZE * n_items
+    if magic != CHECKPOINT_MAGIC or len(body) != expected or count == 0:
+        return None
+
+    verifier = ChainVerifier()
+    # The whole prefix must still be byte for byte what was verified
+    if not _hash_prefix(verifier, p, end) or verifier.prefix.digest() != prefix_digest:
+        return None
+
+    verifier.resumed = True
+    verifier.count = count
+    verifier.end = end
+    verifier.tip_hash = tip_hash
+    verifier.tip_offset = tip_offset
+    verifier.hashes.add(tip_hash)
+    for item_id, state in struct.iter_unpack(CHECKPOINT_ITEM_FMT, body[CHECKPOINT_HEADER_SIZE:]):
+        verifier.item_state[item_id] = State(state)
+    return verifier
+
+
+# ---------------- Parallel hashing ----------------
+def _hash_range(p: str, offsets: List[int], end: int) -> bytes:
+    """Worker: concatenated SHA-256 digests of the blocks starting at `offsets`."""
+    with open(p, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with mm:
+        bounds = list(offsets) + [end]
+        return b"".join(
+            hashlib.sha256(mm[bounds[i]:bounds[i + 1]]).digest()
+            for i in range(len(offsets))
+        )
+
+def _parallel_hashes(
+    p: str,
+    start: int,
+    jobs: int,
+    end: Optional[int] = None,
+    first_index: int = 0,
+) -> List[bytes]:
+    """
+    Hashes of every block from `start` (up to `end`), computed by `jobs`
+    processes. `first_index` is the block number at `start`.
+    """
+    size = os.path.getsize(p) if end is None else end
+    offsets = scan_offsets(p, start=start, end=size)
+    if not offsets:
+        return []
+
+    # Imported here: it pulls in multiprocessing, which plain verify never needs
+    from concurrent.futures import ProcessPoolExecutor
+
+    if SEGMENT_BLOCKS > 0:
+        # One range per segment (the first may start part-way through one)
+        first = SEGMENT_BLOCKS - first_index % SEGMENT_BLOCKS
+        cuts = [0, *range(first, len(offsets), SEGMENT_BLOCKS), len(offsets)]
+    else:
+        chunk = -(-len(offsets) // jobs)
+        cuts = [*range(0, len(offsets), chunk), len(offsets)]
+    ranges = [offsets[lo:hi] for lo, hi in zip(cuts, cuts[1:]) if lo < hi]
+    ends = [r[0] for r in ranges[1:]] + [size]
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Time spent waiting for the workers counts as hashing
+        tasks = pool.map(
+            _hash_range, [p] * len(ranges), ranges, ends,
+            chunksize=max(1, len(ranges) // (4 * jobs)),
+        )
+        parts = stats.call("sha256", list, tasks)
+    digests = b"".join(parts)
+    stats.add("hashes", len(offsets))
+    return [digests[i:i + 32] for i in range(0, len(digests), 32)]
+
+
+def verify_chain(
+    path: Optional[str] = None,
+    *,
+    full: bool = False,
+    jobs: int = 1,
+    end: Optional[int] = None,
+) -> ChainVerifier:
+    """
+    Verify the chain; inspect .result() and .count on the returned verifier.
+
+    Unless `full` is set, resume from a valid checkpoint and only verify the
+    blocks after it (from genesis after all if they do not link onto its
+    tip). A CLEAN result is checkpointed for the next run.
+    With jobs > 1 block hashes are computed by a process pool (at most one
+    worker per CPU). `end` limits verification to the blocks before that
+    byte offset (a block boundary); by default, those in the file when the
+    run starts.
+    """
+    p = resolve_path(path)
+    # One bound for the whole run: the parallel hashes and the scan must see
+    # the same blocks, and anything appended meanwhile is left for next time
+    if end is None:
+        end = os.path.getsize(p)
+
+    verifier = None if full else load_checkpoint(p)
+    if verifier is None or (end is not None and verifier.end > end):
+        verifier = ChainVerifier()
+
+    start_count = verifier.count
+    start = verifier.end
+    # More workers than CPUs only adds pool overhead
+    jobs = min(jobs, os.cpu_count() or 1)
+    hashes = _parallel_hashes(p, start, jobs, end, start_count) if jobs > 1 else None
+    sha256 = stats.timed("sha256", hashlib.sha256)
+
+    # Many blocks to check (at most one per header's worth of bytes):
+    # leave the state machine to check_sequences()
+    vectorised = numpy_worthwhile((end - start) // HEADER_SIZE, VECTORISE_MIN_BLOCKS)
+    offsets = array("Q")
+
+    for n, blk in enumerate(scan_blocks(p, start=start, end=end)):
+        if vectorised:
+            offsets.append(blk.offset)
+        block_hash = hashes[n] if hashes is not None else sha256(blk.raw).digest()
+        verifier.feed(blk.header, block_hash, blk.data, sequence=not vectorised)
+        verifier.tip_hash = block_hash
+        verifier.tip_offset = blk.offset
+        verifier.end = blk.offset + len(blk.raw)
+
+    if offsets:
+        check_sequences(verifier, p, offsets, start_count)
+    if hashes is None:
+        stats.add("hashes", verifier.count - start_count)
+    if not verifier.count:
+        return verifier
+
+    failure = verifier.result()
+    if failure is None:
+        save_checkpoint(p, verifier)
+    elif verifier.resumed and failure.kind in (PARENT_NOT_FOUND, DUPLICATE_PARENT):
+        # A link onto anything but the checkpoint's tip cannot be judged
+        # from the tip alone: report what a pass from genesis finds
+        return verify_chain(p, full=True, jobs=jobs, end=end)
+    return verifier
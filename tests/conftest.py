@@ -0,0 +1,62 @@
+# tests/conftest.py
+import builtins
+import errno
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# The package lives in BCHOC/ but imports itself as bchoc
+_PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "BCHOC")
+if "bchoc" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "bchoc", os.path.join(_PACKAGE_DIR, "__init__.py"),
+        submodule_search_locations=[_PACKAGE_DIR],
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["bchoc"] = _module
+    _spec.loader.exec_module(_module)
+
+CREATOR_PASSWORD = "test-creator"
+POLICE_PASSWORD = "test-police"
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    """Path of a fresh chain (genesis only) that the commands default to."""
+    from bchoc.storage import init_file
+
+    path = str(tmp_path / "bchoc.dat")
+    monkeypatch.setenv("BCHOC_FILE_PATH", path)
+    monkeypatch.setenv("BCHOC_PASSWORD_CREATOR", CREATOR_PASSWORD)
+    monkeypatch.setenv("BCHOC_PASSWORD_POLICE", POLICE_PASSWORD)
+    init_file(path)
+    return path
+
+@pytest.fixture
+def read_only(chain, monkeypatch):
+    """Call to fail every write under the chain's directory from then on, as in a read-only location."""
+    root = os.path.dirname(chain) + os.sep
+    real_open = builtins.open
+
+    def check(path) -> None:
+        if os.path.abspath(os.fspath(path)).startswith(root):
+            raise PermissionError(errno.EPERM, "Operation not permitted", os.fspath(path))
+
+    def guarded_open(file, mode="r", *args, **kwargs):
+        if isinstance(file, (str, bytes, os.PathLike)) and set(mode) & set("wax+"):
+            check(file)
+        return real_open(file, mode, *args, **kwargs)
+
+    def guarded(fn):
+        def call(path, *args, **kwargs):
+            check(path)
+            return fn(path, *args, **kwargs)
+        return call
+
+    def activate() -> None:
+        monkeypatch.setattr(builtins, "open", guarded_open)
+        for name in ("replace", "makedirs", "mkdir", "remove", "unlink"):
+            monkeypatch.setattr(os, name, guarded(getattr(os, name)))
+
+    return activate
@@ -0,0 +1,61 @@
+# tests/test_add.py
+import multiprocessing
+import os
+import time
+import uuid
+from argparse import Namespace
+from collections import Counter
+
+import pytest
+
+from bchoc.commands import add_cmd
+from bchoc.commands.add_cmd import run_add
+from bchoc.ids import item_id_to_enc32
+from bchoc.storage import iter_blocks
+from bchoc.verify import verify_chain
+
+from conftest import CREATOR_PASSWORD
+
+WRITERS = 8
+ITEM_IDS = ["101", "102", "103"]
+
+def _add(barrier, case_id: str) -> None:
+    """Child process: wait for every writer, then add the same items."""
+    load_existing = add_cmd._existing_items_enc
+
+    def slow_existing():
+        # Widen the gap between the duplicate check and the append
+        existing = load_existing()
+        time.sleep(0.05)
+        return existing
+
+    add_cmd._existing_items_enc = slow_existing
+    barrier.wait()
+    try:
+        code = run_add(Namespace(case_id=case_id, item_ids=ITEM_IDS, creator="racer", password=CREATOR_PASSWORD))
+    except SystemExit as exc:
+        code = exc.code
+    os._exit(code)
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_adds_append_each_item_once(chain):
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(WRITERS)
+    procs = [ctx.Process(target=_add, args=(barrier, str(uuid.uuid4()))) for _ in range(WRITERS)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=60)
+
+    # Exactly one add wins; the others find the items already there
+    assert sorted(proc.exitcode for proc in procs) == [0] + [1] * (WRITERS - 1)
+
+    blocks = Counter(hdr.item_id for hdr, _data in iter_blocks(chain) if not hdr.is_genesis())
+    assert blocks == Counter({item_id_to_enc32(int(item_id)): 1 for item_id in ITEM_IDS})
+    assert verify_chain(chain, full=True).result() is None
+
+def test_add_rejects_existing_item(chain, capsys):
+    args = Namespace(case_id=str(uuid.uuid4()), item_ids=["7"], creator="alice", password=CREATOR_PASSWORD)
+    assert run_add(args) == 0
+    assert run_add(args) == 1
+    assert "> Item 7 already exists" in capsys.readouterr().out
@@ -0,0 +1,72 @@
+# tests/test_aio.py
+import asyncio
+from collections import ChainMap
+from dataclasses import asdict
+
+from bchoc import aio, index
+from bchoc.aio import AsyncChain, take_snapshot
+from bchoc.storage import NewBlock, append_blocks
+
+def _item(n):
+    return n.to_bytes(4, "big") * 8
+
+def _block(n, state="CHECKEDIN", owner=b""):
+    return NewBlock(case_id=bytes([n % 5 + 1]) * 32, item_id=_item(n), state=state, creator=b"c", owner=owner)
+
+def _fresh(chain):
+    """Item map of a snapshot taken from scratch."""
+    index._ITEM_MEMO.clear()
+    return dict(take_snapshot(chain).items)
+
+def _depth(items):
+    return len(items.maps) if isinstance(items, ChainMap) else 1
+
+async def _client(chain, items):
+    """Stand-in for a service: every request appends at once, then half the items are checked out."""
+    async with AsyncChain(chain) as store:
+        await asyncio.gather(*(store.append_many([_block(n)]) for n in items))
+        await asyncio.gather(*(store.append(**asdict(_block(n, "CHECKEDOUT", b"police"))) for n in items[::2]))
+        return store.snapshot
+
+def test_commits_do_not_reload_the_item_map(chain, monkeypatch):
+    append_blocks([_block(n) for n in range(1000, 3000)], chain)
+    taken = []
+    real_take = aio.take_snapshot
+    monkeypatch.setattr(aio, "take_snapshot", lambda p: taken.append(p) or real_take(p))
+
+    snap = asyncio.run(_client(chain, list(range(1, 21))))
+
+    assert len(taken) == 1  # only open() loads the whole map
+    assert isinstance(snap.items, ChainMap)
+    assert dict(snap.items) == _fresh(chain)
+    assert snap.items[_item(1)].state.rstrip(b"\x00") == b"CHECKEDOUT"
+
+def test_layers_are_merged_and_folded(chain, monkeypatch):
+    monkeypatch.setattr(aio, "MAX_LAYERS", 3)
+    append_blocks([_block(n) for n in range(1000, 1100)], chain)
+
+    async def one_at_a_time():
+        async with AsyncChain(chain) as store:
+            depths = []
+            for n in range(1, 40):
+                await store.append(**asdict(_block(n)))
+                depths.append(_depth(store.snapshot.items))
+            return store.snapshot, depths
+
+    snap, depths = asyncio.run(one_at_a_time())
+    assert max(depths) <= aio.MAX_LAYERS + 1
+    assert 1 in depths[5:]  # folded into a new base along the way
+    assert dict(snap.items) == _fresh(chain)
+
+def test_refresh_picks_up_other_writers(chain):
+    async def run():
+        async with AsyncChain(chain) as store:
+            await store.append_many([_block(1)])
+            append_blocks([_block(2), _block(3)], chain)  # another process
+            assert await store.latest_state(_item(2)) is None
+            await store.refresh()
+            return store.snapshot
+
+    snap = asyncio.run(run())
+    assert dict(snap.items) == _fresh(chain)
+    assert len(snap.items) == 3
@@ -0,0 +1,25 @@
+# tests/test_bench.py
+from bchoc.bench import generate_chain
+from bchoc.storage import iter_blocks
+from bchoc.verify import verify_chain
+
+def test_generated_blocks_keep_the_item_creator(tmp_path):
+    path = str(tmp_path / "synthetic.dat")
+    chain = generate_chain(path, 2_000, seed=3)
+
+    creators = {}
+    for hdr, _data in iter_blocks(path):
+        if hdr.is_genesis():
+            continue
+        assert hdr.creator.rstrip(b"\x00")
+        assert creators.setdefault(hdr.item_id, hdr.creator) == hdr.creator
+    assert len(creators) == chain.items
+    assert verify_chain(path, full=True).result() is None
+
+def test_same_seed_same_chain(tmp_path):
+    def blocks(name):
+        path = str(tmp_path / name)
+        generate_chain(path, 500, seed=5)
+        return [(hdr.case_id, hdr.item_id, hdr.state, hdr.creator, hdr.owner) for hdr, _data in iter_blocks(path)]
+
+    assert blocks("a.dat") == blocks("b.dat")
@@ -0,0 +1,18 @@
+# tests/test_env.py
+import pytest
+
+from bchoc.env import _env_int
+
+@pytest.mark.parametrize("raw, expected", [(None, 7), ("", 7), ("0", 0), (" 12 ", 12)])
+def test_env_int(monkeypatch, raw, expected):
+    if raw is None:
+        monkeypatch.delenv("BCHOC_TEST_INT", raising=False)
+    else:
+        monkeypatch.setenv("BCHOC_TEST_INT", raw)
+    assert _env_int("BCHOC_TEST_INT", 7) == expected
+
+@pytest.mark.parametrize("raw", ["abc", "1.5", "-3"])
+def test_invalid_env_int_falls_back(monkeypatch, capsys, raw):
+    monkeypatch.setenv("BCHOC_TEST_INT", raw)
+    assert _env_int("BCHOC_TEST_INT", 7) == 7
+    assert "> Ignoring BCHOC_TEST_INT" in capsys.readouterr().err
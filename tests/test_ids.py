@@ -0,0 +1,53 @@
+# tests/test_ids.py
+import uuid
+
+import pytest
+
+from bchoc.ids import (
+    case_uuid_to_enc32,
+    clear_id_caches,
+    enc32_to_case_uuid,
+    enc32_to_case_uuid_many,
+    enc32_to_item_id,
+    enc32_to_item_id_many,
+    item_id_to_enc32,
+    item_ids_to_enc32_many,
+)
+
+# Values whose last byte is zero, so the padding alone cannot tell where they end
+ITEM_IDS = [0, 256, 512, 65536, 0x01000000, 0xFFFFFF00]
+CASE_IDS = [
+    "12345678-1234-5678-1234-567812345600",
+    "00000000-0000-0000-0000-000000000000",
+    str(uuid.UUID(bytes=bytes(range(1, 15)) + b"\x00\x00")),
+]
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    # Decode through AES, not the encryption side's cache entries
+    clear_id_caches()
+    yield
+    clear_id_caches()
+
+@pytest.mark.parametrize("item_id", ITEM_IDS)
+def test_item_id_round_trip(item_id):
+    enc32 = item_ids_to_enc32_many([item_id])[0]
+    assert enc32 == item_id_to_enc32(item_id)
+    clear_id_caches()
+    assert enc32_to_item_id(enc32) == item_id
+
+def test_item_id_many_round_trip():
+    encs = item_ids_to_enc32_many(ITEM_IDS)
+    assert enc32_to_item_id_many(encs) == ITEM_IDS
+
+@pytest.mark.parametrize("case_id", CASE_IDS)
+def test_case_uuid_round_trip(case_id):
+    enc32 = case_uuid_to_enc32(case_id)
+    clear_id_caches()
+    assert enc32_to_case_uuid(enc32) == case_id
+    clear_id_caches()
+    assert enc32_to_case_uuid_many([enc32]) == [case_id]
+
+def test_nonzero_padding_is_rejected():
+    # A case ID field has data past the 4 bytes of an item ID
+    assert enc32_to_item_id_many([case_uuid_to_enc32(CASE_IDS[2])]) == [None]
@@ -0,0 +1,80 @@
+# tests/test_import.py
+import uuid
+from argparse import Namespace
+from collections import Counter
+
+from bchoc.commands import import_cmd
+from bchoc.commands.import_cmd import run_import
+from bchoc.ids import enc32_to_case_uuid, enc32_to_item_id
+from bchoc.storage import iter_blocks
+from bchoc.verify import verify_chain
+
+from conftest import CREATOR_PASSWORD
+
+def _manifest(tmp_path, rows):
+    path = tmp_path / "items.csv"
+    path.write_text("case_id,item_id,creator\n" + "".join(f"{c},{i},{g}\n" for c, i, g in rows))
+    return str(path)
+
+def _items(chain):
+    return Counter(
+        (enc32_to_case_uuid(hdr.case_id), enc32_to_item_id(hdr.item_id), hdr.creator.rstrip(b"\x00"))
+        for hdr, _data in iter_blocks(chain) if not hdr.is_genesis()
+    )
+
+def test_import_appends_every_row(chain, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_cmd, "IMPORT_CHUNK", 4)
+    cases = [str(uuid.uuid4()) for _ in range(3)]
+    rows = [(cases[i % 3], 250 + i, "clerk" if i % 2 else "officer") for i in range(10)]
+    args = Namespace(file=_manifest(tmp_path, rows), password=CREATOR_PASSWORD, creator=None, format=None)
+
+    assert run_import(args) == 0
+    assert _items(chain) == Counter((c, i, g.encode()) for c, i, g in rows)
+    assert verify_chain(chain, full=True).result() is None
+
+def test_import_writes_nothing_on_invalid_row(chain, tmp_path):
+    case_id = str(uuid.uuid4())
+    rows = [(case_id, 1, "clerk"), (case_id, "x", "clerk"), (case_id, 1, "clerk")]
+    args = Namespace(file=_manifest(tmp_path, rows), password=CREATOR_PASSWORD, creator=None, format=None)
+
+    assert run_import(args) == 1
+    assert not _items(chain)
+
+def test_import_does_not_reread_manifest(chain, tmp_path, monkeypatch):
+    # A manifest that fails to read after validation must not leave a partial import
+    monkeypatch.setattr(import_cmd, "IMPORT_CHUNK", 2)
+    records = import_cmd._records
+    calls = []
+
+    def read_once(path, fmt):
+        calls.append(path)
+        if len(calls) > 1:
+            raise ValueError("manifest changed")
+        return records(path, fmt)
+
+    monkeypatch.setattr(import_cmd, "_records", read_once)
+    case_id = str(uuid.uuid4())
+    rows = [(case_id, 10 + i, "clerk") for i in range(5)]
+    args = Namespace(file=_manifest(tmp_path, rows), password=CREATOR_PASSWORD, creator=None, format=None)
+
+    assert run_import(args) == 0
+    assert sum(_items(chain).values()) == 5
+
+def test_import_csv_with_byte_order_mark(chain, tmp_path):
+    path = tmp_path / "excel.csv"
+    path.write_bytes(b"\xef\xbb\xbfcase_id,item_id,creator\r\n" + f"{uuid.uuid4()},31,clerk\r\n".encode())
+    args = Namespace(file=str(path), password=CREATOR_PASSWORD, creator=None, format=None)
+
+    assert run_import(args) == 0
+    assert sum(_items(chain).values()) == 1
+
+def test_import_reports_invalid_json(chain, tmp_path, capsys):
+    path = tmp_path / "items.ndjson"
+    path.write_text(f'{{"case_id": "{uuid.uuid4()}", "item_id": 1}}\n{{"case_id": \n[1, 2]\n')
+    args = Namespace(file=str(path), password=CREATOR_PASSWORD, creator="clerk", format=None)
+
+    assert run_import(args) == 1
+    out = capsys.readouterr().out
+    assert "> Line 2: invalid JSON" in out
+    assert "> Line 3: not a JSON object" in out
+    assert not _items(chain)
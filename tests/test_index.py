@@ -0,0 +1,51 @@
+# tests/test_index.py
+import os
+import shutil
+
+from bchoc.index import blocks_reverse, case_offsets, load_item_index
+from bchoc.storage import NewBlock, append_blocks
+
+CASES = [bytes([1]) * 32, bytes([2]) * 32]
+
+def _fill(chain):
+    append_blocks([
+        NewBlock(case_id=CASES[i % 2], item_id=bytes([i % 7 + 1]) * 32,
+                 state="CHECKEDIN" if i < 7 else "CHECKEDOUT", creator=b"c", owner=b"c")
+        for i in range(14)
+    ], chain)
+
+def _queries(chain):
+    return (
+        dict(load_item_index(chain)),
+        [list(case_offsets(case_id, chain)) for case_id in CASES],
+        [offset for offset, _hdr in blocks_reverse(path=chain)],
+        [offset for offset, _hdr in blocks_reverse(CASES[0], chain)],
+        [offset for offset, _hdr in blocks_reverse(CASES[1], chain, before=1000)],
+        [offset for offset, _hdr in blocks_reverse(path=chain, before=1000)],
+    )
+
+def _drop_indexes(chain):
+    from bchoc import index
+
+    index._ITEM_MEMO.clear()
+    for suffix in (".idx", ".off", ".tip", ".lock"):
+        if os.path.exists(chain + suffix):
+            os.remove(chain + suffix)
+    shutil.rmtree(chain + ".cases", ignore_errors=True)
+
+def test_indexes_rebuilt_from_chain(chain):
+    _fill(chain)
+    expected = _queries(chain)
+    _drop_indexes(chain)
+    assert _queries(chain) == expected
+    assert os.path.exists(chain + ".idx") and os.path.exists(chain + ".off")
+
+def test_queries_in_read_only_location(chain, read_only):
+    _fill(chain)
+    expected = _queries(chain)
+    _drop_indexes(chain)
+    read_only()
+
+    assert _queries(chain) == expected
+    assert not os.path.exists(chain + ".idx")
+    assert not os.path.exists(chain + ".cases")
@@ -0,0 +1,80 @@
+# tests/test_segments.py
+import itertools
+import os
+import time
+
+import pytest
+
+from bchoc import segments as segments_mod
+from bchoc.segments import export_segments, load_segments, segment_spans
+from bchoc.storage import NewBlock, append_blocks, scan_offsets
+
+SEGMENT_BLOCKS = 4
+
+@pytest.fixture(autouse=True)
+def segmented(monkeypatch):
+    monkeypatch.setattr(segments_mod, "SEGMENT_BLOCKS", SEGMENT_BLOCKS)
+
+def _fill(chain, n, monkeypatch, start=1):
+    """Append n blocks; block i (genesis is 0) is timestamped 1000 + 10 * i."""
+    clock = itertools.count(1000 + 10 * start, 10)
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: float(next(clock)))
+        append_blocks([
+            NewBlock(case_id=bytes([i % 3 + 1]) * 32, item_id=(start + i).to_bytes(4, "big") * 8,
+                     state="CHECKEDIN", creator=b"c", owner=b"c")
+            for i in range(n)
+        ], chain)
+
+def test_full_segments_are_sealed(chain, monkeypatch):
+    _fill(chain, 13, monkeypatch)
+    segments = load_segments(chain)
+    offsets = scan_offsets(chain)
+
+    # 14 blocks: three full segments, blocks 12 and 13 still open
+    assert [seg.count for seg in segments] == [SEGMENT_BLOCKS] * 3
+    assert [seg.start for seg in segments] == list(offsets[0:12:SEGMENT_BLOCKS])
+    assert [seg.end for seg in segments] == list(offsets[SEGMENT_BLOCKS:13:SEGMENT_BLOCKS])
+    assert (segments[0].min_time, segments[0].max_time) == (1010.0, 1030.0)
+    assert (segments[2].min_time, segments[2].max_time) == (1080.0, 1110.0)
+    assert os.path.exists(chain + ".seg")
+    assert segments_mod._read_manifests(chain) == segments
+
+    # Sealed manifests are kept as the chain grows
+    _fill(chain, 3, monkeypatch, start=14)
+    grown = load_segments(chain)
+    assert grown[:3] == segments
+    assert len(grown) == 4
+
+def test_spans_keep_only_overlapping_segments(chain, monkeypatch):
+    _fill(chain, 13, monkeypatch)
+    seg = load_segments(chain)
+
+    assert segment_spans(path=chain) == [(0, None)]
+    assert segment_spans(1045, 1075, chain) == [(seg[1].start, seg[1].end), (seg[2].end, None)]
+    assert segment_spans(since=1085, path=chain) == [(seg[2].start, None)]
+    assert segment_spans(until=1000, path=chain) == [(seg[2].end, None)]
+
+def test_export_concatenates_to_the_sealed_prefix(chain, monkeypatch, tmp_path_factory):
+    _fill(chain, 13, monkeypatch)
+    dest = str(tmp_path_factory.mktemp("export"))
+
+    assert export_segments(dest, chain) == (3, 0)
+    name = os.path.basename(chain)
+    data = b""
+    for index in range(3):
+        with open(os.path.join(dest, f"{name}.{index:06d}"), "rb") as f:
+            data += f.read()
+    with open(chain, "rb") as f:
+        assert data == f.read(load_segments(chain)[-1].end)
+    with open(os.path.join(dest, name + ".seg"), "rb") as f, open(chain + ".seg", "rb") as g:
+        assert f.read() == g.read()
+
+    assert export_segments(dest, chain) == (0, 3)
+
+def test_segments_in_read_only_location(chain, monkeypatch, read_only, tmp_path_factory):
+    _fill(chain, 13, monkeypatch)
+    read_only()
+    assert len(load_segments(chain)) == 3
+    assert not os.path.exists(chain + ".seg")
+    assert export_segments(str(tmp_path_factory.mktemp("export")), chain) == (3, 0)
@@ -0,0 +1,64 @@
+# tests/test_server.py
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bchoc import server as server_mod
+from bchoc.cli import build_parser
+from bchoc.ids import item_id_to_enc32
+from bchoc.index import load_item_index
+from bchoc.server import _run, forward, make_server
+
+from conftest import CREATOR_PASSWORD
+
+def test_run_resolves_paths_in_client_directory(chain, tmp_path):
+    client = tmp_path / "client"
+    client.mkdir()
+    (client / "items.csv").write_text(f"case_id,item_id\n{uuid.uuid4()},5\n")
+    home = os.getcwd()
+
+    rc, out, _err = _run(["import", "items.csv", "-p", CREATOR_PASSWORD, "-g", "clerk"], build_parser(), str(client))
+
+    assert rc == 0, out
+    assert os.getcwd() == home
+    assert item_id_to_enc32(5) in load_item_index()
+
+@pytest.fixture
+def daemon(chain, tmp_path):
+    """Socket path of a daemon serving `chain` from a background thread."""
+    sock = str(tmp_path / "s.sock")
+    server = make_server(sock)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield sock
+    server.shutdown()
+    server.server_close()
+    os.unlink(sock)
+    thread.join()
+
+def test_idle_client_does_not_block_others(daemon):
+    add = ["add", "-c", str(uuid.uuid4()), "-g", "clerk", "-p", CREATOR_PASSWORD, "-i"]
+    # A request stuck behind the idle client times out (forward() returns None) rather than hanging
+    default_timeout = socket.getdefaulttimeout()
+    socket.setdefaulttimeout(5)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle:
+            idle.connect(daemon)  # connected, never sends a request
+            with ThreadPoolExecutor(2) as pool:
+                replies = list(pool.map(lambda n: forward(add + [str(n)], daemon), (11, 12)))
+    finally:
+        socket.setdefaulttimeout(default_timeout)
+
+    assert [reply and reply[0] for reply in replies] == [0, 0], replies
+    assert {item_id_to_enc32(11), item_id_to_enc32(12)} <= set(load_item_index())
+
+def test_idle_connection_is_dropped(daemon, monkeypatch):
+    monkeypatch.setattr(server_mod, "IDLE_TIMEOUT", 0.2)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle:
+        idle.settimeout(5)
+        idle.connect(daemon)
+        assert idle.recv(1) == b""  # closed by the daemon
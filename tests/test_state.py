@@ -0,0 +1,46 @@
+# tests/test_state.py
+import os
+
+from bchoc import state as state_mod
+from bchoc.state import load_state, save_snapshot
+from bchoc.storage import NewBlock, append_blocks, scan_offsets
+
+# Byte of the owner field within a header (after prev_hash, timestamp, case, item, state, creator)
+OWNER_POS = 32 + 8 + 32 + 32 + 12 + 12
+
+def _fill(chain, n, start=0):
+    append_blocks([
+        NewBlock(case_id=bytes([i % 3 + 1]) * 32, item_id=(start + i).to_bytes(4, "big") * 8,
+                 state="CHECKEDIN", creator=b"c", owner=b"c")
+        for i in range(n)
+    ], chain)
+
+def _same(a, b):
+    return (a.end, a.count, a.tip_hash, a.items, a.cases) == (b.end, b.count, b.tip_hash, b.items, b.cases)
+
+def test_snapshot_then_replay_matches_full(chain):
+    _fill(chain, 20)
+    save_snapshot(chain)
+    _fill(chain, 5, start=20)
+    assert _same(load_state(chain), load_state(chain, full=True))
+
+def test_prefix_edited_in_place_is_not_trusted(chain):
+    _fill(chain, 20)
+    save_snapshot(chain)
+    # Rewrite an owner field mid-chain; the tip block is untouched
+    with open(chain, "r+b") as f:
+        f.seek(scan_offsets(chain)[5] + OWNER_POS)
+        f.write(b"X")
+    assert state_mod._read_snapshot(chain) is None
+    assert _same(load_state(chain), load_state(chain, full=True))
+
+def test_automatic_save_in_read_only_location(chain, read_only, monkeypatch):
+    monkeypatch.setattr(state_mod, "SNAPSHOT_INTERVAL", 4)
+    _fill(chain, 20)
+    for suffix in (".snap", ".lock"):
+        if os.path.exists(chain + suffix):
+            os.remove(chain + suffix)
+    read_only()
+
+    assert load_state(chain).count == 21
+    assert not os.path.exists(chain + ".snap")
@@ -0,0 +1,115 @@
+# tests/test_storage.py
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from bchoc import storage
+from bchoc.storage import GroupCommitter, NewBlock, append_blocks, get_tip, iter_blocks, writer_lock
+from bchoc.verify import verify_chain
+
+WRITERS = 6
+
+# Group commit spools requests under flock; without fcntl it appends directly
+needs_flock = pytest.mark.skipif(storage.fcntl is None, reason="needs fcntl")
+
+def _blocks(n, start=0):
+    return [
+        NewBlock(case_id=bytes([1]) * 32, item_id=bytes([i]) * 32, state="CHECKEDIN", creator=b"c", owner=b"c")
+        for i in range(start, start + n)
+    ]
+
+def test_get_tip_survives_stale_sidecar(chain):
+    append_blocks(_blocks(3), chain)
+    tip = get_tip(chain)
+    os.remove(chain + ".tip")
+    assert get_tip(chain) == tip
+    assert os.path.exists(chain + ".tip")
+
+def test_get_tip_in_read_only_location(chain, read_only):
+    append_blocks(_blocks(3), chain)
+    tip = get_tip(chain)
+    os.remove(chain + ".tip")
+    os.remove(chain + ".lock")
+    read_only()
+
+    assert get_tip(chain) == tip
+    assert not os.path.exists(chain + ".tip")
+
+def _group_append(go, fsyncs, chain, n) -> None:
+    """Child process: spool two blocks once the parent holds the writer lock."""
+    chain_inode = os.stat(chain).st_ino
+    real_fsync = os.fsync
+
+    def counting_fsync(fd):
+        if os.fstat(fd).st_ino == chain_inode:
+            with fsyncs.get_lock():
+                fsyncs.value += 1
+        real_fsync(fd)
+
+    os.fsync = counting_fsync
+    go.wait()
+    GroupCommitter(chain).append(_blocks(2, start=2 * n))
+    os._exit(0)
+
+def _spooled(chain):
+    spool = chain + ".spool"
+    return sorted(n for n in os.listdir(spool) if n.endswith(".req")) if os.path.isdir(spool) else []
+
+@needs_flock
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_group_commit_shares_one_fsync(chain):
+    ctx = multiprocessing.get_context("fork")
+    go, fsyncs = ctx.Event(), ctx.Value("i", 0)
+    procs = [ctx.Process(target=_group_append, args=(go, fsyncs, chain, n)) for n in range(WRITERS)]
+    for proc in procs:
+        proc.start()
+
+    # Every writer spools its request while this process holds the lock
+    with writer_lock(chain):
+        go.set()
+        deadline = time.monotonic() + 30
+        while len(_spooled(chain)) < WRITERS and time.monotonic() < deadline:
+            time.sleep(0.01)
+    for proc in procs:
+        proc.join(timeout=60)
+
+    assert [proc.exitcode for proc in procs] == [0] * WRITERS
+    assert fsyncs.value == 1
+    items = [hdr.item_id for hdr, _data in iter_blocks(chain) if not hdr.is_genesis()]
+    assert sorted(items) == sorted(b.item_id for b in _blocks(2 * WRITERS))
+    # Each writer's two blocks stay contiguous and in order
+    assert all(items[i][0] % 2 == 0 and items[i + 1][0] == items[i][0] + 1 for i in range(0, len(items), 2))
+    assert verify_chain(chain, full=True).result() is None
+    assert os.listdir(chain + ".spool") == []
+
+@needs_flock
+def test_request_of_dead_writer_is_dropped(chain):
+    os.makedirs(chain + ".spool")
+    with open(os.path.join(chain + ".spool", "0-orphan.req"), "wb") as f:
+        f.write(storage._pack_request(_blocks(1, start=50)))
+
+    GroupCommitter(chain).append(_blocks(1))
+
+    assert [hdr.item_id for hdr, _data in iter_blocks(chain)][1:] == [b.item_id for b in _blocks(1)]
+    assert os.listdir(chain + ".spool") == []
+
+@needs_flock
+def test_requests_committed_by_a_crashed_leader_are_not_appended_again(chain):
+    spool = chain + ".spool"
+    os.makedirs(spool)
+    with open(os.path.join(spool, "0-waiting.req"), "wb") as waiter:
+        storage.fcntl.flock(waiter.fileno(), storage.fcntl.LOCK_SH)  # its writer is still waiting
+        waiter.write(storage._pack_request(_blocks(1, start=50)))
+        waiter.flush()
+        # The leader journaled it, appended it, then died before cleaning up
+        with open(os.path.join(spool, "commit"), "wb") as f:
+            f.write(b"%d\n0-waiting.req" % os.path.getsize(chain))
+        append_blocks(_blocks(1, start=50), chain)
+
+        with writer_lock(chain):
+            storage._commit_spool(chain)
+
+    assert len(list(iter_blocks(chain))) == 2
+    assert os.listdir(spool) == []
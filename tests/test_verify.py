@@ -0,0 +1,183 @@
+# tests/test_verify.py
+import hashlib
+import os
+
+import pytest
+
+from bchoc import verify
+from bchoc.storage import NewBlock, append_blocks, init_file, scan_blocks, scan_offsets
+from bchoc.verify import load_checkpoint, verify_chain
+
+# Byte of the owner field within a header (after prev_hash, timestamp, case, item, state, creator)
+OWNER_POS = 32 + 8 + 32 + 32 + 12 + 12
+
+def _fill(chain, n, start=0):
+    append_blocks([
+        NewBlock(case_id=bytes([i % 3 + 1]) * 32, item_id=(start + i).to_bytes(4, "big") * 8,
+                 state="CHECKEDIN", creator=b"c", owner=b"c")
+        for i in range(n)
+    ], chain)
+
+def test_clean_run_saves_checkpoint(chain):
+    _fill(chain, 10)
+    assert verify_chain(chain).result() is None
+    assert load_checkpoint(chain).count == 11
+
+def test_clean_in_read_only_location(chain, read_only):
+    _fill(chain, 10)
+    for suffix in (".vck", ".lock"):
+        if os.path.exists(chain + suffix):
+            os.remove(chain + suffix)
+    read_only()
+
+    verifier = verify_chain(chain)
+    assert verifier.result() is None and verifier.count == 11
+    assert not os.path.exists(chain + ".vck")
+
+def test_block_appended_mid_verify(chain, monkeypatch):
+    _fill(chain, 10)
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    parallel_hashes = verify._parallel_hashes
+
+    def then_append(*args, **kwargs):
+        hashes = parallel_hashes(*args, **kwargs)
+        _fill(chain, 1, start=100)  # lands between hashing and the scan
+        return hashes
+
+    monkeypatch.setattr(verify, "_parallel_hashes", then_append)
+    verifier = verify_chain(chain, full=True, jobs=2)
+    assert verifier.result() is None and verifier.count == 11
+
+    monkeypatch.setattr(verify, "_parallel_hashes", parallel_hashes)
+    assert verify_chain(chain, jobs=2).count == 12
+
+# ---------------- Same report from every verify path ----------------
+#
+# Each case appends a clean prefix, then a tail of blocks, then edits the
+# file in place. The resumed run saves a checkpoint after the prefix.
+
+def _blocks(*steps):
+    """NewBlocks for (item number, state) steps, all in one case."""
+    return [
+        NewBlock(case_id=bytes([9]) * 32, item_id=item.to_bytes(4, "big") * 8,
+                 state=state, creator=b"c", owner=b"c")
+        for item, state in steps
+    ]
+
+def _write_at(chain, block, pos, raw):
+    with open(chain, "r+b") as f:
+        f.seek(scan_offsets(chain)[block] + pos)
+        f.write(raw)
+
+def _prev_hash_of(chain, block):
+    with open(chain, "rb") as f:
+        f.seek(scan_offsets(chain)[block])
+        return f.read(32)
+
+PREFIX = [(1, "CHECKEDIN"), (2, "CHECKEDIN"), (1, "CHECKEDOUT"), (3, "CHECKEDIN")]
+
+CASES = {
+    "clean": ([(1, "CHECKEDIN"), (3, "RELEASED")], None),
+    "first action not checkin": ([(2, "CHECKEDOUT"), (4, "CHECKEDOUT")], None),
+    "action after removal": ([(3, "DESTROYED"), (2, "CHECKEDOUT"), (3, "CHECKEDIN")], None),
+    "checkin twice": ([(2, "CHECKEDOUT"), (2, "CHECKEDIN"), (2, "CHECKEDIN")], None),
+    "earliest of two items": ([(5, "CHECKEDIN"), (1, "CHECKEDOUT"), (5, "DISPOSED"), (5, "CHECKEDIN")], None),
+    "unknown state": ([(2, "CHECKEDOUT"), (3, "BOGUS")], None),
+    "parent not found in tail": ([(2, "CHECKEDOUT"), (2, "CHECKEDIN")], lambda c: _write_at(c, 6, 0, b"\x01" * 32)),
+    "parent not found in prefix": ([(2, "CHECKEDOUT")], lambda c: _write_at(c, 2, 0, b"\x01" * 32)),
+    "duplicate parent": (
+        [(2, "CHECKEDOUT"), (2, "CHECKEDIN"), (4, "CHECKEDIN")],
+        lambda c: _write_at(c, 7, 0, _prev_hash_of(c, 6)),
+    ),
+    "owner edited in prefix": ([(2, "CHECKEDOUT")], lambda c: _write_at(c, 3, OWNER_POS, b"X")),
+    "genesis edited": ([(2, "CHECKEDOUT")], lambda c: _write_at(c, 0, 40, b"\x01")),
+}
+
+def _build(chain, name, checkpoint=False):
+    tail, edit = CASES[name]
+    append_blocks(_blocks(*PREFIX), chain)
+    if checkpoint:
+        assert verify_chain(chain).result() is None
+        assert load_checkpoint(chain) is not None
+    append_blocks(_blocks(*tail), chain)
+    if edit is not None:
+        edit(chain)
+
+def _report(verifier, path):
+    """(blocks, failure kind, bad block number, parent block number): comparable across chains."""
+    failure = verifier.result()
+    if failure is None:
+        return verifier.count, None
+    number = {hashlib.sha256(blk.raw).digest(): n for n, blk in enumerate(scan_blocks(path))}
+    return verifier.count, failure.kind, number.get(failure.bad_hash), number.get(failure.parent_hash)
+
+@pytest.fixture(autouse=True)
+def block_by_block(monkeypatch):
+    # Sequence-check block by block unless a test asks for the vectorised pass
+    monkeypatch.setattr(verify, "numpy_worthwhile", lambda *args: False)
+
+@pytest.fixture
+def reference(chain):
+    """Build a case on `chain`; returns the report of a sequential pass from genesis."""
+    def build(name):
+        _build(chain, name)
+        report = _report(verify_chain(chain, full=True), chain)
+        assert (report[1] is None) == (name == "clean")
+        assert report[1] is None or report[2] is not None
+        return report
+    return build
+
+@pytest.fixture
+def many_cpus(monkeypatch):
+    # Lift the one-worker-per-CPU cap so --jobs really uses a process pool
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+
+@pytest.fixture
+def vectorised(monkeypatch):
+    """Call to switch to the vectorised state machine; returns the check_sequences() calls."""
+    pytest.importorskip("numpy")
+    calls = []
+    check_sequences = verify.check_sequences
+
+    def spy(*args):
+        calls.append(args)
+        check_sequences(*args)
+
+    def activate():
+        monkeypatch.setattr(verify, "numpy_worthwhile", lambda *args: True)
+        monkeypatch.setattr(verify, "check_sequences", spy)
+        return calls
+    return activate
+
+def _resumed(tmp_path, name, copy):
+    """The same case on another chain, checkpointed after the clean prefix."""
+    path = str(tmp_path / f"resumed-{copy}.dat")
+    init_file(path)
+    _build(path, name, checkpoint=True)
+    return path
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_jobs_report_matches(name, chain, reference, many_cpus):
+    expected = reference(name)
+    assert _report(verify_chain(chain, full=True, jobs=3), chain) == expected
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_resumed_report_matches(name, reference, tmp_path, many_cpus):
+    expected = reference(name)
+    resumed = _resumed(tmp_path, name, "seq")
+    verifier = verify_chain(resumed)
+    assert _report(verifier, resumed) == expected
+    if CASES[name][1] is None:
+        assert verifier.resumed  # the checkpoint was used, not a pass from genesis
+    resumed = _resumed(tmp_path, name, "jobs")
+    assert _report(verify_chain(resumed, jobs=3), resumed) == expected
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_vectorised_report_matches(name, chain, reference, tmp_path, vectorised, many_cpus):
+    expected = reference(name)
+    resumed = _resumed(tmp_path, name, "vec")
+    calls = vectorised()
+    assert _report(verify_chain(chain, full=True), chain) == expected
+    assert _report(verify_chain(chain, full=True, jobs=3), chain) == expected
+    assert _report(verify_chain(resumed), resumed) == expected
+    assert calls